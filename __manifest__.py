@@ -42,6 +42,7 @@
     'license': 'OPL-1',
     'depends': [
         'base',
+        'bus',
         'mail',
     ],
     'data': [
@@ -57,6 +58,8 @@
         'data/workflow_demo_data.xml',
         'data/workflow_approval_demo_data.xml',
         'data/workflow_users_demo.xml',
+        'data/workflow_instance_data.xml',
+        'data/workflow_cron.xml',
 
         # ── Données Courrier ──────────────────────────────────────────
         'courrier/data/courrier_sequence.xml',
@@ -70,6 +73,7 @@
         'views/workflow_approval_view.xml',
         'views/workflow_circuit_views.xml',
         'views/workflow_routing_rule_views.xml',
+        'views/workflow_outbox_views.xml',
 
         # ── Vues Courrier (avant les menus) ───────────────────────────
         'courrier/views/courrier_entrant_views.xml',
@@ -79,6 +83,7 @@
 
         # ── Wizards ───────────────────────────────────────────────────
         'wizard/workflow_request_wizard_views.xml',
+        'wizard/workflow_approval_batch_wizard_views.xml',
     ],
     'assets': {
         'web.assets_backend': [
@@ -86,6 +91,11 @@
             'workflow/static/src/js/workflow_theme.js',
             'workflow/static/src/xml/dynamic_form_widget.xml',
             'workflow/static/src/js/dynamic_form_widget.js',
+            'workflow/static/src/css/workflow_dashboard.css',
+            'workflow/static/src/xml/workflow_dashboard.xml',
+            'workflow/static/src/js/workflow_dashboard.js',
+            'workflow/static/src/js/workflow_approval_lazy.js',
+            'workflow/static/src/js/workflow_approval_form.js',
         ],
         'web.assets_frontend': [
             'workflow/static/src/css/workflow_dashboard.css',
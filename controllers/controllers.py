@@ -1,7 +1,14 @@
 # -*- coding: utf-8 -*-
+import time
+
 from odoo import http
 from odoo.http import request
-from datetime import datetime, timedelta
+from werkzeug.exceptions import NotFound
+
+# Durée de cache navigateur des pièces jointes et aperçus (revalidés ensuite par ETag)
+WORKFLOW_ATTACHMENT_MAX_AGE = 7 * 24 * 3600
+# Dossiers dont les droits de lecture s'appliquent à leurs pièces jointes (res_model/res_id)
+WORKFLOW_ATTACHMENT_MODELS = ('workflow.request', 'workflow.courrier.entrant')
 
 
 class WorkflowDashboardController(http.Controller):
@@ -11,137 +18,203 @@ class WorkflowDashboardController(http.Controller):
     """
 
     @http.route('/workflow/dashboard', type='http', auth='user', website=True)
-    def workflow_dashboard(self, page=1, **kwargs):
+    def workflow_dashboard(self, page=1, after=None, before=None, **kwargs):
         """
         Affiche le tableau de bord avec statistiques et demandes récentes
+
+        Pagination par curseur : ``after`` / ``before`` = ``"<date>,<id>"``
+        de la dernière / première demande de la page affichée.
         """
         # Pagination
         try:
             page = int(page)
         except:
             page = 1
+        Dashboard = request.env['workflow.dashboard']
+        cursor, direction = Dashboard._parse_cursor(after), 'next'
+        if not cursor:
+            cursor, direction = Dashboard._parse_cursor(before), 'prev'
+        if not cursor:
+            page = 1
         
         limit = 10  # Nombre d'éléments par page
-        offset = (page - 1) * limit
         
         # Récupération du modèle
         WorkflowRequest = request.env['workflow.request']
-        
-        # Calcul des statistiques
-        stats = self._compute_statistics(WorkflowRequest)
-        
-        # Comptage total pour la pagination
-        total_requests = WorkflowRequest.search_count([])
-        total_pages = (total_requests + limit - 1) // limit  # Arrondi supérieur
-        
-        # Récupération des demandes récentes avec pagination
-        recent_requests = self._get_recent_requests(WorkflowRequest, limit=limit, offset=offset)
-        
-        return request.render('workflow.workflow_dashboard', {
-            'stats': stats,
-            'recent_requests': recent_requests,
-            'page': page,
-            'total_pages': total_pages,
-            'total_requests': total_requests,
-        })
+
+        # Données en cache (invalidées à chaque changement d'état)
+        page_key = (page, cursor, direction)
+        values, generation = Dashboard._dashboard_cache_get('portal', page_key)
+        if values is None:
+            started = time.perf_counter()
+
+            # Calcul des statistiques
+            stats = self._compute_statistics(WorkflowRequest)
+            
+            # Comptage total pour la pagination (lu sur la table de statistiques)
+            total_requests = stats['total']
+            total_pages = (total_requests + limit - 1) // limit  # Arrondi supérieur
+            
+            # Récupération des demandes récentes (keyset, coût constant)
+            requests = Dashboard._keyset_page(WorkflowRequest, [], 'create_date', cursor, direction, limit)
+            recent_requests = self._get_recent_requests(requests)
+
+            values = Dashboard._dashboard_cache_put('portal', page_key, generation, {
+                'stats': stats,
+                'recent_requests': recent_requests,
+                'page': page,
+                'total_pages': total_pages,
+                'total_requests': total_requests,
+                'prev_cursor': Dashboard._format_cursor(requests[:1]) if page > 1 else None,
+                'next_cursor': Dashboard._format_cursor(requests[-1:]) if len(requests) == limit else None,
+            }, started)
+        
+        return request.render('workflow.workflow_dashboard', values)
+
+    @http.route('/workflow/dashboard/data', type='json', auth='user')
+    def workflow_dashboard_data(self, mode='credit', cursor=None, direction='next', page=1, **kwargs):
+        """
+        Données JSON du tableau de bord OWL (statistiques + une page de lignes)
+        """
+        return request.env['workflow.dashboard'].get_dashboard_payload(
+            mode=mode, cursor=cursor, direction=direction, page=page,
+        )
+
+    @http.route('/workflow/dashboard/rows', type='json', auth='user')
+    def workflow_dashboard_rows(self, mode='credit', ids=None, **kwargs):
+        """
+        Lignes modifiées annoncées par le bus, relues sous les droits de l'utilisateur
+        """
+        return request.env['workflow.dashboard'].get_dashboard_rows(mode, ids or [])
 
     def _compute_statistics(self, model):
         """
         Calcule les statistiques pour les cartes du dashboard
+        (une seule requête groupée, voir workflow.request._get_dashboard_stats)
         """
-        # Date du début du mois actuel
-        now = datetime.now()
-        first_day_current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Date du mois précédent
-        if now.month == 1:
-            first_day_last_month = first_day_current_month.replace(year=now.year - 1, month=12)
-        else:
-            first_day_last_month = first_day_current_month.replace(month=now.month - 1)
+        return model._get_dashboard_stats()
 
-        # Total de toutes les demandes
-        total = model.search_count([])
-        
-        # Demandes du mois actuel
-        total_current_month = model.search_count([
-            ('create_date', '>=', first_day_current_month.strftime('%Y-%m-%d'))
-        ])
-        
-        # Demandes du mois précédent
-        total_last_month = model.search_count([
-            ('create_date', '>=', first_day_last_month.strftime('%Y-%m-%d')),
-            ('create_date', '<', first_day_current_month.strftime('%Y-%m-%d'))
-        ])
-        
-        # Calcul de la tendance mensuelle
-        if total_last_month > 0:
-            total_trend = round(((total_current_month - total_last_month) / total_last_month) * 100)
+    def _get_recent_requests(self, requests):
+        """
+        Formate les demandes récentes (page déjà sélectionnée par curseur)
+        """
+        return [{
+            'name': req['name'] or 'Brouillon',
+            'requester': req['requester_id'][1] if req['requester_id'] else 'Système',
+            'client_name': req['client_name'],
+            'amount': req['amount'] or 0,
+            'credit_type_label': req['credit_type_label'],
+            'state': req['state'],
+            'state_label': req['state_label'],
+            'date': req['create_date'].strftime('%d/%m/%Y') if req['create_date'] else '-',
+        } for req in request.env['workflow.dashboard']._project_rows(requests)]
+
+
+class WorkflowApprovalController(http.Controller):
+    """
+    Contrôleur de la vue approbateur
+    Sert les sections chargées à la demande (historique, commentaires, documents)
+    et reçoit les décisions des approbateurs
+    """
+
+    @http.route('/workflow/approval/section', type='json', auth='user')
+    def workflow_approval_section(self, request_id, section, **kwargs):
+        """
+        HTML d'une section de la vue approbateur, chargée à son ouverture
+        """
+        return request.env['workflow.approval.view'].get_lazy_section(request_id, section)
+
+    @http.route('/workflow/approval/timeline', type='json', auth='user')
+    def workflow_approval_timeline(self, request_id, before=None, limit=None, **kwargs):
+        """
+        Page de l'historique des échanges (du plus récent au plus ancien)
+        """
+        return request.env['workflow.request.comment'].get_timeline(request_id, before=before, limit=limit)
+
+    @http.route('/workflow/approval/prefetch', type='json', auth='user')
+    def workflow_approval_prefetch(self, view_id, **kwargs):
+        """
+        Prépare en tâche de fond les prochains dossiers de la file de validation
+        """
+        approval_view = request.env['workflow.approval.view'].browse(int(view_id)).exists()
+        return approval_view.prefetch_queue() if approval_view else 0
+
+    @http.route('/workflow/approval/decide', type='json', auth='user')
+    def workflow_approval_decide(self, approval_id, decision=None, comment='', attachment_ids=None, action_id=None, **kwargs):
+        """
+        Décision de l'approbateur (approuver, refuser, retourner, demander des
+        informations ou action configurée), sans enregistrement transitoire
+        """
+        return request.env['workflow.request.approval'].execute_decision(
+            approval_id,
+            decision=decision,
+            comment=comment,
+            attachment_ids=attachment_ids,
+            action_id=action_id,
+        )
+
+
+class WorkflowAttachmentController(http.Controller):
+    """
+    Contrôleur des pièces jointes du workflow
+    Sert les documents (lecture progressive par plages) et leurs aperçus allégés
+    affichés dans la vue approbateur
+    """
+
+    def _get_attachment(self, attachment_id):
+        """
+        Pièce jointe (sudo) après contrôle d'accès : pour un document rattaché à
+        une demande ou à un courrier (res_model/res_id), droit de lecture sur ce
+        dossier ; sinon contrôle standard de ir.attachment
+        """
+        attachment = request.env['ir.attachment'].sudo().browse(attachment_id).exists()
+        if not attachment:
+            raise NotFound()
+        if attachment.res_model in WORKFLOW_ATTACHMENT_MODELS and attachment.res_id:
+            record = request.env[attachment.res_model].browse(attachment.res_id).exists()
+            if not record:
+                raise NotFound()
+            record.check_access_rights('read')
+            record.check_access_rule('read')
         else:
-            total_trend = 100 if total_current_month > 0 else 0
+            attachment.sudo(False).check('read')
+        return attachment
 
-        # Demandes en cours
-        in_progress = model.search_count([('state', 'in', ['submitted', 'in_progress'])])
-        
-        # Demandes approuvées
-        approved = model.search_count([('state', '=', 'approved')])
-        
-        # Demandes refusées
-        rejected = model.search_count([('state', '=', 'rejected')])
-        
-        # Taux d'approbation
-        total_processed = approved + rejected
-        approval_rate = round((approved / total_processed * 100)) if total_processed > 0 else 0
-        
-        # Tendance des rejets (fictive pour l'instant)
-        rejection_trend = -5  # À améliorer avec vrais calculs plus tard
-
-        return {
-            'total': total,
-            'total_trend': total_trend,
-            'in_progress': in_progress,
-            'approved': approved,
-            'rejected': rejected,
-            'approval_rate': approval_rate,
-            'rejection_trend': rejection_trend,
-        }
-
-    def _get_recent_requests(self, model, limit=10, offset=0):
-        """
-        Récupère les demandes récentes avec leurs informations formatées
-        """
-        # Dictionnaire de traduction des types de crédit
-        credit_types = {
-            'salary': 'Crédit salaire',
-            'housing': 'Crédit logement',
-            'consumption': 'Crédit consommation',
-            'business': 'Crédit entreprise',
-            'other': 'Autre',
-        }
-        
-        # Dictionnaire de traduction des statuts
-        state_labels = {
-            'draft': 'Brouillon',
-            'submitted': 'Soumise',
-            'in_progress': 'En cours',
-            'approved': 'Approuvée',
-            'rejected': 'Refusée',
-            'cancelled': 'Annulée',
-        }
-        
-        # Recherche des demandes récentes avec pagination
-        requests = model.search([], order='create_date desc', limit=limit, offset=offset)
-        
-        result = []
-        for req in requests:
-            result.append({
-                'name': req.name or 'Brouillon',
-                'requester': req.requester_id.name if req.requester_id else 'Système',
-                'client_name': req.client_name,
-                'amount': req.amount or 0,
-                'credit_type_label': credit_types.get(req.credit_type, '-'),
-                'state': req.state,
-                'state_label': state_labels.get(req.state, req.state.capitalize()),
-                'date': req.create_date.strftime('%d/%m/%Y') if req.create_date else '-',
-            })
-        
-        return result
+    @http.route('/workflow/attachment/<int:attachment_id>', type='http', auth='user')
+    def workflow_attachment(self, attachment_id, download=None, **kwargs):
+        """
+        Contenu d'une pièce jointe, lu depuis le filestore par blocs : requêtes
+        Range (206) pour l'affichage progressif des PDF, ETag fort (checksum)
+        et If-None-Match (304)
+        """
+        attachment = self._get_attachment(attachment_id)
+        stream = request.env['ir.binary']._get_stream_from(attachment)
+        response = stream.get_response(as_attachment=bool(download), max_age=WORKFLOW_ATTACHMENT_MAX_AGE)
+        # Documents authentifiés : cache du navigateur uniquement
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
+
+    @http.route('/workflow/attachment/<int:attachment_id>/preview', type='http', auth='user')
+    def workflow_attachment_preview(self, attachment_id, **kwargs):
+        """
+        Aperçu (image réduite ou première page) d'une pièce jointe lisible par
+        l'utilisateur ; tant qu'il n'est pas calculé (cron), image d'attente non
+        mise en cache pour que le navigateur redemande l'aperçu. Une pièce jointe
+        rattachée avant la mise en file automatique est mise en file au premier appel
+        """
+        attachment = self._get_attachment(attachment_id)
+        Preview = request.env['workflow.attachment.preview']
+        preview = Preview._get_previews(attachment).get(attachment.id)
+        if not preview:
+            preview = Preview._queue_previews(attachment).get(attachment.id)
+        if not preview or preview.state != 'done':
+            placeholder = 'pending' if preview and preview.state == 'pending' else 'unavailable'
+            response = request.redirect(f'/workflow/static/src/img/attachment_preview_{placeholder}.svg')
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+        stream = request.env['ir.binary']._get_stream_from(preview, 'image', default_mimetype='image/jpeg')
+        response = stream.get_response(max_age=WORKFLOW_ATTACHMENT_MAX_AGE)
+        response.cache_control.public = False
+        response.cache_control.private = True
+        return response
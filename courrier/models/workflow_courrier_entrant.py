@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import UserError
 
 
@@ -134,6 +134,10 @@ class WorkflowCourrierEntrant(models.Model):
     # ORM
     # ─────────────────────────────────────────────────────────────────────
 
+    def init(self):
+        # Pagination par curseur du tableau de bord : ORDER BY date_reception DESC, id DESC
+        tools.create_index(self._cr, 'workflow_courrier_entrant_date_reception_id_idx', self._table, ['date_reception', 'id'])
+
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
@@ -141,12 +145,18 @@ class WorkflowCourrierEntrant(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code('workflow.courrier.entrant') or 'Nouveau'
         records = super().create(vals_list)
         records._link_attachments()
+        self.env['workflow.dashboard']._invalidate_dashboard_cache()
+        self.env['workflow.dashboard']._notify_dashboard(records)
         return records
 
     def write(self, vals):
+        old_states = {courrier.id: courrier.state for courrier in self} if 'state' in vals else None
         result = super().write(vals)
         if 'attachment_ids' in vals:
             self._link_attachments()
+        if 'state' in vals:
+            self.env['workflow.dashboard']._invalidate_dashboard_cache()
+            self.env['workflow.dashboard']._notify_dashboard(self, old_states)
         return result
 
     def unlink(self):
@@ -177,6 +187,8 @@ class WorkflowCourrierEntrant(models.Model):
                     'res_model': self._name,
                     'res_id':    rec.id,
                 })
+        # Aperçus calculés par le cron, prêts avant l'ouverture de la vue approbateur
+        self.env['workflow.attachment.preview']._queue_previews(self.mapped('attachment_ids'))
 
     # ─────────────────────────────────────────────────────────────────────
     # Actions
@@ -208,17 +220,8 @@ class WorkflowCourrierEntrant(models.Model):
             'state':                  'in_progress',
         })
 
-        # Créer les approbations niveau par niveau
-        first_seq = levels[0].sequence
-        for level in levels:
-            for approver in level.approver_ids:
-                self.env['workflow.request.approval'].create({
-                    'name':               '%s – %s – %s' % (self.name, level.name, approver.name),
-                    'workflow_request_id': request.id,
-                    'workflow_level_id':  level.id,
-                    'approver_id':        approver.id,
-                    'state':              'pending' if level.sequence == first_seq else 'waiting',
-                })
+        # Créer les approbations et positionner l'instance (moteur partagé)
+        request._workflow_submit()
 
         self.write({
             'workflow_request_id': request.id,
@@ -9,10 +9,14 @@ from . import workflow_request
 from . import workflow_request_approval
 from . import workflow_request_comment
 from . import workflow_instance
+from . import workflow_outbox
+from . import workflow_stats_daily
 from . import workflow_dashboard
 from . import workflow_approval_view
 from . import workflow_custom_field
 from . import workflow_request_custom_value
 from . import workflow_request_document
+from . import workflow_attachment_preview
 from . import workflow_notification
 from . import workflow_audit_log
+from . import ir_websocket
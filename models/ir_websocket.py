@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        """Abonne les utilisateurs internes au canal du tableau de bord ; le canal
+        n'est jamais accepté depuis le client (nom de canal libre)."""
+        channels = super()._build_bus_channel_list(channels)
+        if self.env.uid and self.env.user.has_group('base.group_user'):
+            channel = self.env['workflow.dashboard']._dashboard_bus_channel()
+            if channel:
+                channels.append(channel)
+        return channels
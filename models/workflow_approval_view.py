@@ -1,7 +1,27 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
-from odoo.exceptions import UserError
+import threading
+import time
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.tools import clean_context
+from odoo.exceptions import AccessError, UserError
+
+# ── Cache des fragments de la vue approbateur (par processus) ─────────────
+# Clé : (base, utilisateur, fragment, empreinte) → HTML. L'empreinte contient
+# les ``write_date`` des enregistrements affichés par le fragment : une
+# modification produit une nouvelle clé, aucune invalidation n'est nécessaire.
+# Certains fragments sont construits sous les droits de l'utilisateur : le
+# cache n'est donc jamais partagé entre utilisateurs.
+APPROVAL_FRAGMENT_CACHE_MAX_ENTRIES = 5000
+
+# Dossiers suivants de la file préparés à l'avance (voir prefetch_queue)
+APPROVAL_QUEUE_PREFETCH_SIZE = 3
+
+_fragment_cache = {}
+_fragment_cache_lock = threading.Lock()
+_fragment_cache_stats = defaultdict(lambda: defaultdict(lambda: {'hits': 0, 'misses': 0, 'build_time': 0.0}))
 
 
 class WorkflowApprovalView(models.TransientModel):
@@ -12,15 +32,16 @@ class WorkflowApprovalView(models.TransientModel):
     approval_html = fields.Html(string='Vue Approbateur', compute='_compute_approval_html')
     comment = fields.Text(string='Commentaire', required=True)
     current_approval_id = fields.Many2one('workflow.request.approval', string='Approbation courante')
+    # File de validation : après chaque décision, passage direct au dossier suivant
+    queue_mode = fields.Boolean(string='Mode file de validation', default=False)
 
     # ── Champs pour les actions dynamiques ────────────────────────────────
     current_level_id = fields.Many2one(
         'workflow.level',
         related='current_approval_id.workflow_level_id',
         string='Niveau actuel',
-        store=True,
     )
-    # Stocké en base : mis à True lors de la création si des actions existent sur l'étape.
+    # Renseigné à l'ouverture si des actions existent sur l'étape.
     has_configured_actions = fields.Boolean(
         string='Actions configurées',
         default=False,
@@ -53,7 +74,10 @@ class WorkflowApprovalView(models.TransientModel):
             self.selected_action_color = 'primary'
 
     def _redirect_to_request(self, title='✅ Action effectuée', message='La demande a été traitée avec succès.', notif_type='success'):
-        """Affiche une notification pendant quelques secondes, puis redirige vers la demande."""
+        """Affiche une notification pendant quelques secondes, puis redirige vers la demande
+        (ou vers le dossier suivant en mode file de validation)."""
+        if self.queue_mode:
+            return self._advance_queue(title, message, notif_type)
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
@@ -74,62 +98,190 @@ class WorkflowApprovalView(models.TransientModel):
             },
         }
 
+    # ── Décisions (déléguées à workflow.request.approval.execute_decision) ──
+    def _execute_decision(self, decision=None, action=None):
+        """Transmet la décision saisie dans le formulaire au point d'entrée sans
+        état, puis affiche son résultat (ou le dossier suivant de la file).
+
+        Utilisé par le mode file de validation (enregistrement réutilisé) ; le
+        formulaire non enregistré appelle ``/workflow/approval/decide`` côté client.
+        """
+        self.ensure_one()
+        if not self.current_approval_id:
+            raise UserError("Aucune approbation en attente trouvée.")
+        result = self.env['workflow.request.approval'].execute_decision(
+            self.current_approval_id.id,
+            decision=decision,
+            comment=self.comment,
+            attachment_ids=self.attachment_ids.ids,
+            action_id=action.id if action else None,
+        )
+        if result['decision'] == 'request_info' and not self.queue_mode:
+            # Le niveau reste actif : l'approbateur reste sur le dossier
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': result['title'],
+                    'message': result['message'],
+                    'type': result['notif_type'],
+                    'sticky': False,
+                }
+            }
+        return self._redirect_to_request(result['title'], result['message'], result['notif_type'])
+
     def action_execute(self):
         """Exécute l'action choisie par l'approbateur parmi celles configurées."""
         self.ensure_one()
         if not self.selected_action_id:
             raise UserError("Veuillez sélectionner une action avant de continuer.")
+        return self._execute_decision(action=self.selected_action_id)
 
-        if self.selected_action_id.requires_comment:
-            if not self.comment or not self.comment.strip():
-                raise UserError(
-                    f"Un commentaire est obligatoire pour l'action « {self.selected_action_id.name} »."
-                )
+    def action_approve(self):
+        """Valider la demande"""
+        return self._execute_decision('approve')
 
-        action_type = self.selected_action_id.action_type
+    def action_reject(self):
+        """Refuser la demande"""
+        return self._execute_decision('reject')
 
-        if action_type in ('go_next', 'complete'):
-            return self.action_approve()
-        elif action_type == 'reject':
-            return self.action_reject()
-        elif action_type == 'go_back':
-            return self.action_return()
-        elif action_type == 'request_info':
-            return self._action_request_info()
-        else:
-            raise UserError(f"Type d'action non reconnu : {action_type}")
+    def action_return(self):
+        """Retourner au niveau précédent"""
+        return self._execute_decision('return')
 
-    def _action_request_info(self):
-        """Demander des informations complémentaires — garde le niveau actuel actif."""
+    # ── File de validation ────────────────────────────────────────────────
+    @api.model
+    def action_open_approval_queue(self):
+        """Ouvre la file de validation sur la première approbation en attente
+        (priorité de la demande, puis ancienneté)."""
+        first = self.env['workflow.request.approval']._get_approval_queue()
+        if not first:
+            return self._no_pending_notification()
+        approval_view = self.create({'queue_mode': True, 'comment': '', **self._queue_item_values(first)})
+        return approval_view._open_form()
+
+    def action_queue_skip(self):
+        """Passe au dossier suivant sans décider."""
         self.ensure_one()
-        if not self.current_approval_id:
-            raise UserError("Aucune approbation en attente trouvée.")
+        return self._advance_queue('⏭ Dossier passé', f'La demande « {self.request_id.name} » reste en attente.', 'info')
+
+    @api.model
+    def _queue_item_values(self, approval):
+        level = approval.workflow_level_id
+        return {
+            'request_id': approval.workflow_request_id.id,
+            'current_approval_id': approval.id,
+            'has_configured_actions': bool(level and level.action_ids),
+        }
 
-        # Transférer les fichiers joints si présents
-        self._transfer_attachments_to_approval()
-
-        self.env['workflow.request.comment'].create({
-            'name': f"Demande d'info - {self.current_approval_id.workflow_level_id.name}",
-            'request_id': self.request_id.id,
-            'approval_id': self.current_approval_id.id,
-            'user_id': self.env.user.id,
-            'comment_type': 'clarification',
-            'message': self.comment or '(Aucun commentaire)',
-            'author_level_sequence': self.current_approval_id.workflow_level_id.sequence,
+    def _advance_queue(self, title, message, notif_type):
+        """Charge l'approbation suivante de la file dans cette même vue (pas de
+        nouvel enregistrement transitoire ni de liste de sélection), puis
+        l'affiche après la notification de la décision."""
+        self.ensure_one()
+        Approval = self.env['workflow.request.approval']
+        current = self.current_approval_id
+        # Suite de la file après le dossier courant, puis retour au début
+        next_approval = Approval._get_approval_queue(after=current) or (Approval._get_approval_queue() - current)
+        if not next_approval:
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': title,
+                    'message': f"{message} Aucune autre demande en attente.",
+                    'type': notif_type,
+                    'sticky': False,
+                    'next': {'type': 'ir.actions.act_window_close'},
+                },
+            }
+        self.write({
+            **self._queue_item_values(next_approval),
+            'comment': '',
+            'selected_action_id': False,
+            'selected_action_color': 'primary',
+            'attachment_ids': [(5, 0, 0)],
         })
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': title,
+                'message': message,
+                'type': notif_type,
+                'sticky': False,
+                'next': self._open_form(),
+            },
+        }
+
+    @api.model
+    def _open_decision_form(self, approval, target='current'):
+        """Formulaire de décision sur ``approval`` sans enregistrement : il est
+        rempli par ``default_get`` (clé de contexte ``workflow_approval_id``) et
+        ses boutons appellent directement ``/workflow/approval/decide``
+        (js_class ``workflow_approval_form``)."""
+        return {
+            'name': 'Vue Approbateur',
+            'type': 'ir.actions.act_window',
+            'res_model': 'workflow.approval.view',
+            'view_mode': 'form',
+            'views': [[False, 'form']],
+            'target': target,
+            'context': {**clean_context(self.env.context), 'workflow_approval_id': approval.id},
+        }
+
+    @api.model
+    def default_get(self, fields_list):
+        values = super().default_get(fields_list)
+        approval_id = self.env.context.get('workflow_approval_id')
+        approval = self.env['workflow.request.approval'].browse(approval_id).exists() if approval_id else None
+        if approval:
+            values.update({
+                name: value
+                for name, value in self._queue_item_values(approval).items()
+                if name in fields_list
+            })
+        return values
+
+    def _open_form(self):
+        return {
+            'name': 'Vue Approbateur',
+            'type': 'ir.actions.act_window',
+            'res_model': 'workflow.approval.view',
+            'view_mode': 'form',
+            'views': [[False, 'form']],
+            'res_id': self.id,
+            'target': 'current',
+        }
+
+    def prefetch_queue(self):
+        """Prépare les fragments des prochains dossiers de la file (appelé en
+        tâche de fond par le client) : leur ouverture ne lit plus que le cache."""
+        self.ensure_one()
+        upcoming = self.env['workflow.request.approval']._get_approval_queue(
+            after=self.current_approval_id, limit=APPROVAL_QUEUE_PREFETCH_SIZE,
+        )
+        for approval in upcoming:
+            self.new(self._queue_item_values(approval)).approval_html
+        return len(upcoming)
 
+    @api.model
+    def _no_pending_notification(self):
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
-                'title': 'Demande envoyée',
-                'message': "Le demandeur a été notifié de votre demande d'informations.",
+                'title': 'Aucune demande en attente',
+                'message': 'Vous n\'avez aucune demande en attente de validation pour le moment.',
                 'type': 'info',
                 'sticky': False,
+                'next': {
+                    'type': 'ir.actions.act_window_close',
+                }
             }
         }
 
-    @api.depends('request_id', 'current_approval_id')
+    @api.depends('request_id', 'current_approval_id', 'queue_mode')
     def _compute_approval_html(self):
         """Génère le HTML de la vue approbateur — adapté selon le type (CREDIT ou COURRIER)"""
         for record in self:
@@ -140,23 +292,40 @@ class WorkflowApprovalView(models.TransientModel):
             req = record.request_id
             workflow_type_category = req.workflow_type_id.category if req.workflow_type_id else ''
 
+            # Étape courante lue sur l'instance de workflow (pointeur d'exécution)
+            current_level = req.instance_id.current_level_id
+
             # Approbation courante : priorité à current_approval_id si présent (vue approbateur)
             if record.current_approval_id:
                 current_approval = record.current_approval_id
-            else:
+            elif current_level:
                 current_approval = self.env['workflow.request.approval'].search([
                     ('workflow_request_id', '=', req.id),
+                    ('workflow_level_id', '=', current_level.id),
                     ('approver_id', '=', self.env.user.id),
                     ('state', '=', 'pending'),
                 ], limit=1)
+            else:
+                current_approval = self.env['workflow.request.approval']
 
-            all_approvals = self.env['workflow.request.approval'].search([
-                ('workflow_request_id', '=', req.id),
-            ], order='workflow_level_id')
+            data = self._load_approval_data(req)
 
-            statusbar_html        = self._build_statusbar(all_approvals, current_approval)
-            history_html          = self._build_approval_history(all_approvals)
-            previous_comments_html = self._build_previous_comments(all_approvals, current_approval)
+            # Empreintes des fragments : un fragment n'est reconstruit que si
+            # l'un des enregistrements qu'il affiche a été modifié.
+            approvals_key = tuple((approval['id'], approval['version']) for approval in data['approvals'])
+            statusbar_html = record._get_fragment(
+                'statusbar', (approvals_key, current_approval.id, current_level.id),
+                self._build_statusbar, data['approvals'], current_approval, current_level,
+            )
+            # Sections chargées à la demande (voir get_lazy_section et
+            # get_timeline) : seul un en-tête avec un compteur est rendu ici.
+            comment_count = self.env['workflow.request.comment'].search_count([('request_id', '=', req.id)])
+            history_html = self._lazy_section_placeholder(
+                req, 'history', "📊 État du workflow", f"{len(data['approvals'])} niveau(x)",
+            )
+            previous_comments_html = self._lazy_section_placeholder(
+                req, 'comments', "💬 Historique des commentaires", f"{comment_count} commentaire(s)",
+            )
             status_text = "En attente de votre validation" if current_approval else "Déjà validée par vous"
 
             # ── Indicateur actions configurées pour cette étape ───────────
@@ -181,17 +350,43 @@ class WorkflowApprovalView(models.TransientModel):
 
             # ── Contenu du dossier selon le type ─────────────────────────
             if workflow_type_category == 'courrier':
-                dossier_html = record._build_dossier_courrier(req)
-                documents_html = record._build_documents_courrier(req)
+                courrier = self.env['workflow.courrier.entrant'].sudo().search([
+                    ('workflow_request_id', '=', req.id)
+                ], limit=1)
+                courrier_key = (req.id, self._fragment_versions(courrier))
+                dossier_html = record._get_fragment(
+                    'dossier_courrier', courrier_key, record._build_dossier_courrier, req,
+                )
+                attachment_count = len(courrier.attachment_ids)
                 header_color = 'linear-gradient(135deg, #1a5276 0%, #2471a3 100%)'
                 dossier_title = '📬 Courrier à examiner'
             else:
-                dossier_html = record._build_dossier_credit(req)
-                documents_html = self._build_documents_section(req)
+                dossier_html = record._get_fragment(
+                    'dossier_credit', self._fragment_versions(req), record._build_dossier_credit, req,
+                )
+                attachment_count = len(req.sudo().attachment_ids)
                 header_color = 'linear-gradient(135deg, #0a4b78 0%, #0d5a8f 100%)'
                 dossier_title = '📋 Dossier crédit à examiner'
 
-            custom_fields_html = record._build_custom_fields_html(req)
+            documents_html = self._lazy_section_placeholder(
+                req, 'documents', "📎 Documents à examiner", f"{attachment_count} document(s)",
+            )
+
+            custom_fields_html = record._get_fragment(
+                'custom_fields', (req.id, self._fragment_versions(req.custom_value_ids)),
+                record._build_custom_fields_html, req,
+            )
+
+            queue_html = ''
+            if record.queue_mode:
+                remaining = self.env['workflow.request.approval'].search_count(
+                    [('approver_id', '=', self.env.uid), ('state', '=', 'pending')]
+                )
+                queue_html = f'''
+                    <div class="o_wf_queue" data-oe-model="workflow.approval.view" data-oe-id="{record.id}"
+                         style="background: #e7f1ff; border: 1px solid #0d6efd; border-radius: 8px; padding: 0.75rem 1rem; margin-top: 1rem; font-size: 14px; color: #0a4b78;">
+                        <strong>⚡ File de validation</strong> — {remaining} dossier(s) en attente, par priorité puis ancienneté.
+                    </div>'''
 
             html = f'''
             <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif; background: #f8f9fa; padding: 2rem;">
@@ -199,6 +394,7 @@ class WorkflowApprovalView(models.TransientModel):
                 <div style="margin-bottom: 2rem;">
                     <h1 style="margin: 0; font-size: 32px; font-weight: 700; color: #1a1a1a;">Vue Approbateur</h1>
                     <p style="margin: 0.5rem 0 0 0; color: #6c757d; font-size: 16px;">Validez, refusez ou retournez les demandes qui vous sont assignées</p>
+                    {queue_html}
                 </div>
 
                 <div style="background: white; border-radius: 16px; box-shadow: 0 4px 6px rgba(0,0,0,0.07); overflow: hidden;">
@@ -231,6 +427,106 @@ class WorkflowApprovalView(models.TransientModel):
 
             record.approval_html = html
 
+    # ── Cache des fragments ───────────────────────────────────────────────
+    @api.model
+    def _fragment_versions(self, records):
+        """Empreinte ``((id, write_date), ...)`` d'un ensemble d'enregistrements ;
+        ``write_date`` complet (microsecondes) : deux écritures dans la même
+        seconde produisent deux clés différentes."""
+        return tuple((rec.id, rec.write_date) for rec in records)
+
+    def _get_fragment(self, name, key, builder, *args):
+        """Retourne le fragment HTML ``name`` d'empreinte ``key`` depuis le
+        cache, ou le construit avec ``builder(*args)`` et le mémorise."""
+        dbname = self.env.cr.dbname
+        cache_key = (dbname, self.env.uid, name, key)
+        stats = _fragment_cache_stats[dbname][name]
+        html = _fragment_cache.get(cache_key)
+        if html is not None:
+            stats['hits'] += 1
+            return html
+        stats['misses'] += 1
+        started = time.perf_counter()
+        html = builder(*args) or ''
+        stats['build_time'] += time.perf_counter() - started
+        with _fragment_cache_lock:
+            if len(_fragment_cache) >= APPROVAL_FRAGMENT_CACHE_MAX_ENTRIES:
+                _fragment_cache.pop(next(iter(_fragment_cache)))
+            _fragment_cache[cache_key] = html
+        return html
+
+    @api.model
+    def get_fragment_cache_stats(self):
+        """Indicateurs du cache des fragments (processus courant), par fragment."""
+        if not self.env.user.has_group('base.group_system'):
+            raise AccessError("Réservé aux administrateurs.")
+        dbname = self.env.cr.dbname
+        result = {}
+        for name, stats in _fragment_cache_stats[dbname].items():
+            lookups = stats['hits'] + stats['misses']
+            result[name] = {
+                'hits': stats['hits'],
+                'misses': stats['misses'],
+                'hit_ratio': round(stats['hits'] / lookups * 100, 1) if lookups else 0,
+                'avg_build_ms': round(stats['build_time'] / stats['misses'] * 1000, 1) if stats['misses'] else 0,
+            }
+        result['entries'] = sum(1 for key in list(_fragment_cache) if key[0] == dbname)
+        return result
+
+    # ── Sections chargées à la demande ────────────────────────────────────
+    def _lazy_section_placeholder(self, req, section, title, subtitle):
+        """En-tête cliquable d'une section dont le contenu est chargé par
+        ``static/src/js/workflow_approval_lazy.js`` via ``get_lazy_section``."""
+        return f'''
+            <div class="o_wf_lazy_section" data-oe-model="workflow.request" data-oe-id="{req.id}" data-oe-field="{section}"
+                 style="background: white; border: 1px solid #dee2e6; border-radius: 12px; margin-top: 1rem; overflow: hidden;">
+                <div class="o_wf_lazy_toggle" role="button"
+                     style="padding: 1rem 1.5rem; cursor: pointer; display: flex; justify-content: space-between; align-items: center;">
+                    <strong style="font-size: 16px; color: #0a4b78;">{title}</strong>
+                    <span style="font-size: 13px; color: #6c757d;">{subtitle} ▾</span>
+                </div>
+                <div class="o_wf_lazy_body" style="display: none; padding: 0 1.5rem 1.5rem 1.5rem;"></div>
+            </div>'''
+
+    @api.model
+    def get_lazy_section(self, request_id, section):
+        """Contenu HTML d'une section de la vue approbateur (historique ou
+        documents), servi par ``/workflow/approval/section``. Les commentaires
+        sont paginés côté client (``workflow.request.comment.get_timeline``).
+
+        :return: ``{'html': ...}``
+        """
+        req = self.env['workflow.request'].browse(int(request_id)).exists()
+        if not req:
+            raise UserError("Demande introuvable.")
+        req.check_access_rights('read')
+        req.check_access_rule('read')
+
+        if section == 'history':
+            data = self._load_approval_data(req)
+            html = self._get_fragment(
+                'history', tuple((approval['id'], approval['version']) for approval in data['approvals']),
+                self._build_approval_history, data,
+            )
+        elif section == 'documents':
+            if req.workflow_type_id.category == 'courrier':
+                courrier = self.env['workflow.courrier.entrant'].sudo().search([
+                    ('workflow_request_id', '=', req.id)
+                ], limit=1)
+                html = self._get_fragment(
+                    'documents_courrier',
+                    (req.id, self._fragment_versions(courrier), self._fragment_versions(courrier.attachment_ids)),
+                    self._build_documents_courrier, req,
+                )
+            else:
+                html = self._get_fragment(
+                    'documents_credit', (req.id, self._fragment_versions(req.sudo().attachment_ids)),
+                    self._build_documents_section, req,
+                )
+        else:
+            raise UserError(f"Section inconnue : {section}")
+        return {'html': tools.html_sanitize(html) or '<p style="color: #6c757d;">Aucun élément.</p>'}
+
     def _build_dossier_credit(self, req):
         """HTML du dossier pour un crédit bancaire."""
         credit_types = {
@@ -413,6 +709,7 @@ class WorkflowApprovalView(models.TransientModel):
                 </div>'''
 
         attachments = self.env['ir.attachment'].sudo().browse(att_ids)
+        Preview = self.env['workflow.attachment.preview']
 
         docs_html = []
         preview_html = ''
@@ -424,44 +721,24 @@ class WorkflowApprovalView(models.TransientModel):
             mimetype = att.mimetype or ''
             name     = att.name or 'Document'
 
-            # URL simple — le res_model/res_id est désormais défini sur l'attachment
-            # donc tout utilisateur pouvant lire le courrier peut lire le fichier
-            url_view     = f"/web/content/{att.id}/{name}"
-            url_download = f"/web/content/{att.id}/{name}?download=true"
+            # Servi par /workflow/attachment (lecture par plages, ETag) — le res_model/res_id
+            # est défini sur l'attachment donc tout utilisateur pouvant lire le courrier peut lire le fichier
+            url_view     = f"/workflow/attachment/{att.id}"
+            url_download = f"/workflow/attachment/{att.id}?download=1"
 
             is_pdf   = 'pdf' in mimetype
             is_image = mimetype.startswith('image/')
             icon     = '🖼️' if is_image else ('📄' if is_pdf else '📎')
+            has_preview = Preview._can_preview(mimetype)
+            thumbnail_html = self._build_attachment_thumbnail(att, has_preview, icon)
 
-            # Prévisualisation inline pour le 1er document
+            # Aperçu allégé du 1er document : le fichier complet n'est chargé qu'au clic
             if idx == 0:
-                if is_pdf:
-                    preview_html = f'''
-                        <div style="margin-bottom: 1.5rem; border: 2px solid #1a5276; border-radius: 10px; overflow: hidden;">
-                            <div style="background: #1a5276; color: white; padding: 0.75rem 1rem; font-weight: 600; font-size: 14px;">
-                                👁️ Aperçu — {name}
-                            </div>
-                            <iframe src="{url_view}"
-                                    style="width: 100%; height: 700px; border: none; display: block;"
-                                    title="{name}">
-                            </iframe>
-                        </div>'''
-                elif is_image:
-                    preview_html = f'''
-                        <div style="margin-bottom: 1.5rem; border: 2px solid #1a5276; border-radius: 10px; overflow: hidden;">
-                            <div style="background: #1a5276; color: white; padding: 0.75rem 1rem; font-weight: 600; font-size: 14px;">
-                                👁️ Aperçu — {name}
-                            </div>
-                            <div style="text-align: center; padding: 1rem; background: #f8f9fa;">
-                                <img src="{url_view}"
-                                     style="max-width: 100%; max-height: 700px; border-radius: 6px; box-shadow: 0 2px 8px rgba(0,0,0,0.15);"
-                                     alt="{name}"/>
-                            </div>
-                        </div>'''
+                preview_html = self._build_attachment_preview(att, has_preview, name, url_view, '#1a5276')
 
             docs_html.append(f'''
                 <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; display: flex; align-items: center; gap: 1rem; margin-bottom: 0.75rem;">
-                    <span style="font-size: 24px;">{icon}</span>
+                    {thumbnail_html}
                     <div style="flex: 1;">
                         <div style="font-weight: 600;">{name}</div>
                         <div style="font-size: 12px; color: #6c757d;">{mimetype or 'Document'} • {size_str}</div>
@@ -485,28 +762,113 @@ class WorkflowApprovalView(models.TransientModel):
                 {''.join(docs_html)}
             </div>'''
 
-    def _build_statusbar(self, all_approvals, current_approval):
-        """Construit la barre de statut avec les niveaux de validation"""
-        if not all_approvals:
+    # ── Aperçus des pièces jointes ────────────────────────────────────────
+    def _build_attachment_preview(self, att, has_preview, name, url_view, color):
+        """Encadré d'aperçu du premier document : image allégée
+        (``workflow.attachment.preview``, image d'attente tant que le cron ne
+        l'a pas calculée) ouvrant le fichier complet au clic."""
+        if has_preview:
+            body = f'''
+                <a href="{url_view}" target="_blank" title="Ouvrir le document complet">
+                    <img src="/workflow/attachment/{att.id}/preview" loading="lazy"
+                         style="max-width: 100%; max-height: 700px; border-radius: 6px; box-shadow: 0 2px 8px rgba(0,0,0,0.15);"
+                         alt="{name}"/>
+                </a>
+                <div style="font-size: 12px; color: #6c757d; margin-top: 0.5rem;">Cliquez sur l'aperçu pour ouvrir le document complet</div>'''
+        else:
+            body = f'''
+                <a href="{url_view}" target="_blank"
+                   style="display: inline-block; background: {color}; color: white; padding: 0.5rem 1rem; border-radius: 6px; text-decoration: none; font-size: 13px; font-weight: 600;">
+                   👁 Aperçu indisponible — ouvrir le document
+                </a>'''
+        return f'''
+            <div style="margin-bottom: 1.5rem; border: 2px solid {color}; border-radius: 10px; overflow: hidden;">
+                <div style="background: {color}; color: white; padding: 0.75rem 1rem; font-weight: 600; font-size: 14px;">
+                    👁️ Aperçu — {name}
+                </div>
+                <div style="text-align: center; padding: 1rem; background: #f8f9fa;">{body}
+                </div>
+            </div>'''
+
+    def _build_attachment_thumbnail(self, att, has_preview, icon):
+        """Vignette d'une ligne de la liste des documents (icône à défaut d'aperçu)."""
+        if not has_preview:
+            return f'<span style="font-size: 24px;">{icon}</span>'
+        return (
+            f'<img src="/workflow/attachment/{att.id}/preview" loading="lazy" alt=""'
+            f' style="width: 48px; height: 48px; object-fit: cover; border-radius: 4px; border: 1px solid #dee2e6;"/>'
+        )
+
+    # ── Chargement groupé des données ─────────────────────────────────────
+    @api.model
+    def _load_approval_data(self, req):
+        """Charge approbations, niveaux, approbateurs et pièces jointes d'une
+        demande en un nombre fixe de requêtes, quelle que soit la longueur du
+        circuit (les commentaires sont paginés, voir
+        ``workflow.request.comment.get_timeline``).
+
+        :return: ``{'approvals': [...]}`` ; approbations dans l'ordre des niveaux
+        """
+        approval_rows = self.env['workflow.request.approval'].search_read(
+            [('workflow_request_id', '=', req.id)],
+            ['state', 'workflow_level_id', 'approver_id', 'comments', 'attachment_ids', 'create_date', 'write_date'],
+            order='workflow_level_id',
+        )
+        level_ids = {row['workflow_level_id'][0] for row in approval_rows if row['workflow_level_id']}
+        sequences = {
+            level['id']: level['sequence']
+            for level in self.env['workflow.level'].browse(level_ids).read(['sequence'])
+        }
+        attachment_ids = {att_id for row in approval_rows for att_id in row['attachment_ids']}
+        attachments = {
+            att['id']: att
+            for att in self.env['ir.attachment'].sudo().browse(attachment_ids).read(['name', 'mimetype'])
+        }
+
+        approvals = []
+        for row in approval_rows:
+            level_id, level_name = row['workflow_level_id'] or (False, False)
+            approvals.append({
+                'id': row['id'],
+                'state': row['state'],
+                'level_id': level_id,
+                'level_name': level_name,
+                'level_sequence': sequences.get(level_id, 0),
+                'approver_name': row['approver_id'] and row['approver_id'][1],
+                'comments': row['comments'],
+                'date': row['write_date'] or row['create_date'],
+                'version': row['write_date'],
+                'attachments': [attachments[att_id] for att_id in row['attachment_ids'] if att_id in attachments],
+            })
+
+        return {
+            'approvals': approvals,
+        }
+
+    def _build_statusbar(self, approvals, current_approval, current_level=None):
+        """Construit la barre de statut avec les niveaux de validation
+        (``approvals`` : liste chargée par ``_load_approval_data``)"""
+        if not approvals:
             return '<div style="text-align: center; color: #6c757d;">Aucun niveau de validation configuré</div>'
         
         levels_html = []
         
-        for idx, approval in enumerate(all_approvals):
+        for idx, approval in enumerate(approvals):
             # Déterminer le statut
-            if approval.state == 'approved':
+            if approval['state'] == 'approved':
                 status_class = 'completed'
                 icon = '✓'
                 color = '#198754'
-            elif approval.state == 'rejected':
+            elif approval['state'] == 'rejected':
                 status_class = 'rejected'
                 icon = '✗'
                 color = '#dc3545'
-            elif approval.state == 'returned':
+            elif approval['state'] == 'returned':
                 status_class = 'returned'
                 icon = '↩'
                 color = '#fd7e14'
-            elif approval.id == current_approval.id:
+            elif approval['id'] == current_approval.id or (
+                    approval['state'] == 'pending' and current_level and approval['level_id'] == current_level.id):
                 status_class = 'active'
                 icon = '!'
                 color = '#ffc107'
@@ -515,7 +877,7 @@ class WorkflowApprovalView(models.TransientModel):
                 icon = str(idx + 1)
                 color = '#6c757d'
             
-            label = approval.workflow_level_id.name if approval.workflow_level_id else f'Niveau {idx + 1}'
+            label = approval['level_name'] or f'Niveau {idx + 1}'
             
             step_html = f'''
                 <div style="display: flex; flex-direction: column; align-items: center; position: relative;">
@@ -528,43 +890,44 @@ class WorkflowApprovalView(models.TransientModel):
             levels_html.append(step_html)
             
             # Ajouter un connecteur sauf pour le dernier élément
-            if idx < len(all_approvals) - 1:
+            if idx < len(approvals) - 1:
                 connector_html = f'<div style="flex: 1; height: 2px; background: #dee2e6; margin: 0 1rem; position: relative; top: -30px;"></div>'
                 levels_html.append(connector_html)
         
         return '<div style="display: flex; align-items: flex-start; justify-content: center;">' + ''.join(levels_html) + '</div>'
 
-    def _build_approval_history(self, all_approvals):
-        """Construit le bouton et le modal pour afficher l'historique complet des commentaires"""
+    def _build_approval_history(self, data):
+        """Construit l'état du workflow : un bloc par niveau avec son commentaire et ses documents
+        (``data`` : voir ``_load_approval_data``)"""
         # Récupérer TOUTES les approbations triées par séquence
-        all_approvals_sorted = all_approvals.sorted(key=lambda a: a.workflow_level_id.sequence)
+        all_approvals_sorted = sorted(data['approvals'], key=lambda a: a['level_sequence'])
         
         if not all_approvals_sorted:
             return '<div style="background: #f8f9fa; border-radius: 8px; padding: 1rem; text-align: center; color: #6c757d; font-style: italic;">Aucun niveau d\'approbation configuré</div>'
         
         # Compter les commentaires non vides
-        comment_count = len([a for a in all_approvals_sorted if a.comments and a.comments.strip() != ''])
+        comment_count = len([a for a in all_approvals_sorted if a['comments'] and a['comments'].strip() != ''])
         
         # Construire les items du modal
         history_items = []
         
         for approval in all_approvals_sorted:
-            if approval.state == 'approved':
+            if approval['state'] == 'approved':
                 border_color = '#198754'
                 icon = '✅'
                 state_label = 'Approuvé'
                 bg_color = '#d1e7dd'
-            elif approval.state == 'rejected':
+            elif approval['state'] == 'rejected':
                 border_color = '#dc3545'
                 icon = '❌'
                 state_label = 'Refusé'
                 bg_color = '#f8d7da'
-            elif approval.state == 'returned':
+            elif approval['state'] == 'returned':
                 border_color = '#fd7e14'
                 icon = '🔙'
                 state_label = 'Retourné au niveau précédent'
                 bg_color = '#fff3cd'
-            elif approval.state == 'waiting':
+            elif approval['state'] == 'waiting':
                 border_color = '#6c757d'
                 icon = '⏳'
                 state_label = 'En attente du niveau précédent'
@@ -575,46 +938,41 @@ class WorkflowApprovalView(models.TransientModel):
                 state_label = 'En cours de validation'
                 bg_color = '#cfe2ff'
             
-            approver_name = approval.approver_id.name if approval.approver_id else 'Utilisateur inconnu'
-            level_name = approval.workflow_level_id.name if approval.workflow_level_id else 'Niveau inconnu'
-            comment = approval.comments if approval.comments and approval.comments.strip() else 'Pas encore de commentaire'
+            approver_name = approval['approver_name'] or 'Utilisateur inconnu'
+            level_name = approval['level_name'] or 'Niveau inconnu'
+            comment = approval['comments'] if approval['comments'] and approval['comments'].strip() else 'Pas encore de commentaire'
             
             # Formater la date
-            date_str = ''
-            if approval.write_date:
-                date_obj = approval.write_date
-                date_str = date_obj.strftime('%d/%m/%Y à %H:%M')
-            elif approval.create_date:
-                date_obj = approval.create_date
-                date_str = date_obj.strftime('%d/%m/%Y à %H:%M')
+            date_str = approval['date'].strftime('%d/%m/%Y à %H:%M') if approval['date'] else ''
             
             # Style différent si pas de commentaire
             comment_style = 'font-style: italic; color: #6c757d;' if comment == 'Pas encore de commentaire' else 'font-style: italic; color: #495057;'
             
             # Construire la liste des fichiers joints pour cette approbation
             attachments_html = ''
-            if approval.attachment_ids:
+            if approval['attachments']:
                 att_items = []
-                base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url', '')
-                for att in approval.attachment_ids.sudo():
-                    ext = (att.name or '').rsplit('.', 1)[-1].lower() if '.' in (att.name or '') else ''
-                    is_image = ext in ('png', 'jpg', 'jpeg', 'gif', 'webp', 'svg')
-                    preview = f'<img src="{base_url}/web/image/{att.id}" style="max-width:100%;max-height:200px;border-radius:6px;border:1px solid #dee2e6;display:block;margin-bottom:0.5rem;" alt="{att.name}"/>' if is_image else ''
+                for att in approval['attachments']:
+                    att_id, att_name = att['id'], att['name'] or ''
+                    is_image = (att['mimetype'] or '').startswith('image/')
+                    # Mêmes routes que la section des documents (plages, ETag, droits sur la demande)
+                    url_view = f"/workflow/attachment/{att_id}"
+                    preview = f'<img src="{url_view}/preview" loading="lazy" style="max-width:100%;max-height:200px;border-radius:6px;border:1px solid #dee2e6;display:block;margin-bottom:0.5rem;" alt="{att_name}"/>' if is_image else ''
                     att_items.append(f'''
                         <div style="display:flex;flex-direction:column;align-items:flex-start;background:#f8f9fa;border:1px solid #dee2e6;border-radius:6px;padding:0.75rem;margin-bottom:0.5rem;">
                             {preview}
                             <div style="display:flex;align-items:center;gap:0.75rem;">
                                 <span style="font-size:22px;">{"🖼️" if is_image else "📄"}</span>
-                                <span style="font-size:13px;font-weight:600;color:#212529;">{att.name}</span>
-                                <a href="{base_url}/web/content/{att.id}?download=true" target="_blank"
+                                <span style="font-size:13px;font-weight:600;color:#212529;">{att_name}</span>
+                                <a href="{url_view}?download=1" target="_blank"
                                    style="background:#0a4b78;color:white;padding:0.3rem 0.75rem;border-radius:4px;text-decoration:none;font-size:12px;font-weight:600;">⬇ Télécharger</a>
-                                <a href="{base_url}/web/image/{att.id}" target="_blank"
+                                <a href="{url_view}" target="_blank"
                                    style="background:#6c757d;color:white;padding:0.3rem 0.75rem;border-radius:4px;text-decoration:none;font-size:12px;font-weight:600;">👁 Voir</a>
                             </div>
                         </div>''')
                 attachments_html = f'''
                     <div style="margin-top:0.75rem;">
-                        <div style="font-size:13px;font-weight:700;color:#495057;margin-bottom:0.5rem;">📎 Documents joints ({len(approval.attachment_ids)}) :</div>
+                        <div style="font-size:13px;font-weight:700;color:#495057;margin-bottom:0.5rem;">📎 Documents joints ({len(approval['attachments'])}) :</div>
                         {''.join(att_items)}
                     </div>'''
 
@@ -640,158 +998,17 @@ class WorkflowApprovalView(models.TransientModel):
             '''
             history_items.append(item_html)
         
-        # Modal HTML + Bouton
-        modal_html = f'''
-            <!-- Bouton pour ouvrir le modal -->
-            <div style="margin-top: 1rem;">
-                <button onclick="document.getElementById('historyModal').style.display = 'flex'" 
-                        style="background: #0a4b78; color: white; border: none; padding: 0.75rem 1.5rem; border-radius: 8px; font-size: 15px; font-weight: 600; cursor: pointer; display: flex; align-items: center; gap: 0.5rem; box-shadow: 0 2px 4px rgba(10,75,120,0.2); transition: all 0.2s;"
-                        onmouseover="this.style.background='#083a5e'; this.style.boxShadow='0 4px 8px rgba(10,75,120,0.3)'"
-                        onmouseout="this.style.background='#0a4b78'; this.style.boxShadow='0 2px 4px rgba(10,75,120,0.2)'">
-                    <span style="font-size: 18px;">�</span>
-                    Voir l'état du workflow ({len(all_approvals_sorted)} niveaux{' • ' + str(comment_count) + ' commentaire(s)' if comment_count > 0 else ''})
-                </button>
-            </div>
-            
-            <!-- Modal -->
-            <div id="historyModal" style="display: none; position: fixed; z-index: 9999; left: 0; top: 0; width: 100%; height: 100%; background-color: rgba(0,0,0,0.6); align-items: center; justify-content: center;">
-                <div style="background: white; border-radius: 16px; width: 90%; max-width: 800px; max-height: 85vh; display: flex; flex-direction: column; box-shadow: 0 10px 40px rgba(0,0,0,0.2);">
-                    
-                    <!-- En-tête du modal -->
-                    <div style="background: linear-gradient(135deg, #0a4b78 0%, #0d5a8f 100%); color: white; padding: 1.5rem 2rem; border-radius: 16px 16px 0 0; display: flex; justify-content: space-between; align-items: center;">
-                        <div>
-                            <h2 style="margin: 0; font-size: 22px; font-weight: 700;">� État du Workflow & Commentaires</h2>
-                            <p style="margin: 0.5rem 0 0 0; opacity: 0.9; font-size: 14px;">{len(all_approvals_sorted)} niveau(x) • {comment_count} commentaire(s)</p>
-                        </div>
-                        <button onclick="document.getElementById('historyModal').style.display = 'none'" 
-                                style="background: rgba(255,255,255,0.2); border: none; color: white; font-size: 28px; cursor: pointer; width: 40px; height: 40px; border-radius: 50%; display: flex; align-items: center; justify-content: center; transition: all 0.2s;"
-                                onmouseover="this.style.background='rgba(255,255,255,0.3)'"
-                                onmouseout="this.style.background='rgba(255,255,255,0.2)'">×</button>
-                    </div>
-                    
-                    <!-- Corps du modal (scrollable) -->
-                    <div style="padding: 2rem; overflow-y: auto; flex: 1;">
-                        {''.join(history_items)}
-                    </div>
-                    
-                    <!-- Pied du modal -->
-                    <div style="padding: 1rem 2rem; border-top: 1px solid #e9ecef; text-align: right;">
-                        <button onclick="document.getElementById('historyModal').style.display = 'none'" 
-                                style="background: #6c757d; color: white; border: none; padding: 0.75rem 2rem; border-radius: 8px; font-size: 15px; font-weight: 600; cursor: pointer; transition: all 0.2s;"
-                                onmouseover="this.style.background='#5a6268'"
-                                onmouseout="this.style.background='#6c757d'">Fermer</button>
-                    </div>
-                </div>
-            </div>
-            
-            <!-- Script pour fermer le modal en cliquant en dehors -->
-            <script>
-                document.getElementById('historyModal').addEventListener('click', function(event) {{
-                    if (event.target === this) {{
-                        this.style.display = 'none';
-                    }}
-                }});
-            </script>
-        '''
-
-    def _build_previous_comments(self, all_approvals, current_approval):
-        """Affiche TOUS les commentaires en ordre chronologique depuis workflow.request.comment"""
-        # Récupérer TOUS les commentaires de cette demande, triés par date de création
-        all_comments = self.env['workflow.request.comment'].search([
-            ('request_id', '=', self.request_id.id)
-        ], order='create_date asc')
-        
-        if not all_comments:
-            return ''
-        
-        # Construire les commentaires
-        comment_items = []
-        for comment in all_comments:
-            # Icône et couleur selon le type
-            if comment.comment_type == 'approval_note':
-                icon = '✅'
-                border_color = '#198754'
-                bg_color = '#d1e7dd'
-                state_label = 'Approuvé'
-            elif comment.comment_type == 'rejection_reason':
-                icon = '❌'
-                border_color = '#dc3545'
-                bg_color = '#f8d7da'
-                state_label = 'Refusé'
-            elif comment.comment_type == 'return':
-                icon = '🔙'
-                border_color = '#fd7e14'
-                bg_color = '#fff3cd'
-                state_label = 'Retourné au niveau précédent'
-            elif comment.comment_type == 'clarification':
-                icon = '❓'
-                border_color = '#0dcaf0'
-                bg_color = '#cff4fc'
-                state_label = 'Demande de clarification'
-            elif comment.comment_type == 'response':
-                icon = '💬'
-                border_color = '#6f42c1'
-                bg_color = '#e0cffc'
-                state_label = 'Réponse'
-            else:
-                icon = '📝'
-                border_color = '#6c757d'
-                bg_color = '#f8f9fa'
-                state_label = 'Information'
-            
-            author_name = comment.user_id.name if comment.user_id else 'Utilisateur inconnu'
-            level_name = comment.approval_id.workflow_level_id.name if comment.approval_id and comment.approval_id.workflow_level_id else 'N/A'
-            
-            # Indiquer si c'est l'utilisateur connecté
-            is_current_user = (comment.user_id.id == self.env.user.id)
-            user_badge = ' <span style="background: #0a4b78; color: white; padding: 0.25rem 0.5rem; border-radius: 4px; font-size: 11px; font-weight: 700;">VOUS</span>' if is_current_user else ''
-            
-            # Formater la date
-            date_str = ''
-            if comment.create_date:
-                date_obj = comment.create_date
-                date_str = date_obj.strftime('%d/%m/%Y à %H:%M')
-            
-            comment_html = f'''
-                <div style="background: {bg_color}; border-left: 4px solid {border_color}; border-radius: 8px; padding: 1.25rem; margin-bottom: 1rem;">
-                    <div style="display: flex; justify-content: space-between; align-items: start; margin-bottom: 0.75rem;">
-                        <div style="flex: 1;">
-                            <div style="margin-bottom: 0.5rem;">
-                                <span style="font-size: 18px; margin-right: 0.5rem;">{icon}</span>
-                                <strong style="color: {border_color}; font-size: 14px;">{state_label}</strong>
-                            </div>
-                            <div style="font-size: 13px; color: #495057; margin-bottom: 0.25rem;">
-                                <strong>{author_name}</strong>{user_badge} • <span style="color: #6c757d;">{level_name}</span>
-                            </div>
-                            {('<div style="font-size: 12px; color: #6c757d;">' + date_str + '</div>') if date_str else ''}
-                        </div>
-                    </div>
-                    <div style="background: white; padding: 1rem; border-radius: 6px; border: 1px solid rgba(0,0,0,0.05);">
-                        <div style="color: #212529; line-height: 1.6; font-style: italic;">"{comment.message}"</div>
-                    </div>
-                </div>
-            '''
-            comment_items.append(comment_html)
-        
         return f'''
-            <div style="background: #fff; border: 2px solid #0d6efd; border-radius: 12px; padding: 1.5rem; margin-bottom: 2rem;">
-                <h3 style="margin: 0 0 1.5rem 0; font-size: 18px; color: #0d6efd; font-weight: 600; display: flex; align-items: center; gap: 0.5rem;">
-                    💬 Historique complet des commentaires ({len(comment_items)})
-                </h3>
-                <p style="margin: 0 0 1rem 0; font-size: 13px; color: #6c757d;">Affichage chronologique de tous les commentaires laissés sur cette demande</p>
-                <div style="max-height: 500px; overflow-y: auto;">
-                    {''.join(comment_items)}
-                </div>
-            </div>
+            <p style="margin: 0 0 1rem 0; font-size: 13px; color: #6c757d;">{len(all_approvals_sorted)} niveau(x) • {comment_count} commentaire(s)</p>
+            {''.join(history_items)}
         '''
-        
-        return modal_html
 
     def _build_documents_section(self, req):
         """Construit la section des documents pour un crédit — accès sudo pour éviter les erreurs de droits."""
         # On passe par la relation Many2many (workflow_request_attachment_rel) avec sudo
         att_ids = req.sudo().attachment_ids.ids
         attachments = self.env['ir.attachment'].sudo().browse(att_ids)
+        Preview = self.env['workflow.attachment.preview']
 
         docs_html = []
 
@@ -803,42 +1020,22 @@ class WorkflowApprovalView(models.TransientModel):
                 mimetype = att.mimetype or ''
                 name     = att.name or 'Document'
 
-                url_view     = f"/web/content/{att.id}/{name}"
-                url_download = f"/web/content/{att.id}/{name}?download=true"
+                url_view     = f"/workflow/attachment/{att.id}"
+                url_download = f"/workflow/attachment/{att.id}?download=1"
 
                 is_pdf   = 'pdf' in mimetype
                 is_image = mimetype.startswith('image/')
                 icon     = '🖼️' if is_image else ('📄' if is_pdf else '📎')
+                has_preview = Preview._can_preview(mimetype)
+                thumbnail_html = self._build_attachment_thumbnail(att, has_preview, icon)
 
-                # Prévisualisation inline pour le 1er document
+                # Aperçu allégé du 1er document : le fichier complet n'est chargé qu'au clic
                 if idx == 0:
-                    if is_pdf:
-                        preview_html = f'''
-                            <div style="margin-bottom: 1.5rem; border: 2px solid #0a4b78; border-radius: 10px; overflow: hidden;">
-                                <div style="background: #0a4b78; color: white; padding: 0.75rem 1rem; font-weight: 600; font-size: 14px;">
-                                    👁️ Aperçu — {name}
-                                </div>
-                                <iframe src="{url_view}"
-                                        style="width: 100%; height: 700px; border: none; display: block;"
-                                        title="{name}">
-                                </iframe>
-                            </div>'''
-                    elif is_image:
-                        preview_html = f'''
-                            <div style="margin-bottom: 1.5rem; border: 2px solid #0a4b78; border-radius: 10px; overflow: hidden;">
-                                <div style="background: #0a4b78; color: white; padding: 0.75rem 1rem; font-weight: 600; font-size: 14px;">
-                                    👁️ Aperçu — {name}
-                                </div>
-                                <div style="text-align: center; padding: 1rem; background: #f8f9fa;">
-                                    <img src="{url_view}"
-                                         style="max-width: 100%; max-height: 700px; border-radius: 6px; box-shadow: 0 2px 8px rgba(0,0,0,0.15);"
-                                         alt="{name}"/>
-                                </div>
-                            </div>'''
+                    preview_html = self._build_attachment_preview(att, has_preview, name, url_view, '#0a4b78')
 
                 docs_html.append(f'''
                     <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; display: flex; align-items: center; gap: 1rem; margin-bottom: 0.75rem;">
-                        <span style="font-size: 24px;">{icon}</span>
+                        {thumbnail_html}
                         <div style="flex: 1;">
                             <div style="font-weight: 600;">{name}</div>
                             <div style="font-size: 12px; color: #6c757d;">{mimetype or 'Document'} • {size_str}</div>
@@ -875,259 +1072,26 @@ class WorkflowApprovalView(models.TransientModel):
     def action_open_approval_view(self):
         """Ouvre la vue approbateur pour les demandes en attente"""
         # Récupérer les demandes en attente de validation par l'utilisateur
-        pending_approvals = self.env['workflow.request.approval'].search([
-            ('approver_id', '=', self.env.user.id),
-            ('state', '=', 'pending')
-        ], order='create_date desc')
+        pending_domain = [('approver_id', '=', self.env.user.id), ('state', '=', 'pending')]
+        pending_approvals = self.env['workflow.request.approval'].search(
+            pending_domain, order='create_date desc', limit=2,
+        )
         
         if not pending_approvals:
             # Afficher une notification informative au lieu d'une erreur
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': 'Aucune demande en attente',
-                    'message': 'Vous n\'avez aucune demande en attente de validation pour le moment.',
-                    'type': 'info',
-                    'sticky': False,
-                    'next': {
-                        'type': 'ir.actions.act_window_close',
-                    }
-                }
-            }
+            return self._no_pending_notification()
         
         # Si plusieurs demandes, afficher d'abord la liste de sélection
         if len(pending_approvals) > 1:
+            pending_count = self.env['workflow.request.approval'].search_count(pending_domain)
             return {
-                'name': f'Sélectionnez une demande à traiter ({len(pending_approvals)} en attente)',
+                'name': f'Sélectionnez une demande à traiter ({pending_count} en attente)',
                 'type': 'ir.actions.act_window',
                 'res_model': 'workflow.request.approval',
                 'view_mode': 'tree',
-                'domain': [('approver_id', '=', self.env.user.id), ('state', '=', 'pending')],
+                'domain': pending_domain,
                 'target': 'new',
                 'context': self.env.context,
             }
         
-        # Vérifier si l'étape a des actions configurées
-        level = pending_approvals[0].workflow_level_id
-        has_actions = bool(level and level.action_ids)
-
-        # Créer un enregistrement transient avec la seule demande en attente
-        approval_view = self.create({
-            'request_id': pending_approvals[0].workflow_request_id.id,
-            'current_approval_id': pending_approvals[0].id,
-            'has_configured_actions': has_actions,
-            'comment': '',
-        })
-        
-        return {
-            'name': 'Vue Approbateur',
-            'type': 'ir.actions.act_window',
-            'res_model': 'workflow.approval.view',
-            'view_mode': 'form',
-            'res_id': approval_view.id,
-            'target': 'current',
-            'context': self.env.context,
-        }
-
-    def _transfer_attachments_to_approval(self):
-        """Transfère les fichiers joints depuis la vue transient vers l'approbation permanente."""
-        if not self.attachment_ids or not self.current_approval_id:
-            return
-        att_ids = self.attachment_ids.ids
-        if att_ids:
-            # Lier les fichiers au workflow.request (res_model/res_id) pour les droits d'accès
-            self.attachment_ids.sudo().write({
-                'res_model': 'workflow.request',
-                'res_id': self.request_id.id,
-            })
-            # Ajouter dans la Many2many du workflow.request pour que TOUS les approbateurs
-            # puissent les voir dans la section "Documents à examiner"
-            self.request_id.sudo().write({
-                'attachment_ids': [(4, att_id) for att_id in att_ids],
-            })
-            # Stocker aussi sur l'approbation pour l'historique (qui l'a ajouté, à quelle étape)
-            self.current_approval_id.sudo().write({
-                'attachment_ids': [(4, att_id) for att_id in att_ids],
-            })
-
-    def action_approve(self):
-        """Valider la demande"""
-        self.ensure_one()
-        
-        if not self.current_approval_id:
-            raise UserError("Aucune approbation en attente trouvée.")
-        
-        # Transférer les fichiers joints vers l'approbation permanente
-        self._transfer_attachments_to_approval()
-
-        # Mettre à jour l'approbation
-        self.current_approval_id.write({
-            'state': 'approved',
-            'comments': self.comment,
-        })
-        
-        # Créer un commentaire dans l'historique
-        self.env['workflow.request.comment'].create({
-            'name': f"Validation - {self.current_approval_id.workflow_level_id.name}",
-            'request_id': self.request_id.id,
-            'approval_id': self.current_approval_id.id,
-            'user_id': self.env.user.id,
-            'comment_type': 'approval_note',
-            'message': self.comment,
-            'author_level_sequence': self.current_approval_id.workflow_level_id.sequence,
-        })
-        
-        # IMPORTANT: Vérifier si toutes les approbations du niveau actuel sont validées
-        current_level = self.current_approval_id.workflow_level_id
-        pending_at_current_level = self.env['workflow.request.approval'].search([
-            ('workflow_request_id', '=', self.request_id.id),
-            ('workflow_level_id', '=', current_level.id),
-            ('state', '=', 'pending')
-        ])
-        
-        if pending_at_current_level:
-            # Il reste des validateurs à ce niveau — on passe en in_progress
-            self.request_id.write({'state': 'in_progress'})
-            return self._redirect_to_request(
-                title='✅ Validation enregistrée',
-                message=f'Votre approbation a été prise en compte. En attente des autres validateurs du niveau « {current_level.name} ».',
-                notif_type='success',
-            )
-        
-        # Toutes les approbations du niveau actuel sont validées
-        # Chercher s'il y a un niveau suivant dans le circuit
-        next_level = self.env['workflow.level'].search([
-            ('workflow_definition_id', '=', current_level.workflow_definition_id.id),
-            ('sequence', '>', current_level.sequence)
-        ], order='sequence asc', limit=1)
-        
-        if next_level:
-            # Chercher l'approbation du niveau suivant
-            next_approval = self.env['workflow.request.approval'].search([
-                ('workflow_request_id', '=', self.request_id.id),
-                ('workflow_level_id', '=', next_level.id)
-            ], limit=1)
-            
-            if next_approval:
-                if next_approval.state in ['returned', 'waiting']:
-                    # Le niveau suivant avait retourné la demande, ou était en attente du niveau précédent
-                    # On l'active maintenant
-                    next_approval.write({'state': 'pending'})
-                    self.request_id.write({'state': 'in_progress'})
-                elif next_approval.state == 'pending':
-                    # Le niveau suivant est déjà en attente
-                    self.request_id.write({'state': 'in_progress'})
-                else:
-                    # Le niveau suivant a déjà validé (ne devrait pas arriver)
-                    # Vérifier s'il reste des niveaux en attente
-                    pending_approvals = self.env['workflow.request.approval'].search([
-                        ('workflow_request_id', '=', self.request_id.id),
-                        ('state', '=', 'pending')
-                    ])
-                    if pending_approvals:
-                        self.request_id.write({'state': 'in_progress'})
-                    else:
-                        self.request_id.write({'state': 'approved'})
-            else:
-                # Pas d'approbation suivante trouvée, approuver
-                self.request_id.write({'state': 'approved'})
-        else:
-            # Pas de niveau suivant, c'est le dernier niveau, approuver
-            self.request_id.write({'state': 'approved'})
-        
-        state_after = self.request_id.state
-        if state_after == 'approved':
-            return self._redirect_to_request(
-                title='✅ Demande approuvée',
-                message=f'La demande « {self.request_id.name} » a été approuvée et clôturée.',
-                notif_type='success',
-            )
-        return self._redirect_to_request(
-            title='✅ Validation transmise',
-            message=f'La demande « {self.request_id.name} » passe au niveau suivant.',
-            notif_type='success',
-        )
-
-    def action_reject(self):
-        """Refuser la demande"""
-        self.ensure_one()
-        
-        if not self.current_approval_id:
-            raise UserError("Aucune approbation en attente trouvée.")
-        
-        # Transférer les fichiers joints
-        self._transfer_attachments_to_approval()
-
-        # Mettre à jour l'approbation
-        self.current_approval_id.write({
-            'state': 'rejected',
-            'comments': self.comment,
-        })
-        
-        # Créer un commentaire dans l'historique
-        self.env['workflow.request.comment'].create({
-            'name': f"Rejet - {self.current_approval_id.workflow_level_id.name}",
-            'request_id': self.request_id.id,
-            'approval_id': self.current_approval_id.id,
-            'user_id': self.env.user.id,
-            'comment_type': 'rejection_reason',
-            'message': self.comment,
-            'author_level_sequence': self.current_approval_id.workflow_level_id.sequence,
-        })
-        
-        # Refuser la demande complète
-        self.request_id.write({'state': 'rejected'})
-        return self._redirect_to_request(
-            title='❌ Demande refusée',
-            message=f'La demande « {self.request_id.name} » a été refusée.',
-            notif_type='danger',
-        )
-
-    def action_return(self):
-        """Retourner au niveau précédent"""
-        self.ensure_one()
-        
-        if not self.current_approval_id:
-            raise UserError("Aucune approbation en attente trouvée.")
-        
-        # Transférer les fichiers joints
-        self._transfer_attachments_to_approval()
-
-        # Mettre à jour l'approbation courante
-        self.current_approval_id.write({
-            'state': 'returned',
-            'comments': self.comment,
-        })
-        
-        # Créer un commentaire dans l'historique
-        self.env['workflow.request.comment'].create({
-            'name': f"Retour - {self.current_approval_id.workflow_level_id.name}",
-            'request_id': self.request_id.id,
-            'approval_id': self.current_approval_id.id,
-            'user_id': self.env.user.id,
-            'comment_type': 'return',
-            'message': self.comment,
-            'author_level_sequence': self.current_approval_id.workflow_level_id.sequence,
-        })
-        
-        # Trouver le niveau précédent
-        current_level = self.current_approval_id.workflow_level_id
-        previous_level = self.env['workflow.level'].search([
-            ('workflow_definition_id', '=', current_level.workflow_definition_id.id),
-            ('sequence', '<', current_level.sequence)
-        ], order='sequence desc', limit=1)
-        
-        if previous_level:
-            previous_approval = self.env['workflow.request.approval'].search([
-                ('workflow_request_id', '=', self.request_id.id),
-                ('workflow_level_id', '=', previous_level.id)
-            ], limit=1)
-            if previous_approval:
-                previous_approval.write({'state': 'pending'})
-
-        return self._redirect_to_request(
-            title='↩️ Demande retournée',
-            message=f'La demande « {self.request_id.name} » a été retournée au niveau précédent.',
-            notif_type='warning',
-        )
+        return self._open_decision_form(pending_approvals)
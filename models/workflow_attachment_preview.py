@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import logging
+
+import psycopg2
+
+from odoo import models, fields, api, tools
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import fitz  # PyMuPDF : rendu de la première page des PDF
+except ImportError:
+    fitz = None
+
+# Plus grand côté (pixels) des aperçus générés
+ATTACHMENT_PREVIEW_MAX_SIZE = 1024
+# Résolution de rendu de la première page d'un PDF
+ATTACHMENT_PREVIEW_PDF_DPI = 110
+# Nombre d'aperçus calculés par passage du cron
+ATTACHMENT_PREVIEW_BATCH_SIZE = 20
+
+
+class WorkflowAttachmentPreview(models.Model):
+    """Aperçu allégé d'une pièce jointe : image réduite, ou première page
+    rasterisée pour un PDF.
+
+    Un aperçu est calculé une seule fois par contenu (``checksum`` de
+    ``ir.attachment``) et partagé par toutes les pièces jointes identiques ;
+    l'image est stockée dans le filestore comme les pièces jointes elles-mêmes.
+    Le rendu n'a jamais lieu pendant l'affichage d'une page : l'aperçu est mis
+    en file (``pending``) quand la pièce jointe est rattachée à une demande ou à
+    un courrier, puis calculé par le cron
+    ``ir_cron_workflow_attachment_preview`` ; d'ici là la route d'aperçu sert
+    une image d'attente.
+    """
+    _name = 'workflow.attachment.preview'
+    _description = 'Aperçu de pièce jointe'
+    _log_access = False
+
+    checksum = fields.Char(string='Empreinte du contenu', required=True, readonly=True)
+    mimetype = fields.Char(string='Type du fichier source', readonly=True)
+    attachment_id = fields.Many2one(
+        'ir.attachment', string='Pièce jointe source', readonly=True, ondelete='set null',
+        help="Pièce jointe dont le contenu sert au calcul de l'aperçu")
+    image = fields.Binary(string='Aperçu', attachment=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'En préparation'),
+        ('done', 'Disponible'),
+        ('unsupported', 'Non disponible'),
+    ], string='État', required=True, default='pending', readonly=True, index=True)
+
+    _sql_constraints = [
+        ('checksum_uniq', 'unique(checksum)', "Un seul aperçu par contenu de pièce jointe."),
+    ]
+
+    @api.model
+    def _can_preview(self, mimetype):
+        """Vrai si un aperçu peut être calculé pour ce type de fichier."""
+        mimetype = mimetype or ''
+        return mimetype.startswith('image/') or ('pdf' in mimetype and bool(fitz))
+
+    @api.model
+    def _get_previews(self, attachments):
+        """Aperçus existants des pièces jointes ``attachments`` (lecture seule).
+
+        :return: ``{attachment_id: workflow.attachment.preview}`` (tous états)
+        """
+        attachments = attachments.sudo().filtered('checksum')
+        if not attachments:
+            return {}
+        by_checksum = {
+            preview.checksum: preview
+            for preview in self.sudo().search([('checksum', 'in', list(set(attachments.mapped('checksum'))))])
+        }
+        return {
+            attachment.id: by_checksum[attachment.checksum]
+            for attachment in attachments
+            if attachment.checksum in by_checksum
+        }
+
+    @api.model
+    def _queue_previews(self, attachments):
+        """Met en file pour le cron les aperçus manquants de ``attachments``
+        (appelé quand des pièces jointes sont rattachées à un dossier ; aucun rendu ici).
+
+        :return: ``{attachment_id: workflow.attachment.preview}`` (tous états)
+        """
+        Preview = self.sudo()
+        attachments = attachments.sudo().filtered(
+            lambda attachment: attachment.checksum and self._can_preview(attachment.mimetype))
+        previews = self._get_previews(attachments)
+        by_checksum = {preview.checksum: preview for preview in previews.values()}
+        queued = False
+        for attachment in attachments:
+            if attachment.checksum not in by_checksum:
+                by_checksum[attachment.checksum] = Preview._queue(attachment)
+                queued = True
+        if queued:
+            # Réveille le worker dès la fin de la transaction
+            cron = self.env.ref('workflow.ir_cron_workflow_attachment_preview', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+        return {attachment.id: by_checksum[attachment.checksum] for attachment in attachments}
+
+    @api.model
+    def _queue(self, attachment):
+        """Enregistre l'aperçu à calculer d'une pièce jointe (une fois par contenu)."""
+        try:
+            with self.env.cr.savepoint():
+                return self.create({
+                    'checksum': attachment.checksum,
+                    'mimetype': attachment.mimetype,
+                    'attachment_id': attachment.id,
+                })
+        except psycopg2.IntegrityError:
+            # Mis en file en parallèle par une autre transaction (visible aux appels suivants)
+            return self.search([('checksum', '=', attachment.checksum)], limit=1)
+
+    # ── Calcul (cron) ─────────────────────────────────────────────────────
+    @api.model
+    def _cron_generate(self, batch_size=ATTACHMENT_PREVIEW_BATCH_SIZE):
+        """Calcule un lot d'aperçus en attente ; se relance s'il en reste."""
+        previews = self.sudo().search([('state', '=', 'pending')], limit=batch_size + 1)
+        has_more = len(previews) > batch_size
+        for preview in previews[:batch_size]:
+            preview._generate()
+        if has_more:
+            self.env.ref('workflow.ir_cron_workflow_attachment_preview')._trigger()
+
+    def _generate(self):
+        """Calcule et enregistre l'image de l'aperçu à partir de sa pièce jointe."""
+        self.ensure_one()
+        attachment = self.attachment_id
+        if not attachment or attachment.checksum != self.checksum:
+            # Source supprimée ou modifiée : une autre pièce jointe de même contenu ?
+            attachment = self.env['ir.attachment'].sudo().search([('checksum', '=', self.checksum)], limit=1)
+        image = attachment and self._render_preview(attachment.raw, attachment.mimetype or '')
+        self.write({
+            'image': image and base64.b64encode(image),
+            'state': 'done' if image else 'unsupported',
+        })
+
+    @api.model
+    def _render_preview(self, data, mimetype):
+        """Image JPEG réduite (bytes) du contenu ``data``, ou ``False``."""
+        if not data:
+            return False
+        try:
+            if mimetype.startswith('image/'):
+                source = data
+            elif 'pdf' in mimetype and fitz:
+                with fitz.open(stream=data, filetype='pdf') as document:
+                    if not document.page_count:
+                        return False
+                    source = document.load_page(0).get_pixmap(dpi=ATTACHMENT_PREVIEW_PDF_DPI).tobytes('png')
+            else:
+                return False
+            return tools.image_process(
+                source,
+                size=(ATTACHMENT_PREVIEW_MAX_SIZE, ATTACHMENT_PREVIEW_MAX_SIZE),
+                quality=80,
+                output_format='JPEG',
+            )
+        except Exception as error:
+            _logger.info("Workflow: aperçu impossible (%s) : %s", mimetype, error)
+            return False
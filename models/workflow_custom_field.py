@@ -40,3 +40,23 @@ class WorkflowCustomField(models.Model):
         if not self.selection_options:
             return []
         return [line.strip() for line in self.selection_options.split('\n') if line.strip()]
+
+    # ── Synchronisation de workflow.request.custom_values ─────────────────
+    def _get_value_requests(self):
+        return self.env['workflow.request.custom.value'].sudo().search([
+            ('custom_field_id', 'in', self.ids),
+        ]).mapped('request_id')
+
+    def write(self, vals):
+        result = super().write(vals)
+        if 'field_type' in vals:
+            # Valeurs JSON typées selon le nouveau type
+            self._get_value_requests()._sync_custom_values()
+        return result
+
+    def unlink(self):
+        # Les valeurs sont supprimées en cascade (SQL) : recopie après suppression
+        requests = self._get_value_requests()
+        result = super().unlink()
+        requests._sync_custom_values()
+        return result
@@ -1,6 +1,62 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import AccessError
+from datetime import datetime
+
+# ── Cache des tableaux de bord (par processus) ────────────────────────────
+# Clé : (base, utilisateur, société, mode, page) → (génération, expiration, contenu).
+# La génération est la valeur courante d'une séquence PostgreSQL incrémentée
+# après chaque commit qui modifie l'état d'une demande ou d'un courrier, puis
+# de nouveau après la mise à jour de la table de faits (workflow.stats.daily,
+# traitée plus tard par l'outbox) : tous les workers voient l'invalidation sans
+# coordination. Les compteurs reflètent la table de faits, qui peut être en
+# retard sur les demandes tant que l'outbox n'est pas passé.
+DASHBOARD_CACHE_SEQUENCE = 'workflow_dashboard_cache_seq'
+DASHBOARD_CACHE_TTL_PARAM = 'workflow.dashboard_cache_ttl'
+DASHBOARD_CACHE_DEFAULT_TTL = 60  # secondes ; 0 désactive le cache
+DASHBOARD_CACHE_MAX_ENTRIES = 2000
+
+# Nombre de lignes des listes récentes (une page)
+DASHBOARD_PAGE_SIZE = 10
+
+# Colonnes lues pour les listes récentes, par modèle (voir _project_rows)
+DASHBOARD_ROW_FIELDS = {
+    'workflow.request': [
+        'name', 'create_date', 'write_date', 'requester_id', 'client_name', 'subject',
+        'amount', 'credit_type', 'workflow_type_id', 'state',
+    ],
+    'workflow.courrier.entrant': [
+        'name', 'date_reception', 'write_date', 'expediteur', 'objet',
+        'type_courrier', 'priorite', 'state',
+    ],
+}
+
+# Couleur des pastilles d'état du tableau de bord HTML
+DASHBOARD_STATE_COLORS = {
+    'submitted': '#0d6efd',
+    'in_progress': '#ffc107',
+    'approved': '#28a745',
+    'rejected': '#dc3545',
+    'en_validation': '#0d6efd',
+    'traite': '#28a745',
+}
+
+# Canal et type des notifications de changement d'état (tableau de bord OWL).
+# Le canal est lié au groupe base.group_user et ajouté côté serveur
+# (ir.websocket._build_bus_channel_list) : un client ne peut pas s'y abonner lui-même.
+# Les messages ne portent que des ids et des états, les lignes sont relues sous
+# les droits de chaque utilisateur.
+DASHBOARD_BUS_CHANNEL = 'workflow_dashboard'
+DASHBOARD_BUS_NOTIFICATION = 'workflow_dashboard/changes'
+
+_dashboard_cache = {}
+_dashboard_cache_lock = threading.Lock()
+_dashboard_cache_stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'builds': 0, 'build_time': 0.0})
+
 
 class WorkflowDashboard(models.TransientModel):
     _name = 'workflow.dashboard'
@@ -15,15 +71,29 @@ class WorkflowDashboard(models.TransientModel):
 
     stats_html = fields.Html('Statistiques', compute='_compute_stats_html')
     page = fields.Integer('Page courante', default=1)
+    # Pagination par curseur (keyset) : clé de tri (date, id) de la ligne de référence
+    cursor_date = fields.Char('Curseur (date)')
+    cursor_id = fields.Integer('Curseur (id)')
+    cursor_direction = fields.Selection([
+        ('next', 'Lignes suivantes'),
+        ('prev', 'Lignes précédentes'),
+    ], string='Sens du curseur', default='next')
 
     @api.model
-    def action_open_dashboard(self, page=1, mode='credit'):
-        """Créer et ouvrir le dashboard (crédit ou courrier)."""
+    def action_open_dashboard(self, page=1, mode='credit', cursor=None, direction='next'):
+        """Créer et ouvrir le dashboard (crédit ou courrier).
+
+        :param cursor: clé ``(date, id)`` de la ligne après (``direction='next'``)
+                       ou avant (``'prev'``) laquelle commence la page ; première page si vide
+        """
         title = 'Tableau de bord Crédit' if mode == 'credit' else 'Tableau de bord Courrier'
         dashboard = self.create({
             'page': page,
             'mode': mode,
             'name': title,
+            'cursor_date': cursor[0] if cursor else False,
+            'cursor_id': cursor[1] if cursor else 0,
+            'cursor_direction': direction,
         })
         return {
             'type': 'ir.actions.act_window',
@@ -47,51 +117,368 @@ class WorkflowDashboard(models.TransientModel):
         return action
 
     def action_previous_page(self):
-        """Page précédente"""
+        """Page précédente : les lignes placées avant la première ligne affichée."""
+        mode = self.mode or 'credit'
         if self.page <= 1:
             return
-        return self.action_open_dashboard(page=self.page - 1, mode=self.mode or 'credit')
+        rows = self._get_current_page_rows()
+        if self.page == 2 or not rows:
+            return self.action_open_dashboard(page=1, mode=mode)
+        return self.action_open_dashboard(
+            page=self.page - 1, mode=mode, cursor=self._keyset_key(rows[0]), direction='prev',
+        )
     
     def action_next_page(self):
-        """Page suivante"""
+        """Page suivante : les lignes placées après la dernière ligne affichée
+        (aucun comptage, une seule ligne lue pour savoir s'il en reste)."""
         mode = self.mode or 'credit'
+        rows = self._get_current_page_rows()
+        if len(rows) < DASHBOARD_PAGE_SIZE:
+            return
+        Model, domain, date_field = self._get_page_source(mode)
+        cursor = self._keyset_key(rows[-1])
+        if not self._keyset_page(Model, domain, date_field, cursor, limit=1):
+            return
+        return self.action_open_dashboard(page=self.page + 1, mode=mode, cursor=cursor)
+
+    # ── Pagination par curseur (keyset) ───────────────────────────────────
+    @api.model
+    def _get_page_source(self, mode):
+        """Retourne ``(modèle, domaine, champ date)`` de la liste récente du mode."""
+        if mode == 'courrier':
+            return self.env['workflow.courrier.entrant'], [], 'date_reception'
+        return self.env['workflow.request'], [('workflow_type_id.category', '=', 'credit')], 'create_date'
+
+    @api.model
+    def _keyset_page(self, Model, domain, date_field, cursor=None, direction='next', limit=DASHBOARD_PAGE_SIZE):
+        """Lignes triées par ``(date_field desc, id desc)`` situées après (``next``)
+        ou avant (``prev``) la clé ``cursor = (date, id)``.
+
+        Le coût ne dépend pas de la profondeur de la page : la condition sur la
+        clé est résolue par l'index composite ``(date_field, id)``.
+        """
+        if not cursor:
+            return Model.search(domain, order=f'{date_field} desc, id desc', limit=limit)
+        value, record_id = cursor
+        operator = '<' if direction == 'next' else '>'
+        domain = domain + [
+            '|', (date_field, operator, value),
+            '&', (date_field, '=', value), ('id', operator, record_id),
+        ]
+        if direction == 'next':
+            return Model.search(domain, order=f'{date_field} desc, id desc', limit=limit)
+        rows = Model.search(domain, order=f'{date_field} asc, id asc', limit=limit)
+        return Model.browse(rows.ids[::-1])
+
+    @api.model
+    def _keyset_key(self, record):
+        """Clé de curseur ``(date ISO complète, id)`` d'une ligne."""
+        date_field = 'date_reception' if record._name == 'workflow.courrier.entrant' else 'create_date'
+        return self._cursor_date(record[date_field]), record.id
+
+    @api.model
+    def _cursor_date(self, value):
+        """Date ou date/heure du curseur, microsecondes comprises : ``create_date``
+        (``cr.now()``) est partagé par toutes les lignes d'un même ``create`` multiple,
+        une valeur tronquée à la seconde ferait sauter ou répéter des lignes."""
+        if isinstance(value, datetime):
+            return value.isoformat(sep=' ', timespec='microseconds')
+        return value.isoformat()
+
+    @api.model
+    def _parse_cursor(self, value):
+        """``"<date>,<id>"`` → ``(date, id)`` ; ``None`` si absent ou invalide."""
+        if not value:
+            return None
+        date_value, _sep, record_id = value.rpartition(',')
+        try:
+            datetime.fromisoformat(date_value)
+            return date_value, int(record_id)
+        except ValueError:
+            return None
+
+    @api.model
+    def _format_cursor(self, record):
+        """Clé de curseur d'une ligne sous forme de chaîne ``"<date>,<id>"``."""
+        if not record:
+            return None
+        date_value, record_id = self._keyset_key(record)
+        return f'{date_value},{record_id}'
+
+    def _get_current_page_rows(self):
+        self.ensure_one()
+        Model, domain, date_field = self._get_page_source(self.mode or 'credit')
+        cursor = (self.cursor_date, self.cursor_id) if self.cursor_date else None
+        return self._keyset_page(Model, domain, date_field, cursor, self.cursor_direction or 'next')
+
+    # ── API JSON (tableau de bord OWL) ────────────────────────────────────
+    @api.model
+    def get_dashboard_payload(self, mode='credit', cursor=None, direction='next', page=1):
+        """Données compactes du tableau de bord client : statistiques et une page de lignes.
+
+        Aucun enregistrement transitoire n'est créé ; le résultat est mis en
+        cache comme le tableau de bord HTML.
+
+        :param cursor: ``"<date>,<id>"`` de la ligne de référence (voir ``_keyset_page``)
+        :param direction: ``'next'`` (lignes après le curseur) ou ``'prev'``
+        :return: ``{'mode', 'page', 'total_pages', 'stats', 'rows', 'next_cursor', 'prev_cursor'}``
+                 (``stats['monthly']`` : série des 12 derniers mois en mode crédit) ;
+                 chaque ligne porte un ``version`` (``write_date``) pour ne
+                 redessiner côté client que les lignes modifiées.
+        """
+        mode = 'courrier' if mode == 'courrier' else 'credit'
+        direction = 'prev' if direction == 'prev' else 'next'
+        cursor_key = self._parse_cursor(cursor)
+        page = max(1, int(page or 1)) if cursor_key else 1
+        page_key = ('json', page, cursor_key, direction)
+        payload, generation = self._dashboard_cache_get(mode, page_key)
+        if payload is not None:
+            return payload
+        started = time.perf_counter()
+
+        Model, domain, date_field = self._get_page_source(mode)
+        records = self._keyset_page(Model, domain, date_field, cursor_key, direction)
         if mode == 'courrier':
-            Model = self.env['workflow.courrier.entrant']
-            total = Model.search_count([])
+            counts = dict(Model._read_group([], groupby=['state'], aggregates=['__count']))
+            stats = {
+                'total': sum(counts.values()),
+                'en_validation': counts.get('en_validation', 0),
+                'traite': counts.get('traite', 0),
+                'cloture': counts.get('cloture', 0),
+            }
+        else:
+            full_stats = Model._get_dashboard_stats('credit')
+            stats = {key: full_stats[key] for key in (
+                'total', 'total_trend', 'in_progress', 'approved', 'rejected', 'approval_rate', 'rejection_trend',
+            )}
+            stats['monthly'] = self.env['workflow.stats.daily'].get_monthly_series('credit')
+        rows = self._dashboard_rows(records)
+
+        has_next = len(records) == DASHBOARD_PAGE_SIZE and bool(self._keyset_page(
+            Model, domain, date_field, self._keyset_key(records[-1]), limit=1,
+        ))
+        return self._dashboard_cache_put(mode, page_key, generation, {
+            'mode': mode,
+            'page': page,
+            'total_pages': max(1, (stats['total'] + DASHBOARD_PAGE_SIZE - 1) // DASHBOARD_PAGE_SIZE),
+            'stats': stats,
+            'rows': rows,
+            'next_cursor': self._format_cursor(records[-1:]) if has_next else None,
+            'prev_cursor': self._format_cursor(records[:1]) if page > 1 else None,
+        }, started)
+
+    @api.model
+    def _dashboard_rows(self, records):
+        """Lignes compactes (demandes ou courriers) affichées par le tableau de bord OWL."""
+        is_courrier = records._name == 'workflow.courrier.entrant'
+        date_field = 'date_reception' if is_courrier else 'create_date'
+        return [{
+            'id': row['id'],
+            'version': self._cursor_date(row['write_date']),
+            'cursor': f"{self._cursor_date(row[date_field])},{row['id']}",
+            'name': row['name'],
+            'title': row['objet'] if is_courrier else row['subject'],
+            'partner': row['expediteur'] if is_courrier else row['client_name'],
+            'amount': 0 if is_courrier else row['amount'],
+            'state': row['state'],
+            'state_label': row['state_label'],
+            'date': fields.Date.to_string(fields.Date.to_date(row[date_field])),
+        } for row in self._project_rows(records)]
+
+    # ── Projection des lignes ─────────────────────────────────────────────
+    @api.model
+    def _project_rows(self, records):
+        """Lit d'un coup les colonnes ``DASHBOARD_ROW_FIELDS`` de ``records``.
+
+        Une seule lecture SQL des colonnes (plus une par modèle lié pour les
+        noms des many2one) au lieu d'un accès champ par champ et ligne par
+        ligne ; chaque champ de sélection ``f`` est complété par ``f_label``.
+
+        :return: liste de dictionnaires, dans l'ordre de ``records`` ; les
+                 many2one sont des ``(id, nom)`` ou ``False``
+        """
+        rows = records.read(DASHBOARD_ROW_FIELDS[records._name])
+        labels = self._get_selection_labels(records._name)
+        for row in rows:
+            for fname, mapping in labels.items():
+                row[f'{fname}_label'] = mapping.get(row[fname], row[fname] or '-')
+        return rows
+
+    @api.model
+    @tools.ormcache('model_name', 'self.env.lang')
+    def _get_selection_labels(self, model_name):
+        """Libellés des champs de sélection projetés : ``{champ: {valeur: libellé}}``."""
+        Model = self.env[model_name]
+        return {
+            fname: dict(Model._fields[fname]._description_selection(self.env))
+            for fname in DASHBOARD_ROW_FIELDS[model_name]
+            if Model._fields[fname].type == 'selection'
+        }
+
+    # ── Mises à jour en direct (bus) ──────────────────────────────────────
+    @api.model
+    def _notify_dashboard(self, records, old_states=None):
+        """Met en file (``workflow.outbox``) la création ou le changement d'état
+        de ``records`` ; le message de bus part hors de la transaction de l'approbateur.
+
+        Un seul événement par appel. Chaque changement ne porte que l'id, l'état
+        et l'état précédent (``False`` à la création) : le client ajuste ses
+        compteurs et relit les lignes sous ses propres droits (``get_dashboard_rows``).
+
+        :param old_states: ``{id: état avant écriture}`` ; ``None`` pour une création
+        """
+        if records._name == 'workflow.request':
+            mode = 'credit'
+            records = records.filtered(lambda r: r.workflow_type_id.category == 'credit')
         else:
-            Request = self.env['workflow.request']
-            total = Request.search_count([('workflow_type_id.category', '=', 'credit')])
+            mode = 'courrier'
+        if old_states is not None:
+            records = records.filtered(lambda r: old_states.get(r.id) != r.state)
+        if not records:
+            return
+        self.env['workflow.outbox']._enqueue_event('dashboard_changed', {
+            'events': [{
+                'mode': mode,
+                'id': record.id,
+                'old_state': (old_states or {}).get(record.id, False),
+                'state': record.state,
+            } for record in records],
+        })
+
+    @api.model
+    def _send_dashboard_events(self, events):
+        """Publie ``events`` (voir ``_notify_dashboard``) en un seul message de bus."""
+        channel = self._dashboard_bus_channel()
+        if events and channel:
+            self.env['bus.bus']._sendone(channel, DASHBOARD_BUS_NOTIFICATION, {'events': events})
+
+    @api.model
+    def _dashboard_bus_channel(self):
+        """Canal ``(groupe, 'workflow_dashboard')`` des utilisateurs internes."""
+        group = self.env.ref('base.group_user', raise_if_not_found=False)
+        return (group, DASHBOARD_BUS_CHANNEL) if group else None
+
+    @api.model
+    def get_dashboard_rows(self, mode, ids):
+        """Lignes ``ids`` du mode, relues sous les droits de l'utilisateur
+        (mises à jour reçues par le bus)."""
+        Model, domain, _date_field = self._get_page_source(mode)
+        return self._dashboard_rows(Model.search(domain + [('id', 'in', [int(i) for i in ids])]))
+
+    def init(self):
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {DASHBOARD_CACHE_SEQUENCE}")
+
+    # ── Cache des tableaux de bord ────────────────────────────────────────
+    def _dashboard_cache_key(self, mode, page):
+        return (self.env.cr.dbname, self.env.uid, self.env.company.id, mode, page)
+
+    @api.model
+    def _dashboard_cache_generation(self):
+        self.env.cr.execute(f"SELECT last_value FROM {DASHBOARD_CACHE_SEQUENCE}")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _dashboard_cache_get(self, mode, page):
+        """Retourne ``(contenu en cache ou None, génération courante)``."""
+        generation = self._dashboard_cache_generation()
+        entry = _dashboard_cache.get(self._dashboard_cache_key(mode, page))
+        stats = _dashboard_cache_stats[self.env.cr.dbname]
+        if entry and entry[0] == generation and entry[1] > time.monotonic():
+            stats['hits'] += 1
+            return entry[2], generation
+        stats['misses'] += 1
+        return None, generation
+
+    @api.model
+    def _dashboard_cache_put(self, mode, page, generation, payload, started):
+        """Mémorise ``payload``, construit depuis ``started`` (``time.perf_counter()``)."""
+        stats = _dashboard_cache_stats[self.env.cr.dbname]
+        stats['builds'] += 1
+        stats['build_time'] += time.perf_counter() - started
+        ttl = int(self.env['ir.config_parameter'].sudo().get_param(
+            DASHBOARD_CACHE_TTL_PARAM, DASHBOARD_CACHE_DEFAULT_TTL,
+        ))
+        if ttl > 0:
+            with _dashboard_cache_lock:
+                if len(_dashboard_cache) >= DASHBOARD_CACHE_MAX_ENTRIES:
+                    _dashboard_cache.pop(next(iter(_dashboard_cache)))
+                _dashboard_cache[self._dashboard_cache_key(mode, page)] = (
+                    generation, time.monotonic() + ttl, payload,
+                )
+        return payload
 
-        total_pages = max(1, (total + 9) // 10)
-        if self.page >= total_pages:
+    @api.model
+    def _invalidate_dashboard_cache(self):
+        """Invalide les tableaux de bord de tous les workers, une fois la transaction validée."""
+        cr = self.env.cr
+        if cr.postcommit.data.get('workflow.dashboard.cache_bump'):
             return
-        return self.action_open_dashboard(page=self.page + 1, mode=mode)
+        cr.postcommit.data['workflow.dashboard.cache_bump'] = True
+        registry = self.env.registry
+
+        @cr.postcommit.add
+        def bump_generation():
+            with registry.cursor() as bump_cr:
+                bump_cr.execute(f"SELECT nextval('{DASHBOARD_CACHE_SEQUENCE}')")
+
+    @api.model
+    def get_dashboard_cache_stats(self):
+        """Indicateurs du cache (processus courant) pour la supervision."""
+        if not self.env.user.has_group('base.group_system'):
+            raise AccessError("Réservé aux administrateurs.")
+        dbname = self.env.cr.dbname
+        stats = _dashboard_cache_stats[dbname]
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_ratio': round(stats['hits'] / lookups * 100, 1) if lookups else 0,
+            'builds': stats['builds'],
+            'avg_build_ms': round(stats['build_time'] / stats['builds'] * 1000, 1) if stats['builds'] else 0,
+            'entries': sum(1 for key in list(_dashboard_cache) if key[0] == dbname),
+            'generation': self._dashboard_cache_generation(),
+        }
+
+    @api.model
+    def _trend_html(self, trend, increase_is_good=True):
+        """Évolution mensuelle d'une carte (``_get_dashboard_stats``), comme ``formatTrend`` côté OWL."""
+        arrow = '↗' if trend > 0 else ('↘' if trend < 0 else '→')
+        color = '#28a745' if (trend >= 0) == increase_is_good else '#dc3545'
+        if not trend:
+            color = '#6c757d'
+        sign = '+' if trend > 0 else ''
+        return f'<div style="color: {color}; font-size: 13px; font-weight: 600;">{arrow} {sign}{trend}% vs mois dernier</div>'
 
     @api.depends('page', 'mode')
     def _compute_stats_html(self):
         """Génère le HTML du dashboard avec statistiques et listes récentes,
-        en séparant Crédit et Courrier.
+        en séparant Crédit et Courrier (mis en cache, voir ``_dashboard_cache_get``).
         """
         for rec in self:
             mode = rec.mode or 'credit'
             page = rec.page or 1
-            limit = 10
-            offset = (page - 1) * limit
+            page_key = (page, rec.cursor_date, rec.cursor_id, rec.cursor_direction)
+            html, generation = self._dashboard_cache_get(mode, page_key)
+            if html is not None:
+                rec.stats_html = html
+                continue
+            started = time.perf_counter()
+            limit = DASHBOARD_PAGE_SIZE
 
             # ── TABLEAU DE BORD CRÉDIT ─────────────────────────────────────
             if mode == 'credit':
                 Request = self.env['workflow.request']
-                base_domain = [('workflow_type_id.category', '=', 'credit')]
 
-                total_requests = Request.search_count(base_domain)
-                in_progress_requests = Request.search_count(base_domain + [('state', 'in', ['submitted', 'in_progress'])])
-                approved_requests = Request.search_count(base_domain + [('state', '=', 'approved')])
-                rejected_requests = Request.search_count(base_domain + [('state', '=', 'rejected')])
+                stats = Request._get_dashboard_stats('credit')
+                total_requests = stats['total']
+                in_progress_requests = stats['in_progress']
+                approved_requests = stats['approved']
+                rejected_requests = stats['rejected']
 
                 approval_rate = int((approved_requests / total_requests * 100)) if total_requests > 0 else 0
                 total_pages = (total_requests + limit - 1) // limit if total_requests > 0 else 1
 
-                recent_requests = Request.search(base_domain, order='create_date desc', limit=limit, offset=offset)
+                recent_requests = self._project_rows(rec._get_current_page_rows())
 
                 html = '''
                 <div style="padding: 30px; background: #f8f9fa;">
@@ -112,7 +499,7 @@ class WorkflowDashboard(models.TransientModel):
                                 </div>
                                 <div style="width: 48px; height: 48px; background: #e7f0ff; border-radius: 12px; display: flex; align-items: center; justify-content: center; font-size: 24px;">📋</div>
                             </div>
-                            <div style="color: #28a745; font-size: 13px; font-weight: 600;">↗ 100% ce mois</div>
+                            {5}
                         </div>
                         
                         <!-- Carte En cours -->
@@ -148,7 +535,7 @@ class WorkflowDashboard(models.TransientModel):
                                 </div>
                                 <div style="width: 48px; height: 48px; background: #ffebee; border-radius: 12px; display: flex; align-items: center; justify-content: center; font-size: 24px;">✗</div>
                             </div>
-                            <div style="color: #6c757d; font-size: 13px; font-weight: 600;">↘ 0% vs mois dernier</div>
+                            {6}
                         </div>
                     </div>
                     
@@ -172,23 +559,19 @@ class WorkflowDashboard(models.TransientModel):
                                 </tr>
                             </thead>
                             <tbody>
-                '''.format(total_requests, in_progress_requests, approved_requests, rejected_requests, approval_rate)
-
-                state_labels = {
-                    'draft': ('● Brouillon', '#6c757d'),
-                    'submitted': ('● Soumis', '#0d6efd'),
-                    'in_progress': ('● En cours', '#ffc107'),
-                    'approved': ('● Approuvée', '#28a745'),
-                    'rejected': ('● Rejetée', '#dc3545'),
-                }
+                '''.format(
+                    total_requests, in_progress_requests, approved_requests, rejected_requests, approval_rate,
+                    self._trend_html(stats['total_trend']),
+                    self._trend_html(stats['rejection_trend'], increase_is_good=False),
+                )
 
                 for req in recent_requests:
-                    state_label, state_color = state_labels.get(req.state, ('● ' + req.state, '#6c757d'))
-                    create_date = fields.Datetime.from_string(req.create_date).strftime('%d/%m/%Y')
+                    state_color = DASHBOARD_STATE_COLORS.get(req['state'], '#6c757d')
+                    create_date = req['create_date'].strftime('%d/%m/%Y')
 
                     amount_display = '-'
-                    if hasattr(req, 'amount') and req.amount:
-                        amount_display = '{:,.0f} FCFA'.format(req.amount).replace(',', ' ')
+                    if req['amount']:
+                        amount_display = '{:,.0f} FCFA'.format(req['amount']).replace(',', ' ')
 
                     html += '''
                                 <tr style="border-bottom: 1px solid #f0f0f0;">
@@ -201,13 +584,13 @@ class WorkflowDashboard(models.TransientModel):
                                     <td style="padding: 16px 12px; color: #6c757d; font-size: 13px;">{7}</td>
                                 </tr>
                     '''.format(
-                        req.name,
-                        req.requester_id.name if req.requester_id else 'Administrator',
-                        req.subject or '-',
+                        req['name'],
+                        req['requester_id'][1] if req['requester_id'] else 'Administrator',
+                        req['subject'] or '-',
                         amount_display,
-                        req.workflow_type_id.name if req.workflow_type_id else '-',
+                        req['workflow_type_id'][1] if req['workflow_type_id'] else '-',
                         state_color,
-                        state_label,
+                        '● ' + req['state_label'],
                         create_date
                     )
 
@@ -223,18 +606,19 @@ class WorkflowDashboard(models.TransientModel):
                 </div>
             '''.format(page, total_pages)
             
-                rec.stats_html = html
+                rec.stats_html = self._dashboard_cache_put(mode, page_key, generation, html, started)
                 continue
 
             # ── TABLEAU DE BORD COURRIER ───────────────────────────────────
             Courrier = self.env['workflow.courrier.entrant']
-            total_courriers = Courrier.search_count([])
-            en_validation = Courrier.search_count([('state', '=', 'en_validation')])
-            traites = Courrier.search_count([('state', '=', 'traite')])
-            clotures = Courrier.search_count([('state', '=', 'cloture')])
+            courrier_counts = dict(Courrier._read_group([], groupby=['state'], aggregates=['__count']))
+            total_courriers = sum(courrier_counts.values())
+            en_validation = courrier_counts.get('en_validation', 0)
+            traites = courrier_counts.get('traite', 0)
+            clotures = courrier_counts.get('cloture', 0)
             total_pages = (total_courriers + limit - 1) // limit if total_courriers > 0 else 1
 
-            recent_courriers = Courrier.search([], order='date_reception desc', limit=limit, offset=offset)
+            recent_courriers = self._project_rows(rec._get_current_page_rows())
 
             html = '''
                 <div style="padding: 30px; background: #f8f9fa;">
@@ -312,30 +696,9 @@ class WorkflowDashboard(models.TransientModel):
                             <tbody>
             '''.format(total_courriers, en_validation, traites, clotures)
 
-            state_labels = {
-                'recu': ('● Reçu', '#6c757d'),
-                'en_validation': ('● En validation', '#0d6efd'),
-                'traite': ('● Traité', '#28a745'),
-                'cloture': ('● Clôturé', '#6c757d'),
-            }
-
-            type_labels = {
-                'lettre': 'Lettre',
-                'email': 'Email',
-                'rapport': 'Rapport',
-                'facture': 'Facture',
-                'demande': 'Demande',
-                'notification': 'Notification',
-                'autre': 'Autre',
-            }
-
-            priorite_labels = {'0': 'Normal', '1': 'Urgent', '2': 'Critique'}
-
             for c in recent_courriers:
-                state_label, state_color = state_labels.get(c.state, ('● ' + c.state, '#6c757d'))
-                date_str = c.date_reception.strftime('%d/%m/%Y') if c.date_reception else '-'
-                type_label = type_labels.get(c.type_courrier, c.type_courrier or '-')
-                priorite_label = priorite_labels.get(c.priorite, c.priorite or '-')
+                state_color = DASHBOARD_STATE_COLORS.get(c['state'], '#6c757d')
+                date_str = c['date_reception'].strftime('%d/%m/%Y') if c['date_reception'] else '-'
 
                 html += '''
                                 <tr style="border-bottom: 1px solid #f0f0f0;">
@@ -348,13 +711,13 @@ class WorkflowDashboard(models.TransientModel):
                                     <td style="padding: 16px 12px; color: #6c757d; font-size: 13px;">{7}</td>
                                 </tr>
                 '''.format(
-                    c.name,
-                    c.expediteur or '-',
-                    (c.objet or '-')[:80],
-                    type_label,
-                    priorite_label,
+                    c['name'],
+                    c['expediteur'] or '-',
+                    (c['objet'] or '-')[:80],
+                    c['type_courrier_label'],
+                    c['priorite_label'],
                     state_color,
-                    state_label,
+                    '● ' + c['state_label'],
                     date_str,
                 )
 
@@ -369,4 +732,4 @@ class WorkflowDashboard(models.TransientModel):
                 </div>
             '''.format(page, total_pages)
 
-            rec.stats_html = html
+            rec.stats_html = self._dashboard_cache_put(mode, page_key, generation, html, started)
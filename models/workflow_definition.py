@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields
+from odoo import models, fields, tools
+from odoo.tools import frozendict
+
+# Séquence PostgreSQL des versions de graphe : jamais réutilisée, même après
+# l'annulation d'une transaction, une version désigne toujours le même contenu.
+CIRCUIT_GRAPH_VERSION_SEQUENCE = 'workflow_definition_graph_version_seq'
 
 
 class WorkflowDefinition(models.Model):
@@ -13,6 +18,79 @@ class WorkflowDefinition(models.Model):
     workflow_type_id = fields.Many2one('workflow.type', string='Type de Workflow', required=True, ondelete='restrict')
     description = fields.Text(string='Description')
     active = fields.Boolean(string='Actif', default=True)
-    
+    approval_materialization = fields.Selection([
+        ('eager', 'À la soumission'),
+        ('lazy', "À l'activation de l'étape"),
+    ], string='Création des approbations', required=True, default='eager',
+        help="À la soumission : les approbations de toutes les étapes sont créées d'emblée "
+             "(état « En attente du niveau précédent »).\n"
+             "À l'activation de l'étape : seules celles de l'étape active existent ; "
+             "les suivantes sont créées lorsque le circuit y arrive.")
+
     # Relation avec les niveaux
     level_ids = fields.One2many('workflow.level', 'workflow_definition_id', string='Niveaux de Validation')
+    graph_version = fields.Integer(
+        string='Version du graphe', readonly=True, copy=False, default=0,
+        help="Changée à chaque modification des étapes ou des actions du circuit "
+             "(clé du graphe compilé en cache).")
+
+    def init(self):
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {CIRCUIT_GRAPH_VERSION_SEQUENCE}")
+
+    # ── Graphe compilé du circuit ─────────────────────────────────────────
+    def _get_circuit_graph(self):
+        """Graphe compilé du circuit (voir ``_compile_circuit_graph``).
+
+        La version du circuit fait partie de la clé de cache : modifier une
+        étape ou une action n'invalide que l'entrée de ce circuit
+        (``_bump_graph_version``), jamais le reste du cache du registre.
+        """
+        self.ensure_one()
+        return self._compile_circuit_graph(self.sudo().graph_version)
+
+    def _bump_graph_version(self):
+        """Change la version du graphe de ces circuits (visible par tous les
+        workers au commit ; l'ancienne entrée du cache n'est plus lue)."""
+        if not self:
+            return
+        self.env.cr.execute(
+            f"UPDATE workflow_definition SET graph_version = nextval('{CIRCUIT_GRAPH_VERSION_SEQUENCE}') WHERE id IN %s",
+            [tuple(self.ids)],
+        )
+        self.invalidate_recordset(['graph_version'])
+
+    @tools.ormcache('self.id', 'version')
+    def _compile_circuit_graph(self, version):
+        """Compile le circuit en un graphe immuable, mis en cache dans le registre.
+
+        Retourne un ``frozendict`` :
+          * ``levels``   : ids des étapes actives, dans l'ordre (séquence, id)
+          * ``sequence`` : {level_id: séquence}
+          * ``next``     : {level_id: étape suivante (séquence supérieure la plus proche)}
+          * ``prev``     : {level_id: étape précédente (séquence inférieure la plus proche)}
+          * ``actions``  : {action_id: (action_type, target_level_id ou False)}
+
+        :param version: ``graph_version`` du circuit, changée par ``workflow.level``
+                        et ``workflow.level.action`` à chaque modification du graphe
+        """
+        self.ensure_one()
+        levels = self.env['workflow.level'].sudo().search(
+            [('workflow_definition_id', '=', self.id)], order='sequence, id',
+        )
+        ordered = [(level.id, level.sequence) for level in levels]
+        next_map, prev_map = {}, {}
+        for level_id, sequence in ordered:
+            next_map[level_id] = next((lid for lid, seq in ordered if seq > sequence), False)
+            prev_map[level_id] = next((lid for lid, seq in reversed(ordered) if seq < sequence), False)
+
+        actions = self.env['workflow.level.action'].sudo().search([('level_id', 'in', levels.ids)])
+        return frozendict({
+            'levels': tuple(level_id for level_id, _seq in ordered),
+            'sequence': frozendict(ordered),
+            'next': frozendict(next_map),
+            'prev': frozendict(prev_map),
+            'actions': frozendict({
+                action.id: (action.action_type, action.target_level_id.id)
+                for action in actions
+            }),
+        })
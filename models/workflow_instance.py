@@ -4,15 +4,24 @@ from odoo import models, fields
 
 
 class WorkflowInstance(models.Model):
+    """Pointeur d'exécution d'une demande : une seule ligne par demande,
+    tenue à jour par le moteur à chaque transition."""
     _name = 'workflow.instance'
     _description = 'Instance de Workflow en Cours'
 
     name = fields.Char(string='Référence', required=True)
-    workflow_request_id = fields.Many2one('workflow.request', string='Demande de Workflow', required=True, ondelete='cascade')
+    workflow_request_id = fields.Many2one('workflow.request', string='Demande de Workflow', required=True, ondelete='cascade', index=True)
     workflow_definition_id = fields.Many2one('workflow.definition', string='Circuit Actif', required=True, ondelete='restrict')
-    current_level_id = fields.Many2one('workflow.level', string='Niveau Actuel', ondelete='restrict')
+    current_level_id = fields.Many2one('workflow.level', string='Niveau Actuel', ondelete='restrict', index=True)
     state = fields.Selection([
         ('active', 'Actif'),
         ('completed', 'Terminé'),
+        ('rejected', 'Rejeté'),
         ('cancelled', 'Annulé'),
-    ], string='État', required=True, default='active')
+    ], string='État', required=True, default='active', index=True)
+    last_transition_date = fields.Datetime(string='Dernière transition', default=fields.Datetime.now)
+
+    _sql_constraints = [
+        ('workflow_request_unique', 'unique(workflow_request_id)',
+         'Une demande ne peut avoir qu\'une seule instance de workflow.'),
+    ]
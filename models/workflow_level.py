@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api
 
+# Champs dont la modification change la structure compilée du circuit
+CIRCUIT_GRAPH_FIELDS = {'sequence', 'active', 'workflow_definition_id'}
+
 
 class WorkflowLevel(models.Model):
     _name = 'workflow.level'
@@ -66,6 +69,47 @@ class WorkflowLevel(models.Model):
             rec.approver_count = len(rec.approver_ids)
             rec.action_count = len(rec.action_ids)
 
+    # ── Invalidation du graphe compilé des circuits ──────────────────────
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records.sudo().mapped('workflow_definition_id')._bump_graph_version()
+        return records
+
+    def write(self, vals):
+        if not CIRCUIT_GRAPH_FIELDS.intersection(vals):
+            return super().write(vals)
+        # Circuits d'origine et de destination (changement de workflow_definition_id)
+        definitions = self.sudo().mapped('workflow_definition_id')
+        result = super().write(vals)
+        (definitions | self.sudo().mapped('workflow_definition_id'))._bump_graph_version()
+        return result
+
+    def unlink(self):
+        definitions = self.sudo().mapped('workflow_definition_id')
+        result = super().unlink()
+        definitions.exists()._bump_graph_version()
+        return result
+
+    # ── Navigation dans le circuit ───────────────────────────────────────
+    def _get_next_levels(self):
+        """Retourne ``{level_id: niveau suivant}`` pour chaque niveau de l'ensemble.
+
+        Résolu depuis le graphe compilé du circuit (aucune requête SQL quand le
+        graphe est en cache) ; recordset vide s'il n'y a pas d'étape suivante.
+        """
+        return {
+            level.id: self.browse(level.workflow_definition_id._get_circuit_graph()['next'].get(level.id))
+            for level in self
+        }
+
+    def _get_previous_levels(self):
+        """Retourne ``{level_id: niveau précédent}`` pour chaque niveau de l'ensemble."""
+        return {
+            level.id: self.browse(level.workflow_definition_id._get_circuit_graph()['prev'].get(level.id))
+            for level in self
+        }
+
     # ── Action pour ouvrir le formulaire en popup ────────────────────────
     def action_open_form(self):
         """Ouvre le formulaire de l'étape en popup.
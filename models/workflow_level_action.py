@@ -97,3 +97,24 @@ class WorkflowLevelAction(models.Model):
         compute='_compute_css_class',
         store=False,
     )
+
+    # ── Invalidation du graphe compilé des circuits ──────────────────────
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records.sudo().mapped('level_id.workflow_definition_id')._bump_graph_version()
+        return records
+
+    def write(self, vals):
+        if not {'action_type', 'target_level_id', 'level_id'}.intersection(vals):
+            return super().write(vals)
+        definitions = self.sudo().mapped('level_id.workflow_definition_id')
+        result = super().write(vals)
+        (definitions | self.sudo().mapped('level_id.workflow_definition_id'))._bump_graph_version()
+        return result
+
+    def unlink(self):
+        definitions = self.sudo().mapped('level_id.workflow_definition_id')
+        result = super().unlink()
+        definitions.exists()._bump_graph_version()
+        return result
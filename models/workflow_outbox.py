@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# Nombre d'événements traités par passage du cron
+OUTBOX_BATCH_SIZE = 200
+# Au-delà, l'événement passe en échec et n'est plus retenté
+OUTBOX_MAX_ATTEMPTS = 5
+# Conservation des événements traités (jours)
+OUTBOX_DONE_RETENTION_DAYS = 30
+
+
+class WorkflowOutbox(models.Model):
+    """File d'effets de bord différés (outbox transactionnelle).
+
+    Le moteur de transition n'exécute plus directement les effets secondaires
+    d'un changement d'état (synchronisation du courrier, messages de
+    discussion…) : il enregistre un événement dans la même transaction, traité
+    ensuite par lots par le cron ``ir_cron_workflow_outbox``.
+
+    Tant qu'il n'est pas traité, l'événement d'un type donné pour une demande
+    est unique : les écritures successives dans une même transition le mettent
+    à jour au lieu d'en créer un nouveau.
+
+    Chaque type d'événement est traité par la méthode ``_process_<type>``
+    (``selection_add`` + cette méthode pour ajouter notifications ou webhooks).
+    """
+    _name = 'workflow.outbox'
+    _description = 'File des effets de bord du workflow'
+    _order = 'id'
+
+    event_type = fields.Selection([
+        ('state_changed', "Changement d'état"),
+        ('level_changed', "Changement d'étape"),
+        ('dashboard_changed', 'Mise à jour du tableau de bord'),
+    ], string="Type d'événement", required=True, index=True)
+    # Vide pour les événements qui ne concernent pas une demande (tableau de bord)
+    request_id = fields.Many2one('workflow.request', string='Demande de Workflow', ondelete='cascade', index=True)
+    payload = fields.Json(string='Données')
+    state = fields.Selection([
+        ('pending', 'À traiter'),
+        ('done', 'Traité'),
+        ('failed', 'En échec'),
+    ], string='État', required=True, default='pending', index=True)
+    attempt_count = fields.Integer(string='Tentatives', default=0)
+    available_date = fields.Datetime(string='Traitable à partir de', default=fields.Datetime.now, index=True)
+    processed_date = fields.Datetime(string='Date de traitement', readonly=True)
+    last_error = fields.Text(string='Dernière erreur', readonly=True)
+
+    # ── Enregistrement ────────────────────────────────────────────────────
+    @api.model
+    def _enqueue(self, requests, event_type, payload):
+        """Enregistre l'événement ``event_type`` pour chaque demande de ``requests``.
+
+        Un événement encore en attente pour la même demande est mis à jour
+        (dernier état connu) : une seule écriture et un seul ``create`` multiple.
+        """
+        if not requests:
+            return self.browse()
+        Outbox = self.sudo()
+        now = fields.Datetime.now()
+        pending = Outbox.search([
+            ('request_id', 'in', requests.ids),
+            ('event_type', '=', event_type),
+            ('state', '=', 'pending'),
+        ])
+        pending.write({'payload': payload, 'available_date': now})
+        known = set(pending.mapped('request_id').ids)
+        created = Outbox.create([{
+            'event_type': event_type,
+            'request_id': request.id,
+            'payload': payload,
+            'available_date': now,
+        } for request in requests if request.id not in known])
+        self._trigger_worker()
+        return pending | created
+
+    @api.model
+    def _enqueue_event(self, event_type, payload):
+        """Enregistre un événement ``event_type`` sans demande associée
+        (jamais fusionné : chaque appel produit un événement)."""
+        event = self.sudo().create({'event_type': event_type, 'payload': payload})
+        self._trigger_worker()
+        return event
+
+    @api.model
+    def _trigger_worker(self):
+        """Réveille le worker dès la fin de la transaction."""
+        cron = self.env.ref('workflow.ir_cron_workflow_outbox', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    # ── Traitement (cron) ─────────────────────────────────────────────────
+    @api.model
+    def _cron_process(self, batch_size=OUTBOX_BATCH_SIZE):
+        """Traite un lot d'événements en attente ; se relance s'il en reste."""
+        events = self.sudo().search([
+            ('state', '=', 'pending'),
+            ('available_date', '<=', fields.Datetime.now()),
+        ], limit=batch_size + 1)
+        has_more = len(events) > batch_size
+        events = events[:batch_size]
+
+        by_type = defaultdict(lambda: self.sudo().browse())
+        for event in events:
+            by_type[event.event_type] |= event
+        for event_type, type_events in by_type.items():
+            type_events._process_batch()
+
+        if has_more:
+            self.env.ref('workflow.ir_cron_workflow_outbox')._trigger()
+
+    def _process_batch(self):
+        """Traite les événements (d'un même type) d'un coup ; en cas d'erreur,
+        rejoue un par un pour isoler l'événement fautif."""
+        handler_name = f'_process_{self[:1].event_type}'
+        try:
+            with self.env.cr.savepoint():
+                getattr(self, handler_name)()
+        except Exception:
+            for event in self:
+                try:
+                    with self.env.cr.savepoint():
+                        getattr(event, handler_name)()
+                except Exception as error:
+                    event._mark_failed(error)
+                else:
+                    event._mark_done()
+        else:
+            self._mark_done()
+
+    def _mark_done(self):
+        self.write({'state': 'done', 'processed_date': fields.Datetime.now(), 'last_error': False})
+
+    def _mark_failed(self, error):
+        """Planifie une nouvelle tentative (attente croissante) ou abandonne."""
+        _logger.warning("Workflow outbox: échec de l'événement %s (%s) : %s", self.id, self.event_type, error)
+        attempts = self.attempt_count + 1
+        self.write({
+            'attempt_count': attempts,
+            'state': 'failed' if attempts >= OUTBOX_MAX_ATTEMPTS else 'pending',
+            'available_date': fields.Datetime.now() + timedelta(minutes=5 * attempts),
+            'last_error': str(error),
+        })
+
+    @api.autovacuum
+    def _gc_done_events(self):
+        """Purge les événements traités depuis plus de ``OUTBOX_DONE_RETENTION_DAYS`` jours."""
+        limit_date = fields.Datetime.now() - timedelta(days=OUTBOX_DONE_RETENTION_DAYS)
+        self.sudo().search([('state', '=', 'done'), ('processed_date', '<', limit_date)]).unlink()
+
+    # ── Gestionnaires d'événements ────────────────────────────────────────
+    def _process_state_changed(self):
+        """Synchronise les objets liés (courrier entrant…) avec l'état final des demandes."""
+        requests_by_state = defaultdict(lambda: self.env['workflow.request'])
+        for event in self:
+            requests_by_state[(event.payload or {}).get('state')] |= event.request_id
+        for state, requests in requests_by_state.items():
+            requests._sync_linked_objects(state)
+        self.env['workflow.stats.daily']._refresh_requests(self.mapped('request_id'))
+
+    def _process_level_changed(self):
+        """Met à jour les statistiques journalières (étape actuelle des demandes)."""
+        self.env['workflow.stats.daily']._refresh_requests(self.mapped('request_id'))
+
+    def _process_dashboard_changed(self):
+        """Publie sur le bus du tableau de bord les changements d'état enregistrés."""
+        events = [item for event in self for item in (event.payload or {}).get('events', [])]
+        self.env['workflow.dashboard']._send_dashboard_events(events)
@@ -1,6 +1,25 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+import json
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+from odoo.osv import expression
+
+# État de l'instance de workflow selon l'état final de la demande
+INSTANCE_STATE_BY_REQUEST_STATE = {
+    'approved': 'completed',
+    'rejected': 'rejected',
+    'cancelled': 'cancelled',
+}
+
+# Conditions de recherche sur un champ personnalisé : ('custom_values.Employeur', '=', 'X')
+CUSTOM_VALUES_PREFIX = 'custom_values.'
+
+
+def _is_custom_values_leaf(leaf):
+    return expression.is_leaf(leaf) and isinstance(leaf[0], str) and leaf[0].startswith(CUSTOM_VALUES_PREFIX)
 
 
 class WorkflowRequest(models.Model):
@@ -66,13 +85,60 @@ class WorkflowRequest(models.Model):
         'attachment_id',
         string='Pièces jointes'
     )
-    attachment_count = fields.Integer(string='Nombre de pièces', compute='_compute_attachment_count')
+    attachment_count = fields.Integer(string='Nombre de pièces', compute='_compute_attachment_count', store=True)
     
-    # Niveau actuel (pour affichage liste)
+    # Pointeur d'exécution (une instance par demande, tenue à jour par le moteur)
+    instance_ids = fields.One2many('workflow.instance', 'workflow_request_id', string='Instance de workflow')
+    instance_id = fields.Many2one('workflow.instance', string='Instance en cours', compute='_compute_instance_id')
+    approval_ids = fields.One2many('workflow.request.approval', 'workflow_request_id', string='Approbations')
+
+    # ── Avancement (stocké et indexé : tri et regroupement dans les listes) ──
+    current_level_id = fields.Many2one(
+        'workflow.level',
+        string='Étape actuelle',
+        compute='_compute_current_level_id',
+        store=True,
+        index=True,
+    )
     current_level_name = fields.Char(
         string='Niveau actuel',
         compute='_compute_current_level_name',
-        store=False
+        store=True,
+    )
+    current_level_index = fields.Integer(
+        string='Rang de l\'étape',
+        compute='_compute_level_progress',
+        store=True,
+        help="Position de l'étape actuelle dans le circuit (1 = première étape).",
+    )
+    level_count = fields.Integer(
+        string='Nb. étapes',
+        compute='_compute_level_progress',
+        store=True,
+    )
+    pending_approver_count = fields.Integer(
+        string='Validations en attente',
+        compute='_compute_pending_approvers',
+        store=True,
+        index=True,
+    )
+    # Dénormalisé pour les filtres « à valider par moi » et les règles d'accès :
+    # la table de relation est indexée sur (user_id, request_id).
+    pending_approver_ids = fields.Many2many(
+        'res.users',
+        'workflow_request_pending_approver_rel',
+        'request_id',
+        'user_id',
+        string='Approbateurs en attente',
+        compute='_compute_pending_approvers',
+        store=True,
+    )
+    last_action_date = fields.Datetime(
+        string='Dernière action',
+        readonly=True,
+        copy=False,
+        index=True,
+        help="Date de la dernière action du circuit (soumission, validation, rejet, retour…).",
     )
     
     active = fields.Boolean(string='Actif', default=True)
@@ -83,166 +149,407 @@ class WorkflowRequest(models.Model):
         'request_id',
         string='Champs du formulaire',
     )
+    # Copie des valeurs de custom_value_ids, { "<id du champ>": valeur }, tenue à jour
+    # par workflow.request.custom.value ; recherche indexée (GIN) via custom_values.<Nom>
+    custom_values = fields.Json(string='Valeurs personnalisées', readonly=True, copy=False)
     
+    def init(self):
+        # Pagination par curseur des listes récentes : ORDER BY create_date DESC, id DESC
+        tools.create_index(self._cr, 'workflow_request_create_date_id_idx', self._table, ['create_date', 'id'])
+        # Filtres sur les champs personnalisés : @> (égalité) et @? (comparaisons)
+        tools.create_index(self._cr, 'workflow_request_custom_values_gin_idx', self._table, ['custom_values'], method='gin')
+
     @api.depends('attachment_ids')
     def _compute_attachment_count(self):
         for record in self:
             record.attachment_count = len(record.attachment_ids)
     
+    @api.depends('instance_ids')
+    def _compute_instance_id(self):
+        for record in self:
+            record.instance_id = record.instance_ids[:1]
+
+    @api.depends('instance_ids.current_level_id')
+    def _compute_current_level_id(self):
+        for record in self:
+            record.current_level_id = record.instance_ids[:1].current_level_id
+
+    @api.depends('state', 'current_level_id.name')
     def _compute_current_level_name(self):
-        """
-        Calcule le niveau actuel de validation pour l'affichage dans la liste
-        Version simplifiée - à améliorer quand workflow.instance sera prêt
-        """
+        """Niveau actuel lu directement sur l'instance de workflow de la demande."""
         for record in self:
-            if record.state in ['draft', 'approved', 'rejected', 'cancelled']:
-                record.current_level_name = '—'
-            elif record.state == 'submitted':
-                # Si soumise mais pas encore en validation
-                if record.workflow_definition_id:
-                    # Vérifier si le modèle workflow.level existe
-                    if 'workflow.level' in self.env:
-                        first_level = self.env['workflow.level'].sudo().search([
-                            ('workflow_definition_id', '=', record.workflow_definition_id.id)
-                        ], order='sequence', limit=1)
-                        record.current_level_name = first_level.name if first_level else 'En attente'
-                    else:
-                        record.current_level_name = 'En attente'
-                else:
-                    record.current_level_name = 'En attente'
-            elif record.state == 'in_progress':
-                # Version simplifiée pour affichage
-                if record.workflow_definition_id:
-                    record.current_level_name = 'En validation'
-                else:
-                    record.current_level_name = 'En cours'
+            if record.state in ('submitted', 'in_progress'):
+                level = record.current_level_id
+                record.current_level_name = level.name if level else 'En attente'
             else:
                 record.current_level_name = '—'
 
-    
+    @api.depends('current_level_id', 'workflow_definition_id.level_ids.sequence', 'workflow_definition_id.level_ids.active')
+    def _compute_level_progress(self):
+        """Rang de l'étape actuelle et nombre d'étapes, lus sur le graphe compilé du circuit."""
+        for record in self:
+            levels = record.workflow_definition_id._get_circuit_graph()['levels'] if record.workflow_definition_id else ()
+            record.level_count = len(levels)
+            level_id = record.current_level_id.id
+            record.current_level_index = levels.index(level_id) + 1 if level_id in levels else 0
+
+    @api.depends('approval_ids.state', 'approval_ids.approver_id')
+    def _compute_pending_approvers(self):
+        """Approbateurs ayant une validation en attente, en une seule requête groupée."""
+        approver_ids = defaultdict(list)
+        counts = defaultdict(int)
+        if self.ids:
+            for request, approver, count in self.env['workflow.request.approval']._read_group(
+                [('workflow_request_id', 'in', self.ids), ('state', '=', 'pending')],
+                groupby=['workflow_request_id', 'approver_id'],
+                aggregates=['__count'],
+            ):
+                approver_ids[request.id].append(approver.id)
+                counts[request.id] += count
+        for record in self:
+            record.pending_approver_ids = [(6, 0, approver_ids[record.id])]
+            record.pending_approver_count = counts[record.id]
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', 'Nouveau') == 'Nouveau':
+                vals['name'] = self.env['ir.sequence'].next_by_code('workflow.request') or 'REQ/NEW'
+        self._route_missing_circuits(vals_list)
+        records = super(WorkflowRequest, self).create(vals_list)
+        if any(vals.get('attachment_ids') for vals in vals_list):
+            records._queue_attachment_previews()
+        self.env['workflow.dashboard']._invalidate_dashboard_cache()
+        self.env['workflow.dashboard']._notify_dashboard(records)
+        for state in set(records.mapped('state')):
+            self.env['workflow.outbox']._enqueue(
+                records.filtered(lambda r: r.state == state), 'state_changed', {'state': state},
+            )
+        return records
+
+    def _queue_attachment_previews(self):
+        """Met en file les aperçus des pièces jointes rattachées (voir
+        ``workflow.attachment.preview``) : la vue approbateur ne fait que les lire."""
+        self.env['workflow.attachment.preview']._queue_previews(self.sudo().mapped('attachment_ids'))
+
     @api.model
-    def create(self, vals):
-        if vals.get('name', 'Nouveau') == 'Nouveau':
-            vals['name'] = self.env['ir.sequence'].next_by_code('workflow.request') or 'REQ/NEW'
-        return super(WorkflowRequest, self).create(vals)
+    def _route_missing_circuits(self, vals_list):
+        """Affecte le circuit des demandes créées sans ``workflow_definition_id``
+        (imports en masse) via les règles de routage, en une résolution par type."""
+        to_route = defaultdict(list)
+        for vals in vals_list:
+            if not vals.get('workflow_definition_id') and vals.get('workflow_type_id') and vals.get('amount'):
+                to_route[vals['workflow_type_id']].append(vals)
+        Router = self.env['workflow.routing.rule']
+        for workflow_type_id, type_vals in to_route.items():
+            circuits = Router.resolve_many(workflow_type_id, [vals['amount'] for vals in type_vals])
+            for vals, circuit_id in zip(type_vals, circuits):
+                if circuit_id:
+                    vals['workflow_definition_id'] = circuit_id
 
     def write(self, vals):
+        old_states = {request.id: request.state for request in self} if 'state' in vals else None
         result = super().write(vals)
+        if vals.get('attachment_ids'):
+            self._queue_attachment_previews()
         if 'state' in vals:
-            self._sync_linked_objects(vals['state'])
+            self.env['workflow.dashboard']._invalidate_dashboard_cache()
+            self.env['workflow.dashboard']._notify_dashboard(self, old_states)
+            if vals['state'] in INSTANCE_STATE_BY_REQUEST_STATE:
+                self.mapped('instance_ids').sudo().write({
+                    'state': INSTANCE_STATE_BY_REQUEST_STATE[vals['state']],
+                    'last_transition_date': fields.Datetime.now(),
+                })
+            # Effets de bord différés (voir workflow.outbox) : un seul événement
+            # par demande et par transition, traité hors de la transaction de l'approbateur.
+            self.env['workflow.outbox']._enqueue(self, 'state_changed', {'state': vals['state']})
         return result
 
-    def _sync_linked_objects(self, new_state):
-        """Synchronise les objets liés (courrier entrant…) quand l'état de la demande change."""
-        if 'workflow.courrier.entrant' not in self.env:
-            return
+    # ─────────────────────────────────────────────────────────────────────
+    # Pointeur d'exécution (workflow.instance)
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _workflow_submit(self):
+        """Lance le circuit de chaque demande de l'ensemble.
+
+        Les approbations de la première étape sont créées en attente de
+        validation ; celles des étapes suivantes sont créées d'emblée en attente
+        du niveau précédent, ou seulement à l'activation de l'étape si le circuit
+        est en création différée. Un seul ``create`` pour tout l'ensemble.
+
+        :return: nombre d'approbations créées
+        """
+        plan = []
+        requests_by_first_level = defaultdict(list)
         for request in self:
-            courrier = self.env['workflow.courrier.entrant'].sudo().search(
-                [('workflow_request_id', '=', request.id)], limit=1
-            )
-            if not courrier:
+            definition = request.workflow_definition_id
+            if not definition:
                 continue
-            if new_state == 'approved':
-                courrier.sudo().write({'state': 'traite'})
-                courrier.sudo().message_post(
-                    body="✅ Courrier validé — circuit de validation complété avec succès.",
-                    subtype_xmlid='mail.mt_note',
-                )
-            elif new_state == 'rejected':
-                courrier.sudo().write({'state': 'recu'})
-                courrier.sudo().message_post(
-                    body="❌ Courrier refusé — remis à l'état « Reçu ».",
-                    subtype_xmlid='mail.mt_note',
-                )
-    
+            levels = self.env['workflow.level'].browse(definition._get_circuit_graph()['levels'])
+            if not levels:
+                continue
+            if definition.approval_materialization == 'lazy':
+                levels = levels[:1]
+            plan.extend(
+                (request, level, 'pending' if idx == 0 else 'waiting')
+                for idx, level in enumerate(levels)
+            )
+            requests_by_first_level[levels[0].id].append(request.id)
+
+        approvals = self.env['workflow.request.approval']._workflow_materialize(plan)
+        for level_id, request_ids in requests_by_first_level.items():
+            self.browse(request_ids)._workflow_set_level(self.env['workflow.level'].browse(level_id))
+        self._workflow_touch()
+        return len(approvals)
+
+    def _workflow_touch(self):
+        """Horodate la dernière action du circuit sur les demandes de l'ensemble."""
+        if self:
+            self.write({'last_action_date': fields.Datetime.now()})
+
+    def _workflow_set_level(self, level):
+        """Positionne l'instance de workflow de chaque demande sur l'étape ``level``.
+
+        Une écriture pour les instances existantes, un ``create`` multiple pour
+        les demandes qui n'en ont pas encore (soumission).
+        """
+        if not self:
+            return
+        now = fields.Datetime.now()
+        Instance = self.env['workflow.instance'].sudo()
+        self.mapped('instance_ids').sudo().write({
+            'current_level_id': level.id,
+            'state': 'active',
+            'last_transition_date': now,
+        })
+        missing = self.filtered(lambda r: not r.instance_ids)
+        if missing:
+            Instance.create([{
+                'name': request.name,
+                'workflow_request_id': request.id,
+                'workflow_definition_id': (level.workflow_definition_id or request.workflow_definition_id).id,
+                'current_level_id': level.id,
+                'last_transition_date': now,
+            } for request in missing])
+            missing.invalidate_recordset(['instance_ids'])
+        self.env['workflow.outbox']._enqueue(self, 'level_changed', {'level_id': level.id})
+
     @api.model
-    def get_dashboard_data(self):
+    def _workflow_backfill_instances(self):
+        """Crée les instances manquantes des demandes en cours (données antérieures).
+
+        L'étape courante est déduite une seule fois des approbations en attente ;
+        ensuite le moteur tient l'instance à jour. Idempotent.
         """
-        Récupère les données pour le tableau de bord
-        Retourne un dictionnaire avec les statistiques et les demandes récentes
+        requests = self.with_context(active_test=False).search([
+            ('state', 'in', ['submitted', 'in_progress']),
+            ('workflow_definition_id', '!=', False),
+            ('instance_ids', '=', False),
+        ])
+        if not requests:
+            return
+        current_levels = {}
+        for request, level, _count in self.env['workflow.request.approval']._read_group(
+            [('workflow_request_id', 'in', requests.ids), ('state', '=', 'pending')],
+            groupby=['workflow_request_id', 'workflow_level_id'],
+            aggregates=['__count'],
+        ):
+            known = current_levels.get(request.id)
+            if not known or (level.sequence, level.id) < (known.sequence, known.id):
+                current_levels[request.id] = level
+        requests_by_level = defaultdict(lambda: self.browse())
+        for request in requests:
+            level = current_levels.get(request.id)
+            if not level:
+                first_level_ids = request.workflow_definition_id._get_circuit_graph()['levels']
+                level = self.env['workflow.level'].browse(first_level_ids[:1])
+            requests_by_level[level] |= request
+        for level, level_requests in requests_by_level.items():
+            level_requests._workflow_set_level(level)
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Valeurs personnalisées (copie JSONB indexée)
+    # ─────────────────────────────────────────────────────────────────────
+
+    # Valeur JSON typée de chaque ligne ; vides (et 0, comme value_display) omis
+    _CUSTOM_VALUES_QUERY = """
+        UPDATE workflow_request r
+           SET custom_values = v.data
+          FROM (
+                SELECT req.id AS request_id,
+                       jsonb_strip_nulls(COALESCE(jsonb_object_agg(
+                           cv.custom_field_id::text,
+                           CASE cv.field_type
+                               WHEN 'char' THEN to_jsonb(NULLIF(cv.value_char, ''))
+                               WHEN 'text' THEN to_jsonb(NULLIF(cv.value_text, ''))
+                               WHEN 'integer' THEN to_jsonb(NULLIF(cv.value_integer, 0))
+                               WHEN 'float' THEN to_jsonb(NULLIF(cv.value_float, 0))
+                               WHEN 'boolean' THEN to_jsonb(COALESCE(cv.value_boolean, FALSE))
+                               WHEN 'date' THEN to_jsonb(cv.value_date)
+                               WHEN 'datetime' THEN to_jsonb(cv.value_datetime)
+                               WHEN 'selection' THEN to_jsonb(NULLIF(cv.value_selection, ''))
+                           END
+                       ) FILTER (WHERE cv.id IS NOT NULL), '{{}}'::jsonb)) AS data
+                  FROM workflow_request req
+             LEFT JOIN workflow_request_custom_value cv ON cv.request_id = req.id
+                 WHERE {where}
+              GROUP BY req.id
+               ) v
+         WHERE r.id = v.request_id
+    """
+
+    def _sync_custom_values(self):
+        """Recopie les lignes ``workflow.request.custom.value`` des demandes dans
+        ``custom_values`` (une requête pour tout l'ensemble)."""
+        if not self.ids:
+            return
+        self.env['workflow.request.custom.value'].flush_model()
+        self.env.cr.execute(self._CUSTOM_VALUES_QUERY.format(where='req.id IN %(ids)s'), {'ids': tuple(self.ids)})
+        self.invalidate_recordset(['custom_values'])
+
+    @api.model
+    def _where_calc(self, domain, active_test=True):
+        if domain and any(_is_custom_values_leaf(leaf) for leaf in domain):
+            domain = [
+                self._custom_values_leaf(*leaf) if _is_custom_values_leaf(leaf) else leaf
+                for leaf in domain
+            ]
+        return super()._where_calc(domain, active_test)
+
+    @api.model
+    def _custom_values_leaf(self, path, operator, value):
+        """Traduit ``('custom_values.<Nom du champ>', opérateur, valeur)`` en
+        ``('id', 'in', sous-requête)`` portant un prédicat JSONB sur ``custom_values``."""
+        name = path[len(CUSTOM_VALUES_PREFIX):]
+        custom_fields = self.env['workflow.custom.field'].sudo().with_context(active_test=False).search([
+            ('name', '=', name),
+        ])
+        if not custom_fields:
+            raise UserError(f"Champ personnalisé inconnu : {name}")
+        query = self._where_calc([], active_test=False)
+        column = f'"{query.table}"."custom_values"'
+        clauses, params = [], []
+        for custom_field in custom_fields:
+            clause, clause_params = self._custom_values_predicate(custom_field, operator, value, column)
+            clauses.append(clause)
+            params += clause_params
+        query.add_where(f"({' OR '.join(clauses)})", params)
+        return ('id', 'in', query)
+
+    @api.model
+    def _custom_values_predicate(self, custom_field, operator, value, column):
+        """Prédicat SQL ``(clause, paramètres)`` d'une condition sur un champ personnalisé.
+
+        ``=`` / ``in`` : containment ``@>`` ; ``<``, ``>``… : chemin JSON ``@?``
+        restreint par l'index GIN aux demandes qui ont ce champ ; ``like`` /
+        ``ilike`` : ``LIKE`` / ``ILIKE`` SQL sur la valeur texte (``->>``).
         """
-        from datetime import datetime, timedelta
-        
-        # Date du début du mois actuel
-        now = datetime.now()
-        first_day_current_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Date du mois précédent
-        if now.month == 1:
-            first_day_last_month = first_day_current_month.replace(year=now.year - 1, month=12)
+        key = str(custom_field.id)
+        negate = operator in ('!=', 'not in', 'not like', 'not ilike')
+        if operator in ('=', '!=') and (value is False or value is None):
+            clause, params = f"{column} ? %s", [key]
+            negate = not negate
+        elif operator in ('=', '!=', 'in', 'not in'):
+            values = value if operator in ('in', 'not in') else [value]
+            if not values:
+                return ('TRUE', []) if negate else ('FALSE', [])
+            clause = ' OR '.join([f"{column} @> %s::jsonb"] * len(values))
+            params = [json.dumps({key: self._custom_values_json(custom_field, item)}) for item in values]
+        elif operator in ('<', '>', '<=', '>='):
+            target = json.dumps(self._custom_values_json(custom_field, value))
+            clause, params = f"{column} @? %s::jsonpath", [f"$.{json.dumps(key)} ? (@ {operator} {target})"]
+        elif operator in ('like', 'ilike', 'not like', 'not ilike'):
+            # Même motif que l'ORM pour un champ texte : valeur entourée de %
+            sql_operator = 'ILIKE' if 'ilike' in operator else 'LIKE'
+            clause, params = f"({column} ->> %s) {sql_operator} %s", [key, f"%{value}%"]
         else:
-            first_day_last_month = first_day_current_month.replace(month=now.month - 1)
+            raise UserError(f"Opérateur non pris en charge pour un champ personnalisé : {operator}")
+        if negate:
+            return f"NOT COALESCE({clause}, FALSE)", params
+        return f"({clause})", params
 
-        # Statistiques
-        total = self.search_count([])
-        total_current_month = self.search_count([
-            ('create_date', '>=', first_day_current_month.strftime('%Y-%m-%d'))
-        ])
-        total_last_month = self.search_count([
-            ('create_date', '>=', first_day_last_month.strftime('%Y-%m-%d')),
-            ('create_date', '<', first_day_current_month.strftime('%Y-%m-%d'))
-        ])
-        
-        if total_last_month > 0:
-            total_trend = round(((total_current_month - total_last_month) / total_last_month) * 100)
+    @api.model
+    def _custom_values_json(self, custom_field, value):
+        """Valeur de recherche convertie comme dans ``_CUSTOM_VALUES_QUERY``."""
+        field_type = custom_field.field_type
+        if field_type == 'integer':
+            return int(value)
+        if field_type == 'float':
+            return float(value)
+        if field_type == 'boolean':
+            return bool(value)
+        if field_type == 'date':
+            return fields.Date.to_date(value).isoformat()
+        if field_type == 'datetime':
+            return fields.Datetime.to_datetime(value).isoformat()
+        return str(value)
+
+    def _sync_linked_objects(self, new_state):
+        """Synchronise les objets liés (courrier entrant…) quand l'état de la demande change.
+
+        Appelé par le traitement de ``workflow.outbox`` (événement ``state_changed``).
+        """
+        if 'workflow.courrier.entrant' not in self.env or new_state not in ('approved', 'rejected'):
+            return
+        courriers = self.env['workflow.courrier.entrant'].sudo().search(
+            [('workflow_request_id', 'in', self.ids)]
+        )
+        if not courriers:
+            return
+        if new_state == 'approved':
+            courriers.write({'state': 'traite'})
+            body = "✅ Courrier validé — circuit de validation complété avec succès."
         else:
-            total_trend = 100 if total_current_month > 0 else 0
+            courriers.write({'state': 'recu'})
+            body = "❌ Courrier refusé — remis à l'état « Reçu »."
+        for courrier in courriers:
+            courrier.message_post(body=body, subtype_xmlid='mail.mt_note')
+    
+    @api.model
+    def _get_dashboard_stats(self, category=None):
+        """Statistiques des tableaux de bord en une seule requête groupée.
 
-        in_progress = self.search_count([('state', 'in', ['submitted', 'in_progress'])])
-        approved = self.search_count([('state', '=', 'approved')])
-        rejected = self.search_count([('state', '=', 'rejected')])
-        
-        total_processed = approved + rejected
-        approval_rate = round((approved / total_processed * 100)) if total_processed > 0 else 0
-        rejection_trend = -5
-        
-        stats = {
+        Un ``_read_group`` par (état, mois de création) sur la table de faits
+        ``workflow.stats.daily`` suffit pour obtenir le total, la répartition
+        par état, le volume du mois courant et du mois précédent ainsi que
+        leurs tendances.
+
+        :param category: catégorie de ``workflow.type`` (``'credit'``, ``'courrier'``…) ;
+                         toutes les demandes si ``None``
+        """
+        current_month = fields.Date.today().replace(day=1)
+        last_month = fields.Date.subtract(current_month, months=1)
+
+        by_state = defaultdict(int)
+        by_month = defaultdict(int)
+        rejected_by_month = defaultdict(int)
+        for state, month, count in self.env['workflow.stats.daily']._get_counts(
+            category, groupby=('state', 'date:month'),
+        ):
+            month = fields.Date.to_date(month)
+            by_state[state] += count
+            by_month[month] += count
+            if state == 'rejected':
+                rejected_by_month[month] += count
+
+        def trend(current, previous):
+            if previous:
+                return round((current - previous) / previous * 100)
+            return 100 if current else 0
+
+        total = sum(by_state.values())
+        approved, rejected = by_state['approved'], by_state['rejected']
+        return {
             'total': total,
-            'total_trend': total_trend,
-            'in_progress': in_progress,
+            'by_state': dict(by_state),
+            'in_progress': by_state['submitted'] + by_state['in_progress'],
             'approved': approved,
             'rejected': rejected,
-            'approval_rate': approval_rate,
-            'rejection_trend': rejection_trend,
-        }
-        
-        # Demandes récentes
-        credit_types = {
-            'salary': 'Crédit salaire',
-            'housing': 'Crédit logement',
-            'consumption': 'Crédit consommation',
-            'business': 'Crédit entreprise',
-            'other': 'Autre',
-        }
-        
-        state_labels = {
-            'draft': 'Brouillon',
-            'submitted': 'Soumise',
-            'in_progress': 'En cours',
-            'approved': 'Approuvée',
-            'rejected': 'Refusée',
-            'cancelled': 'Annulée',
-        }
-        
-        requests = self.search([], order='create_date desc', limit=10)
-        recent_requests = []
-        
-        for req in requests:
-            recent_requests.append({
-                'id': req.id,
-                'name': req.name or 'Brouillon',
-                'requester': req.requester_id.name if req.requester_id else 'Système',
-                'client_name': req.client_name,
-                'amount': req.amount or 0,
-                'credit_type_label': credit_types.get(req.credit_type, '-'),
-                'state': req.state,
-                'state_label': state_labels.get(req.state, req.state.capitalize()),
-                'date': req.create_date.strftime('%d/%m/%Y') if req.create_date else '-',
-            })
-        
-        return {
-            'stats': stats,
-            'recent_requests': recent_requests,
+            'total_current_month': by_month[current_month],
+            'total_last_month': by_month[last_month],
+            'total_trend': trend(by_month[current_month], by_month[last_month]),
+            'approval_rate': round(approved / (approved + rejected) * 100) if approved + rejected else 0,
+            'rejection_trend': trend(rejected_by_month[current_month], rejected_by_month[last_month]),
         }
 
     def action_view_comments(self):
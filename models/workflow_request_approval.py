@@ -1,6 +1,21 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import AccessError, UserError
+
+# Ordre de la file de validation : priorité de la demande, puis ancienneté
+APPROVAL_QUEUE_ORDER = 'request_priority desc, create_date asc, id asc'
+
+# Décision appliquée pour chaque type d'action configurable (workflow.level.action)
+ACTION_TYPE_DECISIONS = {
+    'go_next': 'approve',
+    'complete': 'approve',
+    'reject': 'reject',
+    'go_back': 'return',
+    'request_info': 'request_info',
+}
 
 
 class WorkflowRequestApproval(models.Model):
@@ -20,6 +35,7 @@ class WorkflowRequestApproval(models.Model):
         ('returned', 'Retourné'),
     ], string='État', required=True, default='waiting')
     comments = fields.Text(string='Commentaires')
+    request_priority = fields.Selection(related='workflow_request_id.priority', store=True, string='Priorité')
 
     # Documents joints lors de l'action (pièces justificatives, documents manquants, etc.)
     attachment_ids = fields.Many2many(
@@ -30,28 +46,460 @@ class WorkflowRequestApproval(models.Model):
         string='Documents joints',
     )
 
+    def init(self):
+        # Boîte de réception des approbateurs : approver_id = uid AND state = 'pending'
+        tools.create_index(
+            self._cr, 'workflow_request_approval_approver_state_idx',
+            self._table, ['approver_id', 'state'],
+        )
+        # File de validation : même filtre, trié comme APPROVAL_QUEUE_ORDER
+        tools.create_index(
+            self._cr, 'workflow_request_approval_queue_idx',
+            self._table, ['approver_id', 'state', 'request_priority DESC', 'create_date', 'id'],
+        )
+
+    @api.model
+    def _get_approval_queue(self, after=None, limit=1):
+        """Approbations en attente de l'utilisateur, dans l'ordre de la file
+        (``APPROVAL_QUEUE_ORDER``).
+
+        :param after: approbation de référence ; seules celles placées après
+                      elle dans la file sont retournées (pagination par curseur)
+        """
+        domain = [('approver_id', '=', self.env.uid), ('state', '=', 'pending')]
+        if after:
+            priority = after.request_priority or '0'
+            domain += [
+                '|', ('request_priority', '<', priority),
+                '&', ('request_priority', '=', priority),
+                '|', ('create_date', '>', after.create_date),
+                '&', ('create_date', '=', after.create_date), ('id', '>', after.id),
+            ]
+        return self.search(domain, order=APPROVAL_QUEUE_ORDER, limit=limit)
+
     def action_open_from_selector(self):
         """Ouvre la vue approbateur pour cette demande spécifique"""
         self.ensure_one()
+        return self.env['workflow.approval.view']._open_decision_form(self, target='new')
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Validation groupée
+    # ─────────────────────────────────────────────────────────────────────
+
+    def action_open_batch_approval(self):
+        """Ouvre l'assistant de validation groupée sur les lignes sélectionnées."""
+        action = self.env['ir.actions.actions']._for_xml_id('workflow.action_workflow_approval_batch_wizard')
+        action['context'] = {
+            'active_model': self._name,
+            'active_ids': self.ids,
+        }
+        return action
+
+    def action_approve_batch(self, comment):
+        """Valide en une seule transaction toutes les approbations de l'ensemble.
+
+        Les lignes qui ne peuvent pas être validées (déjà traitées, assignées à un
+        autre approbateur) sont ignorées sans bloquer les autres.
+
+        :param comment: commentaire enregistré sur chaque approbation validée
+        :return: une liste de dictionnaires, un par ligne :
+                 ``{'approval_id', 'request_id', 'status', 'message', 'request_state'}``
+                 où ``status`` vaut ``'approved'`` ou ``'skipped'``.
+        """
+        if not comment or not comment.strip():
+            raise UserError("Un commentaire est obligatoire pour valider les demandes.")
+
+        # Verrouille les demandes puis relit les états : une ligne traitée en
+        # parallèle est simplement ignorée, sans annuler le reste du lot.
+        self._workflow_lock(raise_if_processed=False)
+
+        outcomes = {}
+        valid = self.browse()
+        seen_requests = set()
+        for approval in self:
+            if approval.state != 'pending':
+                reason = "Cette approbation n'est plus en attente de validation."
+            elif approval.approver_id != self.env.user:
+                reason = "Cette approbation n'est pas assignée à votre utilisateur."
+            elif approval.workflow_request_id.id in seen_requests:
+                reason = "Une autre ligne de la même demande est déjà validée dans ce lot."
+            else:
+                valid |= approval
+                seen_requests.add(approval.workflow_request_id.id)
+                continue
+            outcomes[approval.id] = {
+                'approval_id': approval.id,
+                'request_id': approval.workflow_request_id.id,
+                'status': 'skipped',
+                'message': reason,
+                'request_state': approval.workflow_request_id.state,
+            }
+
+        for result in valid._workflow_approve(comment):
+            outcomes[result['approval_id']] = result
+
+        return [outcomes[approval.id] for approval in self]
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Décision unitaire (point d'entrée sans état)
+    # ─────────────────────────────────────────────────────────────────────
+
+    @api.model
+    def execute_decision(self, approval_id, decision=None, comment='', attachment_ids=None, action_id=None):
+        """Applique la décision de l'approbateur sur une approbation, sans
+        enregistrement transitoire (route ``/workflow/approval/decide``).
+
+        :param approval_id: approbation en attente de l'utilisateur courant
+        :param decision: ``'approve'``, ``'reject'``, ``'return'`` ou ``'request_info'`` ;
+                         ignoré si ``action_id`` est fourni
+        :param comment: commentaire de l'approbateur (obligatoire)
+        :param attachment_ids: pièces jointes déjà téléversées par l'utilisateur
+        :param action_id: action configurée sur l'étape (``workflow.level.action``)
+        :return: ``{'decision', 'approval_id', 'request_id', 'request_state',
+                 'title', 'message', 'notif_type'}``
+        """
+        approval = self.browse(int(approval_id)).exists()
+        if not approval or approval.state != 'pending':
+            raise UserError("Aucune approbation en attente trouvée.")
+        if approval.approver_id != self.env.user:
+            raise AccessError("Cette approbation n'est pas assignée à votre utilisateur.")
+
+        target_level = self.env['workflow.level']
+        if action_id:
+            action = self.env['workflow.level.action'].browse(int(action_id)).exists()
+            if not action or action.level_id != approval.workflow_level_id:
+                raise UserError("Cette action n'est pas disponible à l'étape actuelle.")
+            if action.requires_comment and not (comment or '').strip():
+                raise UserError(f"Un commentaire est obligatoire pour l'action « {action.name} ».")
+            # Type et étape cible résolus depuis le graphe compilé du circuit
+            graph = approval.workflow_level_id.workflow_definition_id._get_circuit_graph()
+            action_type, target_level_id = graph['actions'].get(
+                action.id, (action.action_type, action.target_level_id.id),
+            )
+            decision = ACTION_TYPE_DECISIONS.get(action_type)
+            if not decision:
+                raise UserError(f"Type d'action non reconnu : {action_type}")
+            target_level = target_level.browse(target_level_id)
+        elif decision not in ACTION_TYPE_DECISIONS.values():
+            raise UserError(f"Décision non reconnue : {decision}")
+        if not (comment or '').strip():
+            raise UserError("Un commentaire est obligatoire.")
+
+        approval._attach_decision_documents(attachment_ids or [])
+
+        request = approval.workflow_request_id
+        if decision == 'approve':
+            result = approval._workflow_approve(comment, target_level=target_level or None)[0]
+            if not result['level_completed']:
+                title = '✅ Validation enregistrée'
+                message = (
+                    'Votre approbation a été prise en compte. En attente des autres validateurs '
+                    f'du niveau « {approval.workflow_level_id.name} ».'
+                )
+            elif result['request_state'] == 'approved':
+                title = '✅ Demande approuvée'
+                message = result['message']
+            else:
+                title = '✅ Validation transmise'
+                message = result['message']
+            notif_type = 'success'
+        elif decision == 'reject':
+            approval._workflow_reject(comment)
+            title, notif_type = '❌ Demande refusée', 'danger'
+            message = f'La demande « {request.name} » a été refusée.'
+        elif decision == 'return':
+            approval._workflow_return(comment, target_level=target_level or None)
+            title, notif_type = '↩️ Demande retournée', 'warning'
+            message = f'La demande « {request.name} » a été retournée au niveau précédent.'
+        else:
+            approval._workflow_request_info(comment)
+            title, notif_type = 'Demande envoyée', 'info'
+            message = "Le demandeur a été notifié de votre demande d'informations."
 
-        # Vérifier si l'étape a des actions configurées
-        level = self.workflow_level_id
-        has_actions = bool(level and level.action_ids)
-
-        # Créer un enregistrement transient pour la vue approbateur
-        approval_view = self.env['workflow.approval.view'].create({
-            'request_id': self.workflow_request_id.id,
-            'current_approval_id': self.id,
-            'has_configured_actions': has_actions,
-            'comment': '',
-        })
-        
         return {
-            'name': 'Vue Approbateur',
-            'type': 'ir.actions.act_window',
-            'res_model': 'workflow.approval.view',
-            'view_mode': 'form',
-            'res_id': approval_view.id,
-            'target': 'new',
-            'context': self.env.context,
+            'decision': decision,
+            'approval_id': approval.id,
+            'request_id': request.id,
+            'request_state': request.state,
+            'title': title,
+            'message': message,
+            'notif_type': notif_type,
         }
+
+    def _attach_decision_documents(self, attachment_ids):
+        """Rattache les pièces jointes d'une décision à la demande (visibles par
+        tous les approbateurs) et à l'approbation (historique : qui, à quelle étape)."""
+        self.ensure_one()
+        attachments = self.env['ir.attachment'].sudo().browse(attachment_ids).exists()
+        if not attachments:
+            return
+        if any(attachment.create_uid != self.env.user for attachment in attachments):
+            raise AccessError("Seuls les documents que vous avez téléversés peuvent être joints à votre décision.")
+        request = self.workflow_request_id
+        # res_model/res_id : droits d'accès hérités de la demande
+        attachments.write({'res_model': 'workflow.request', 'res_id': request.id})
+        links = [(4, attachment_id) for attachment_id in attachments.ids]
+        request.sudo().write({'attachment_ids': links})
+        self.sudo().write({'attachment_ids': links})
+
+    # ─────────────────────────────────────────────────────────────────────
+    # Moteur de transition (ensembliste)
+    # ─────────────────────────────────────────────────────────────────────
+
+    def _workflow_lock(self, raise_if_processed=True):
+        """Sérialise les transitions concurrentes sur les demandes de l'ensemble.
+
+        Verrouille les lignes ``workflow_request`` (``FOR NO KEY UPDATE``, dans
+        l'ordre des ids pour éviter les interblocages) avant tout calcul d'issue
+        de niveau. Chaque transition réécrit la demande (``last_action_date``) :
+        un second approbateur simultané attend donc le premier, puis reçoit une
+        erreur de sérialisation PostgreSQL que la couche RPC d'Odoo
+        (``odoo.service.model.retrying``) rejoue de façon transparente dans une
+        nouvelle transaction, qui voit alors la validation du premier.
+
+        :param raise_if_processed: lève une ``UserError`` si une approbation a
+                                   été traitée entre-temps (décision unitaire) ;
+                                   sinon l'appelant relit les états (lot)
+        :return: les approbations encore en attente après verrouillage
+        """
+        request_ids = sorted(set(self.mapped('workflow_request_id').ids))
+        if request_ids:
+            self.env.cr.execute(
+                "SELECT id FROM workflow_request WHERE id IN %s ORDER BY id FOR NO KEY UPDATE",
+                [tuple(request_ids)],
+            )
+        self.invalidate_recordset(['state'])
+        pending = self.filtered(lambda approval: approval.state == 'pending')
+        if raise_if_processed and pending != self:
+            raise UserError("Cette approbation a déjà été traitée par ailleurs. Veuillez actualiser la page.")
+        return pending
+
+    def _workflow_approve(self, comment, target_level=None):
+        """Valide les approbations ``self`` et fait avancer les demandes concernées.
+
+        Les demandes sont d'abord verrouillées (voir :meth:`_workflow_lock`) ;
+        toutes les écritures sont groupées : une écriture pour les approbations,
+        un ``create`` multiple pour les commentaires, une requête groupée pour
+        savoir quels niveaux sont complets et une écriture par état cible.
+
+        :param target_level: étape à activer à la place de l'étape suivante
+                             (``workflow.level.action.target_level_id``)
+        :return: liste de résultats (même format que :meth:`action_approve_batch`)
+                 avec en plus la clé ``level_completed``.
+        """
+        if not self:
+            return []
+        self._workflow_lock()
+
+        Approval = self.env['workflow.request.approval']
+        requests = self.mapped('workflow_request_id')
+        levels = self.mapped('workflow_level_id')
+
+        self.write({'state': 'approved', 'comments': comment})
+        self._create_history_comments('approval_note', 'Validation', comment)
+
+        # ── Niveaux encore incomplets (autres validateurs en attente) ─────
+        still_pending = {
+            (request.id, level.id)
+            for request, level, _count in Approval._read_group(
+                [
+                    ('workflow_request_id', 'in', requests.ids),
+                    ('workflow_level_id', 'in', levels.ids),
+                    ('state', '=', 'pending'),
+                ],
+                groupby=['workflow_request_id', 'workflow_level_id'],
+                aggregates=['__count'],
+            )
+        }
+
+        # ── Niveau suivant de chaque niveau complété ──────────────────────
+        completed = self.filtered(
+            lambda a: (a.workflow_request_id.id, a.workflow_level_id.id) not in still_pending
+        )
+        if target_level:
+            next_levels = {level.id: target_level for level in completed.mapped('workflow_level_id')}
+        else:
+            next_levels = completed.mapped('workflow_level_id')._get_next_levels()
+        next_pairs = {
+            approval.workflow_request_id.id: next_levels[approval.workflow_level_id.id].id
+            for approval in completed
+            if next_levels.get(approval.workflow_level_id.id)
+        }
+
+        # ── Activation du niveau suivant ──────────────────────────────────
+        existing_pairs, to_activate = self._workflow_activate_levels(next_pairs)
+
+        # ── Déplacement du pointeur d'exécution (workflow.instance) ───────
+        self._workflow_move_requests({request_id: next_pairs[request_id] for request_id in existing_pairs})
+
+        # ── État cible de chaque demande ──────────────────────────────────
+        # Pas de niveau suivant (ou aucun approbateur possible) : circuit terminé.
+        finished_ids = {
+            approval.workflow_request_id.id for approval in completed
+            if approval.workflow_request_id.id not in existing_pairs
+        }
+        # Niveau suivant déjà traité (cas anormal) : approuvé s'il ne reste rien en attente.
+        ambiguous_ids = (
+            set(completed.mapped('workflow_request_id').ids)
+            - finished_ids
+            - set(to_activate.mapped('workflow_request_id').ids)
+        )
+        if ambiguous_ids:
+            pending_request_ids = {
+                request.id
+                for request, _count in Approval._read_group(
+                    [('workflow_request_id', 'in', list(ambiguous_ids)), ('state', '=', 'pending')],
+                    groupby=['workflow_request_id'],
+                    aggregates=['__count'],
+                )
+            }
+            finished_ids |= ambiguous_ids - pending_request_ids
+
+        requests_by_state = defaultdict(list)
+        for request in requests:
+            requests_by_state['approved' if request.id in finished_ids else 'in_progress'].append(request.id)
+        for state, request_ids in requests_by_state.items():
+            self.env['workflow.request'].browse(request_ids).write({'state': state})
+
+        completed_ids = set(completed.ids)
+        results = []
+        for approval in self:
+            request = approval.workflow_request_id
+            level_completed = approval.id in completed_ids
+            if request.state == 'approved':
+                message = f"La demande « {request.name} » a été approuvée et clôturée."
+            elif level_completed:
+                message = f"La demande « {request.name} » passe au niveau suivant."
+            else:
+                message = (
+                    f"Validation enregistrée. En attente des autres validateurs "
+                    f"du niveau « {approval.workflow_level_id.name} »."
+                )
+            results.append({
+                'approval_id': approval.id,
+                'request_id': request.id,
+                'status': 'approved',
+                'message': message,
+                'request_state': request.state,
+                'level_completed': level_completed,
+            })
+        return results
+
+    def _workflow_reject(self, comment):
+        """Refuse les approbations ``self`` et clôture les demandes concernées."""
+        if not self:
+            return
+        self._workflow_lock()
+        self.write({'state': 'rejected', 'comments': comment})
+        self._create_history_comments('rejection_reason', 'Rejet', comment)
+        self.mapped('workflow_request_id').write({'state': 'rejected'})
+
+    def _workflow_return(self, comment, target_level=None):
+        """Retourne les demandes à l'étape précédente (ou à ``target_level``).
+
+        Les approbations de l'étape de retour repassent en attente de validation.
+        """
+        if not self:
+            return
+        self._workflow_lock()
+        self.write({'state': 'returned', 'comments': comment})
+        self._create_history_comments('return', 'Retour', comment)
+
+        if target_level:
+            previous_levels = {level.id: target_level for level in self.mapped('workflow_level_id')}
+        else:
+            previous_levels = self.mapped('workflow_level_id')._get_previous_levels()
+        previous_pairs = {
+            approval.workflow_request_id.id: previous_levels[approval.workflow_level_id.id].id
+            for approval in self
+            if previous_levels.get(approval.workflow_level_id.id)
+        }
+        if not previous_pairs:
+            return
+        self._workflow_move_requests(previous_pairs)
+        self._workflow_activate_levels(previous_pairs, from_states=None)
+
+    def _workflow_request_info(self, comment):
+        """Demande d'informations complémentaires : l'étape courante reste active."""
+        self._create_history_comments('clarification', "Demande d'info", comment or '(Aucun commentaire)')
+
+    def _workflow_activate_levels(self, level_by_request, from_states=('waiting', 'returned')):
+        """Met en attente de validation l'étape cible de chaque demande ``{request_id: level_id}``.
+
+        Les approbations existantes dans ``from_states`` (toutes si ``None``)
+        repassent à ``pending`` ; les étapes sans aucune approbation (circuit en
+        création différée) sont matérialisées directement en ``pending``.
+
+        :return: ``(ids des demandes ayant des approbations sur l'étape cible,
+                   approbations passées ou créées en attente)``
+        """
+        Approval = self.env['workflow.request.approval']
+        if not level_by_request:
+            return set(), Approval
+        targets = Approval.search([
+            ('workflow_request_id', 'in', list(level_by_request)),
+            ('workflow_level_id', 'in', list(set(level_by_request.values()))),
+        ]).filtered(lambda a: level_by_request.get(a.workflow_request_id.id) == a.workflow_level_id.id)
+        to_activate = targets if from_states is None else targets.filtered(lambda a: a.state in from_states)
+        to_activate.write({'state': 'pending'})
+
+        covered = set(targets.mapped('workflow_request_id').ids)
+        Request, Level = self.env['workflow.request'], self.env['workflow.level']
+        created = Approval._workflow_materialize([
+            (Request.browse(request_id), Level.browse(level_id), 'pending')
+            for request_id, level_id in level_by_request.items()
+            if request_id not in covered
+        ])
+        return covered | set(created.mapped('workflow_request_id').ids), to_activate | created
+
+    @api.model
+    def _workflow_materialize(self, plan):
+        """Crée en un seul ``create`` les approbations de chaque ``(demande, étape, état)``.
+
+        Une ligne par approbateur de l'étape ; à défaut d'approbateur configuré,
+        l'administrateur valide à sa place.
+        """
+        fallback = None
+        vals_list = []
+        for request, level, state in plan:
+            approvers = level.approver_ids
+            if not approvers:
+                if fallback is None:
+                    fallback = (
+                        self.env.ref('base.user_admin', raise_if_not_found=False)
+                        or self.env['res.users'].search([('active', '=', True)], limit=1)
+                    )
+                approvers = fallback
+            vals_list.extend({
+                'name': f"Approbation {level.name} - {request.name}",
+                'workflow_request_id': request.id,
+                'workflow_level_id': level.id,
+                'approver_id': approver.id,
+                'state': state,
+                'comments': '',
+            } for approver in approvers)
+        return self.create(vals_list)
+
+    def _workflow_move_requests(self, level_by_request):
+        """Déplace l'instance de chaque demande ``{request_id: level_id}``, groupé par étape."""
+        requests_by_level = defaultdict(list)
+        for request_id, level_id in level_by_request.items():
+            requests_by_level[level_id].append(request_id)
+        for level_id, request_ids in requests_by_level.items():
+            self.env['workflow.request'].browse(request_ids)._workflow_set_level(
+                self.env['workflow.level'].browse(level_id)
+            )
+
+    def _create_history_comments(self, comment_type, label, message):
+        """Historise l'action de chaque approbation en un seul ``create`` multiple
+        et horodate la dernière action des demandes concernées."""
+        self.mapped('workflow_request_id')._workflow_touch()
+        return self.env['workflow.request.comment'].create([{
+            'name': f"{label} - {approval.workflow_level_id.name}",
+            'request_id': approval.workflow_request_id.id,
+            'approval_id': approval.id,
+            'user_id': self.env.user.id,
+            'comment_type': comment_type,
+            'message': message,
+            'author_level_sequence': approval.workflow_level_id.sequence,
+        } for approval in self])
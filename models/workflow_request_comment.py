@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+
+# Nombre d'échanges renvoyés par page de l'historique (get_timeline)
+COMMENT_TIMELINE_PAGE_SIZE = 20
 
 
 class WorkflowRequestComment(models.Model):
@@ -25,6 +29,96 @@ class WorkflowRequestComment(models.Model):
     message = fields.Text(string='Message', required=True)
     returned_from_level = fields.Integer(string='Retourné depuis le Niveau')
     returned_to_level = fields.Integer(string='Retourné vers le Niveau')
-    exchange_number = fields.Integer(string='Numéro d\'Échange', default=1, help='Compteur d\'allers-retours pour cette demande')
+    exchange_number = fields.Integer(string='Numéro d\'Échange', default=1, readonly=True, help='Rang de l\'échange dans l\'historique de la demande (1, 2, 3…)')
     is_internal = fields.Boolean(string='Commentaire Interne', default=False, help='Visible uniquement par les validateurs')
     create_date = fields.Datetime(string='Date de Création', readonly=True)
+
+    def init(self):
+        # Historique paginé : WHERE request_id = … ORDER BY create_date DESC
+        tools.create_index(self._cr, 'workflow_request_comment_request_date_idx', self._table, ['request_id', 'create_date'])
+        # Renumérote les échanges enregistrés avant la numérotation séquentielle
+        self._cr.execute("""
+            UPDATE workflow_request_comment c
+               SET exchange_number = n.rank
+              FROM (SELECT id, ROW_NUMBER() OVER (PARTITION BY request_id ORDER BY create_date, id) AS rank
+                      FROM workflow_request_comment) n
+             WHERE c.id = n.id AND c.exchange_number IS DISTINCT FROM n.rank
+        """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Numérote les échanges à la suite de ceux de chaque demande.
+
+        Les demandes concernées sont verrouillées (comme dans le moteur de
+        transition) : deux écritures simultanées ne peuvent pas obtenir le même numéro.
+        """
+        request_ids = tuple({vals['request_id'] for vals in vals_list if vals.get('request_id')})
+        if request_ids:
+            self.flush_model(['request_id', 'exchange_number'])
+            self.env.cr.execute(
+                "SELECT id FROM workflow_request WHERE id IN %s ORDER BY id FOR NO KEY UPDATE", [request_ids],
+            )
+            self.env.cr.execute("""
+                SELECT request_id, MAX(exchange_number)
+                  FROM workflow_request_comment
+                 WHERE request_id IN %s
+              GROUP BY request_id
+            """, [request_ids])
+            last_numbers = dict(self.env.cr.fetchall())
+            for vals in vals_list:
+                if vals.get('request_id'):
+                    last_numbers[vals['request_id']] = last_numbers.get(vals['request_id'], 0) + 1
+                    vals['exchange_number'] = last_numbers[vals['request_id']]
+        return super().create(vals_list)
+
+    @api.model
+    def get_timeline(self, request_id, before=None, limit=COMMENT_TIMELINE_PAGE_SIZE):
+        """Une page de l'historique des échanges d'une demande, du plus récent
+        au plus ancien (pagination par curseur sur ``(create_date, id)``).
+
+        :param before: curseur ``"<create_date>,<id>"`` du dernier échange déjà chargé
+        :return: ``{'comments': [...], 'next_before': curseur ou None, 'total': int}`` ;
+                 ``total`` n'est calculé que pour la première page
+        """
+        req = self.env['workflow.request'].browse(int(request_id)).exists()
+        if not req:
+            raise UserError("Demande introuvable.")
+        req.check_access_rights('read')
+        req.check_access_rule('read')
+        limit = min(int(limit or COMMENT_TIMELINE_PAGE_SIZE), 100)
+
+        domain = [('request_id', '=', req.id)]
+        Dashboard = self.env['workflow.dashboard']
+        cursor = Dashboard._parse_cursor(before)
+        if cursor:
+            value, comment_id = cursor
+            domain += ['|', ('create_date', '<', value), '&', ('create_date', '=', value), ('id', '<', comment_id)]
+        rows = self.search_read(
+            domain, ['exchange_number', 'comment_type', 'message', 'user_id', 'approval_id', 'create_date'],
+            order='create_date desc, id desc', limit=limit + 1,
+        )
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        approval_ids = {row['approval_id'][0] for row in rows if row['approval_id']}
+        level_names = {
+            approval['id']: approval['workflow_level_id'] and approval['workflow_level_id'][1]
+            for approval in self.env['workflow.request.approval'].browse(approval_ids).read(['workflow_level_id'])
+        }
+        comments = [{
+            'id': row['id'],
+            'exchange_number': row['exchange_number'],
+            'comment_type': row['comment_type'],
+            'message': row['message'],
+            'author': row['user_id'] and row['user_id'][1],
+            'is_current_user': bool(row['user_id']) and row['user_id'][0] == self.env.uid,
+            'level_name': row['approval_id'] and level_names.get(row['approval_id'][0]),
+            'date': row['create_date'].strftime('%d/%m/%Y à %H:%M') if row['create_date'] else '',
+        } for row in rows]
+
+        last = rows[-1] if rows else None
+        return {
+            'comments': comments,
+            'next_before': f"{Dashboard._cursor_date(last['create_date'])},{last['id']}" if has_more else None,
+            'total': self.search_count([('request_id', '=', req.id)]) if not cursor else None,
+        }
@@ -54,6 +54,29 @@ class WorkflowRequestCustomValue(models.Model):
     value_datetime = fields.Datetime(string='Valeur date/heure')
     value_selection = fields.Char(string='Valeur sélection')
 
+    def init(self):
+        # Reprise : demandes dont la copie JSONB (workflow.request.custom_values) n'existe pas encore
+        self._cr.execute(self.env['workflow.request']._CUSTOM_VALUES_QUERY.format(where='req.custom_values IS NULL'))
+
+    # ── Synchronisation de workflow.request.custom_values ─────────────────
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records.mapped('request_id')._sync_custom_values()
+        return records
+
+    def write(self, vals):
+        requests = self.mapped('request_id')
+        result = super().write(vals)
+        (requests | self.mapped('request_id'))._sync_custom_values()
+        return result
+
+    def unlink(self):
+        requests = self.mapped('request_id')
+        result = super().unlink()
+        requests._sync_custom_values()
+        return result
+
     # Champ calculé pour l'affichage dans les listes (évite column_invisible)
     value_display = fields.Char(
         string='Valeur',
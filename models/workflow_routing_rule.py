@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields
+from bisect import bisect_right
+
+from odoo import models, fields, api, tools
+
+# Champs compilés dans la table de routage (_get_routing_table)
+ROUTING_TABLE_FIELDS = {'amount_min', 'amount_max', 'sequence', 'active', 'workflow_type_id', 'workflow_definition_id'}
 
 
 class WorkflowRoutingRule(models.Model):
@@ -15,3 +20,86 @@ class WorkflowRoutingRule(models.Model):
     amount_min = fields.Float(string='Montant minimum', help="Montant minimum pour appliquer cette règle (laisser vide pour aucune limite)")
     amount_max = fields.Float(string='Montant maximum', help="Montant maximum pour appliquer cette règle (laisser vide pour aucune limite)")
     active = fields.Boolean(string='Actif', default=True)
+
+    # ── Invalidation de la table de routage compilée ─────────────────────
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records.sudo().mapped('workflow_type_id')._bump_routing_version()
+        return records
+
+    def write(self, vals):
+        # Pas de nouvelle version pour un libellé
+        if not ROUTING_TABLE_FIELDS.intersection(vals):
+            return super().write(vals)
+        # Types d'origine et de destination (changement de workflow_type_id)
+        types = self.sudo().mapped('workflow_type_id')
+        result = super().write(vals)
+        (types | self.sudo().mapped('workflow_type_id'))._bump_routing_version()
+        return result
+
+    def unlink(self):
+        types = self.sudo().mapped('workflow_type_id')
+        result = super().unlink()
+        types.exists()._bump_routing_version()
+        return result
+
+    # ── Résolution du circuit ────────────────────────────────────────────
+    @api.model
+    def _get_routing_table(self, workflow_type_id):
+        """Table de routage compilée d'un type (voir ``_compile_routing_table``).
+
+        La version du type fait partie de la clé de cache : modifier une règle
+        n'invalide que l'entrée de ce type, jamais le reste du cache du registre.
+        """
+        version = self.env['workflow.type'].sudo().browse(workflow_type_id).routing_version
+        return self._compile_routing_table(workflow_type_id, version)
+
+    @api.model
+    @tools.ormcache('workflow_type_id', 'version')
+    def _compile_routing_table(self, workflow_type_id, version):
+        """Compile les règles actives d'un type en intervalles triés.
+
+        Les bornes non nulles de toutes les règles découpent l'axe des montants
+        en segments élémentaires ``[b(i), b(i+1))`` ; sur chacun, la première
+        règle applicable (par priorité) est toujours la même. On la calcule une
+        fois par segment, la résolution devient alors un simple ``bisect``.
+
+        :param version: ``routing_version`` du type, changée à chaque modification de ses règles
+        :return: ``(bornes, circuits)`` avec ``len(circuits) == len(bornes) + 1`` ;
+                 ``circuits[0]`` couvre les montants inférieurs à la première borne.
+        """
+        rules = self.sudo().search([('workflow_type_id', '=', workflow_type_id)], order='sequence, id')
+        compiled = [(rule.amount_min, rule.amount_max, rule.workflow_definition_id.id) for rule in rules]
+        bounds = sorted({bound for amount_min, amount_max, _d in compiled for bound in (amount_min, amount_max) if bound})
+
+        def first_match(amount):
+            for amount_min, amount_max, definition_id in compiled:
+                min_ok = not amount_min or amount >= amount_min
+                max_ok = not amount_max or amount < amount_max
+                if min_ok and max_ok:
+                    return definition_id
+            return False
+
+        # Chaque segment est représenté par sa borne inférieure (-inf pour le premier)
+        definitions = [first_match(float('-inf'))] + [first_match(bound) for bound in bounds]
+        return tuple(bounds), tuple(definitions)
+
+    @api.model
+    def resolve_many(self, workflow_type_id, amounts):
+        """Résout le circuit de chaque montant pour un type de workflow.
+
+        Chemin commun de l'assistant de création et des imports en masse.
+
+        :return: liste d'ids ``workflow.definition`` (``False`` si aucune règle
+                 ne correspond ou si le montant est vide), dans l'ordre des montants.
+        """
+        if not workflow_type_id:
+            return [False] * len(amounts)
+        bounds, definitions = self._get_routing_table(workflow_type_id)
+        return [definitions[bisect_right(bounds, amount)] if amount else False for amount in amounts]
+
+    @api.model
+    def resolve(self, workflow_type_id, amount):
+        """Retourne le circuit (``workflow.definition``) applicable à un montant."""
+        return self.env['workflow.definition'].browse(self.resolve_many(workflow_type_id, [amount])[0])
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from collections import defaultdict
+
+from odoo import models, fields, api, tools
+
+
+class WorkflowStatsDaily(models.Model):
+    """Table de faits des tableaux de bord : nombre de demandes actives par
+    jour de création × type × état × étape actuelle.
+
+    Chaque demande compte dans exactement une ligne (sa cohorte de création,
+    dans son état et à son étape actuels). Les partitions (jour, type) des
+    demandes qui changent d'état ou d'étape sont recalculées par le traitement
+    de ``workflow.outbox`` ; le cron ``ir_cron_workflow_stats_rebuild``
+    reconstruit la table entière chaque nuit (archivages, corrections manuelles).
+    """
+    _name = 'workflow.stats.daily'
+    _description = 'Statistiques journalières du workflow'
+    _order = 'date desc, workflow_type_id, state'
+    _log_access = False
+
+    date = fields.Date(string='Jour de création', required=True, readonly=True)
+    workflow_type_id = fields.Many2one('workflow.type', string='Type de Workflow', required=True, readonly=True, ondelete='cascade')
+    category = fields.Selection([
+        ('credit', 'Crédit Bancaire'),
+        ('courrier', 'Courrier Entrant'),
+        ('other', 'Autre'),
+    ], string='Catégorie', readonly=True, index=True)
+    state = fields.Selection([
+        ('draft', 'Brouillon'),
+        ('submitted', 'Soumis'),
+        ('in_progress', 'En cours'),
+        ('approved', 'Approuvé'),
+        ('rejected', 'Rejeté'),
+        ('cancelled', 'Annulé'),
+    ], string='État', required=True, readonly=True)
+    level_id = fields.Many2one('workflow.level', string='Étape actuelle', readonly=True, ondelete='set null')
+    request_count = fields.Integer(string='Nombre de demandes', readonly=True)
+
+    def init(self):
+        tools.create_unique_index(
+            self._cr, 'workflow_stats_daily_key_uniq', self._table,
+            ['date', 'workflow_type_id', 'state', 'COALESCE(level_id, 0)'],
+        )
+        tools.create_index(self._cr, 'workflow_stats_daily_category_date_idx', self._table, ['category', 'date'])
+
+    # ── Alimentation ──────────────────────────────────────────────────────
+    _AGGREGATE_QUERY = """
+        INSERT INTO workflow_stats_daily (date, workflow_type_id, category, state, level_id, request_count)
+             SELECT r.create_date::date, r.workflow_type_id, t.category,
+                    r.state, r.current_level_id, COUNT(*)
+               FROM workflow_request r
+               JOIN workflow_type t ON t.id = r.workflow_type_id
+              WHERE r.active AND {where}
+           GROUP BY 1, 2, 3, 4, 5
+        ON CONFLICT (date, workflow_type_id, state, COALESCE(level_id, 0))
+        DO UPDATE SET request_count = EXCLUDED.request_count, category = EXCLUDED.category
+    """
+
+    @api.model
+    def _refresh_requests(self, requests):
+        """Recalcule les partitions (jour de création, type) des demandes ``requests``."""
+        partitions = defaultdict(set)
+        for request in requests.with_context(active_test=False):
+            if request.create_date and request.workflow_type_id:
+                partitions[request.workflow_type_id.id].add(request.create_date.date())
+        if not partitions:
+            return
+        self.env['workflow.request'].flush_model(['state', 'current_level_id', 'workflow_type_id', 'active'])
+        cr = self.env.cr
+        for workflow_type_id, dates in partitions.items():
+            params = {'type_id': workflow_type_id, 'dates': tuple(dates)}
+            cr.execute("""
+                DELETE FROM workflow_stats_daily
+                 WHERE workflow_type_id = %(type_id)s AND date IN %(dates)s
+            """, params)
+            cr.execute(self._AGGREGATE_QUERY.format(
+                where="r.workflow_type_id = %(type_id)s AND r.create_date::date IN %(dates)s",
+            ), params)
+        self.invalidate_model()
+        # Compteurs mis en cache entre le commit de la transition et ce traitement
+        self.env['workflow.dashboard']._invalidate_dashboard_cache()
+
+    @api.model
+    def _cron_rebuild(self):
+        """Reconstruit entièrement la table de faits depuis ``workflow_request``."""
+        self.env['workflow.request'].flush_model()
+        self.env.cr.execute("DELETE FROM workflow_stats_daily")
+        self.env.cr.execute(self._AGGREGATE_QUERY.format(where='TRUE'))
+        self.invalidate_model()
+        self.env['workflow.dashboard']._invalidate_dashboard_cache()
+
+    # ── Lecture ───────────────────────────────────────────────────────────
+    @api.model
+    def _get_counts(self, category=None, date_from=None, groupby=('state',)):
+        """Somme de ``request_count`` groupée selon ``groupby`` (quelques centaines de lignes lues)."""
+        domain = []
+        if category:
+            domain.append(('category', '=', category))
+        if date_from:
+            domain.append(('date', '>=', date_from))
+        return self.sudo()._read_group(domain, groupby=list(groupby), aggregates=['request_count:sum'])
+
+    @api.model
+    def get_monthly_series(self, category=None, months=12):
+        """Série mensuelle (création) des ``months`` derniers mois, par issue.
+
+        :return: liste ``[{'month': 'AAAA-MM', 'total', 'approved', 'rejected', 'in_progress'}]``
+        """
+        first_month = fields.Date.subtract(fields.Date.today().replace(day=1), months=months - 1)
+        series = {}
+        for offset in range(months):
+            month = fields.Date.add(first_month, months=offset)
+            series[month] = {'month': month.strftime('%Y-%m'), 'total': 0, 'approved': 0, 'rejected': 0, 'in_progress': 0}
+        for month, state, count in self._get_counts(category, first_month, groupby=('date:month', 'state')):
+            point = series.get(fields.Date.to_date(month))
+            if not point:
+                continue
+            point['total'] += count
+            if state in ('approved', 'rejected'):
+                point[state] += count
+            elif state in ('submitted', 'in_progress'):
+                point['in_progress'] += count
+        return list(series.values())
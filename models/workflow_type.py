@@ -7,6 +7,10 @@ from odoo import models, fields, api
 from odoo.exceptions import ValidationError
 
 
+# Séquence PostgreSQL des versions de la table de routage (jamais réutilisée)
+ROUTING_VERSION_SEQUENCE = 'workflow_type_routing_version_seq'
+
+
 def _sanitize_code(value):
     """Convertit un nom en code technique : majuscules, sans accents, sans espaces."""
     # Supprimer les accents
@@ -44,6 +48,24 @@ class WorkflowType(models.Model):
         string='Champs du formulaire',
         help='Champs personnalisés que l\'utilisateur devra remplir lors de la création d\'une demande de ce type.',
     )
+    routing_version = fields.Integer(
+        string='Version du routage', readonly=True, copy=False, default=0,
+        help="Changée à chaque modification des règles de routage du type "
+             "(clé de la table de routage compilée en cache).")
+
+    def init(self):
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {ROUTING_VERSION_SEQUENCE}")
+
+    def _bump_routing_version(self):
+        """Change la version de la table de routage de ces types (voir
+        ``workflow.routing.rule._get_routing_table``)."""
+        if not self:
+            return
+        self.env.cr.execute(
+            f"UPDATE workflow_type SET routing_version = nextval('{ROUTING_VERSION_SEQUENCE}') WHERE id IN %s",
+            [tuple(self.ids)],
+        )
+        self.invalidate_recordset(['routing_version'])
 
     @api.onchange('name')
     def _onchange_name_generate_code(self):
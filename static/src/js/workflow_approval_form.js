@@ -0,0 +1,87 @@
+/** @odoo-module **/
+
+import { registry } from "@web/core/registry";
+import { useService } from "@web/core/utils/hooks";
+import { formView } from "@web/views/form/form_view";
+import { FormController } from "@web/views/form/form_controller";
+
+/**
+ * Formulaire de décision de la vue approbateur (js_class « workflow_approval_form »).
+ *
+ * Ouvert sans enregistrement (workflow.approval.view._open_decision_form), le
+ * formulaire n'est jamais sauvegardé : les boutons de décision envoient
+ * directement l'approbation, le commentaire, l'action choisie et les pièces
+ * jointes à /workflow/approval/decide (workflow.request.approval.execute_decision).
+ * Le mode file de validation, qui réutilise un seul enregistrement, garde les
+ * méthodes serveur du formulaire.
+ */
+
+// Bouton du formulaire → décision de execute_decision (null : action configurée)
+const DECISION_BUTTONS = {
+    action_approve: "approve",
+    action_reject: "reject",
+    action_return: "return",
+    action_execute: null,
+};
+
+function many2oneId(value) {
+    return (Array.isArray(value) ? value[0] : value?.id) || null;
+}
+
+export class WorkflowApprovalFormController extends FormController {
+    setup() {
+        super.setup();
+        this.rpc = useService("rpc");
+        this.action = useService("action");
+        this.notification = useService("notification");
+    }
+
+    async beforeExecuteActionButton(clickParams) {
+        const record = this.model.root;
+        if (!(clickParams.name in DECISION_BUTTONS) || !record.isNew) {
+            return super.beforeExecuteActionButton(...arguments);
+        }
+        const data = record.data;
+        const actionId = clickParams.name === "action_execute" ? many2oneId(data.selected_action_id) : null;
+        if (clickParams.name === "action_execute" && !actionId) {
+            this.notification.add("Veuillez sélectionner une action avant de continuer.", { type: "warning" });
+            return false;
+        }
+        const result = await this.rpc("/workflow/approval/decide", {
+            approval_id: many2oneId(data.current_approval_id),
+            decision: DECISION_BUTTONS[clickParams.name],
+            action_id: actionId,
+            comment: data.comment || "",
+            attachment_ids: data.attachment_ids.currentIds,
+        });
+        if (result.decision === "request_info") {
+            // Le niveau reste actif : l'approbateur reste sur le dossier
+            this.notification.add(result.message, { title: result.title, type: result.notif_type });
+            return false;
+        }
+        await this.action.doAction({
+            type: "ir.actions.client",
+            tag: "display_notification",
+            params: {
+                title: result.title,
+                message: result.message,
+                type: result.notif_type,
+                sticky: false,
+                next: {
+                    type: "ir.actions.act_window",
+                    name: "Demande de Workflow",
+                    res_model: "workflow.request",
+                    res_id: result.request_id,
+                    views: [[false, "form"]],
+                    target: "current",
+                },
+            },
+        });
+        return false;
+    }
+}
+
+registry.category("views").add("workflow_approval_form", {
+    ...formView,
+    Controller: WorkflowApprovalFormController,
+});
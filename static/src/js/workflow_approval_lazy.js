@@ -0,0 +1,196 @@
+/** @odoo-module **/
+
+import { jsonrpc } from "@web/core/network/rpc_service";
+
+/**
+ * Sections de la vue approbateur chargées à la demande.
+ *
+ * workflow.approval.view ne rend que l'en-tête des sections lourdes
+ * (historique, commentaires, documents) : un clic sur l'en-tête charge leur
+ * contenu via /workflow/approval/section, une seule fois, puis l'affiche ou
+ * le masque. Le formulaire de décision est interactif sans les attendre.
+ *
+ * Les commentaires sont une liste paginée (/workflow/approval/timeline) rendue
+ * par CommentTimeline : seules les lignes visibles existent dans le DOM.
+ *
+ * En mode file de validation, les prochains dossiers sont préparés côté
+ * serveur (/workflow/approval/prefetch) pendant que l'approbateur lit le dossier courant.
+ */
+
+// ── Historique des échanges (liste virtualisée) ───────────────────────────
+
+const TIMELINE_ROW_HEIGHT = 132;
+const TIMELINE_VIEWPORT_HEIGHT = 500;
+const TIMELINE_OVERSCAN = 4;
+
+const COMMENT_STYLES = {
+    approval_note: ["✅", "#198754", "#d1e7dd", "Approuvé"],
+    rejection_reason: ["❌", "#dc3545", "#f8d7da", "Refusé"],
+    return: ["🔙", "#fd7e14", "#fff3cd", "Retourné au niveau précédent"],
+    clarification: ["❓", "#0dcaf0", "#cff4fc", "Demande de clarification"],
+    response: ["💬", "#6f42c1", "#e0cffc", "Réponse"],
+};
+const DEFAULT_COMMENT_STYLE = ["📝", "#6c757d", "#f8f9fa", "Information"];
+
+class CommentTimeline {
+    constructor(container, requestId) {
+        this.requestId = requestId;
+        this.comments = [];
+        this.nextBefore = null;
+        this.hasMore = true;
+        this.loading = false;
+        this.renderScheduled = false;
+
+        this.header = document.createElement("p");
+        this.header.style.cssText = "margin: 0 0 1rem 0; font-size: 13px; color: #6c757d;";
+        this.viewport = document.createElement("div");
+        this.viewport.style.cssText = `height: ${TIMELINE_VIEWPORT_HEIGHT}px; overflow-y: auto; position: relative;`;
+        this.spacer = document.createElement("div");
+        this.spacer.style.position = "relative";
+        this.viewport.appendChild(this.spacer);
+        container.replaceChildren(this.header, this.viewport);
+
+        this.viewport.addEventListener("scroll", () => this.scheduleRender());
+    }
+
+    async loadMore() {
+        if (this.loading || !this.hasMore) {
+            return;
+        }
+        this.loading = true;
+        try {
+            const result = await jsonrpc("/workflow/approval/timeline", {
+                request_id: this.requestId,
+                before: this.nextBefore,
+            });
+            if (result.total !== null) {
+                this.header.textContent = `${result.total} échange(s), du plus récent au plus ancien`;
+            }
+            this.comments.push(...result.comments);
+            this.nextBefore = result.next_before;
+            this.hasMore = Boolean(result.next_before);
+        } finally {
+            this.loading = false;
+        }
+        this.scheduleRender();
+    }
+
+    scheduleRender() {
+        if (this.renderScheduled) {
+            return;
+        }
+        this.renderScheduled = true;
+        requestAnimationFrame(() => {
+            this.renderScheduled = false;
+            this.render();
+        });
+    }
+
+    render() {
+        const count = this.comments.length;
+        this.spacer.style.height = `${count * TIMELINE_ROW_HEIGHT}px`;
+        const first = Math.max(0, Math.floor(this.viewport.scrollTop / TIMELINE_ROW_HEIGHT) - TIMELINE_OVERSCAN);
+        const last = Math.min(
+            count,
+            Math.ceil((this.viewport.scrollTop + TIMELINE_VIEWPORT_HEIGHT) / TIMELINE_ROW_HEIGHT) + TIMELINE_OVERSCAN
+        );
+        const rows = [];
+        for (let index = first; index < last; index++) {
+            rows.push(this.renderRow(this.comments[index], index));
+        }
+        this.spacer.replaceChildren(...rows);
+        // Page suivante dès que la fin de la liste approche
+        if (last >= count - TIMELINE_OVERSCAN) {
+            this.loadMore();
+        }
+    }
+
+    renderRow(comment, index) {
+        const [icon, borderColor, bgColor, label] = COMMENT_STYLES[comment.comment_type] || DEFAULT_COMMENT_STYLE;
+        const row = document.createElement("div");
+        row.style.cssText = `position: absolute; left: 0; right: 0; top: ${index * TIMELINE_ROW_HEIGHT}px;
+            height: ${TIMELINE_ROW_HEIGHT - 12}px; overflow: hidden; box-sizing: border-box;
+            background: ${bgColor}; border-left: 4px solid ${borderColor}; border-radius: 8px; padding: 0.75rem 1rem;`;
+
+        const title = document.createElement("div");
+        title.style.cssText = `font-size: 14px; font-weight: 600; color: ${borderColor};`;
+        title.textContent = `${icon} #${comment.exchange_number} · ${label}`;
+
+        const meta = document.createElement("div");
+        meta.style.cssText = "font-size: 12px; color: #495057; margin: 0.25rem 0;";
+        meta.textContent = `${comment.author || "Utilisateur inconnu"}${comment.is_current_user ? " (vous)" : ""}` +
+            ` • ${comment.level_name || "N/A"} • ${comment.date}`;
+
+        const message = document.createElement("div");
+        message.style.cssText = `background: white; border-radius: 6px; padding: 0.5rem 0.75rem; font-style: italic;
+            color: #212529; white-space: nowrap; overflow: hidden; text-overflow: ellipsis;`;
+        message.textContent = `"${comment.message}"`;
+        message.title = comment.message;
+
+        row.append(title, meta, message);
+        return row;
+    }
+}
+
+// ── Sections ──────────────────────────────────────────────────────────────
+
+async function loadSection(section, body) {
+    const requestId = parseInt(section.dataset.oeId);
+    if (section.dataset.oeField === "comments") {
+        await new CommentTimeline(body, requestId).loadMore();
+        return;
+    }
+    const result = await jsonrpc("/workflow/approval/section", {
+        request_id: requestId,
+        section: section.dataset.oeField,
+    });
+    body.innerHTML = result.html;
+}
+
+async function toggleLazySection(section) {
+    const body = section.querySelector(".o_wf_lazy_body");
+    if (section.dataset.loaded) {
+        body.style.display = body.style.display === "none" ? "block" : "none";
+        return;
+    }
+    if (section.dataset.loading) {
+        return;
+    }
+    section.dataset.loading = "1";
+    body.style.display = "block";
+    body.textContent = "Chargement…";
+    try {
+        await loadSection(section, body);
+        section.dataset.loaded = "1";
+    } catch {
+        body.textContent = "Impossible de charger cette section.";
+    } finally {
+        delete section.dataset.loading;
+    }
+}
+
+document.addEventListener("click", (ev) => {
+    const toggle = ev.target.closest(".o_wf_lazy_toggle");
+    if (toggle) {
+        toggleLazySection(toggle.closest(".o_wf_lazy_section"));
+    }
+});
+
+// ── File de validation ────────────────────────────────────────────────────
+
+function prefetchQueue(banner) {
+    if (banner.dataset.prefetched) {
+        return;
+    }
+    banner.dataset.prefetched = "1";
+    const schedule = window.requestIdleCallback || ((callback) => setTimeout(callback, 500));
+    schedule(() => {
+        jsonrpc("/workflow/approval/prefetch", { view_id: parseInt(banner.dataset.oeId) }).catch(() => {});
+    });
+}
+
+new MutationObserver(() => {
+    for (const banner of document.querySelectorAll(".o_wf_queue:not([data-prefetched])")) {
+        prefetchQueue(banner);
+    }
+}).observe(document.body, { childList: true, subtree: true });
@@ -1,40 +1,201 @@
 /** @odoo-module **/
 
-import { Component, useState, onWillStart } from "@odoo/owl";
+import { Component, useState, onWillStart, onWillUnmount } from "@odoo/owl";
 import { registry } from "@web/core/registry";
 import { useService } from "@web/core/utils/hooks";
 
+/**
+ * Tableau de bord Workflow (Crédit / Courrier) rendu entièrement côté client.
+ *
+ * Les données viennent de la route JSON /workflow/dashboard/data
+ * (workflow.dashboard.get_dashboard_payload) : statistiques compactes et une
+ * page de lignes paginée par curseur (plus, en mode crédit, l'évolution des
+ * 12 derniers mois lue dans workflow.stats.daily). Aucun enregistrement transitoire n'est
+ * créé à l'ouverture, au changement de page ou de mode.
+ *
+ * Les créations et changements d'état sont ensuite reçus par le bus (canal
+ * des utilisateurs internes, ajouté côté serveur, publié par l'outbox) : les compteurs sont
+ * ajustés localement et seules les lignes concernées sont relues
+ * (/workflow/dashboard/rows, sous les droits de l'utilisateur). La charge
+ * serveur suit le rythme des transitions, pas le nombre d'écrans ouverts.
+ *
+ * Usage : action client « workflow_dashboard », params { mode: "credit" | "courrier" }.
+ */
+const BUS_NOTIFICATION = "workflow_dashboard/changes";
+// Taille d'une page (DASHBOARD_PAGE_SIZE côté serveur)
+const PAGE_SIZE = 10;
+
 class WorkflowDashboard extends Component {
     setup() {
-        this.orm = useService("orm");
+        this.rpc = useService("rpc");
         this.action = useService("action");
         this.state = useState({
+            mode: this.props.action?.params?.mode || "credit",
             stats: {},
-            recentRequests: [],
+            rows: [],
+            page: 1,
+            totalPages: 1,
+            nextCursor: null,
+            prevCursor: null,
             isLoading: true,
         });
+        // Curseurs des pages déjà visitées : retour arrière sans recalcul de clé
+        this.cursorStack = [];
+        this.currentCursor = null;
+
+        this.busService = useService("bus_service");
+        this.onBusChanges = (payload) => this.applyChanges(payload.events);
 
         onWillStart(async () => {
             await this.loadData();
+            this.busService.subscribe(BUS_NOTIFICATION, this.onBusChanges);
+        });
+        onWillUnmount(() => {
+            this.busService.unsubscribe(BUS_NOTIFICATION, this.onBusChanges);
         });
     }
 
-    async loadData() {
+    // ── Chargement ────────────────────────────────────────────────────────
+
+    async loadData(cursor = null, direction = "next", page = 1) {
         try {
-            // Récupération des statistiques et données récentes
-            const result = await this.orm.call(
-                "workflow.request",
-                "get_dashboard_data",
-                []
-            );
-            
+            const result = await this.rpc("/workflow/dashboard/data", {
+                mode: this.state.mode,
+                cursor,
+                direction,
+                page,
+            });
+            this.currentCursor = cursor;
             this.state.stats = result.stats;
-            this.state.recentRequests = result.recent_requests;
-            this.state.isLoading = false;
+            this.state.rows = this.mergeRows(result.rows);
+            this.state.page = result.page;
+            this.state.totalPages = result.total_pages;
+            this.state.nextCursor = result.next_cursor;
+            this.state.prevCursor = result.prev_cursor;
         } catch (error) {
             console.error("Erreur chargement dashboard:", error);
-            this.state.isLoading = false;
         }
+        this.state.isLoading = false;
+    }
+
+    /**
+     * Conserve l'objet des lignes dont la version (write_date) n'a pas changé :
+     * avec t-key sur l'id, OWL ne redessine que les lignes réellement modifiées.
+     */
+    mergeRows(rows) {
+        const known = new Map(this.state.rows.map((row) => [row.id, row]));
+        return rows.map((row) => {
+            const previous = known.get(row.id);
+            return previous && previous.version === row.version ? previous : row;
+        });
+    }
+
+    async refresh() {
+        await this.loadData(this.currentCursor, "next", this.state.page);
+    }
+
+    // ── Mises à jour en direct (bus) ──────────────────────────────────────
+
+    /**
+     * Applique les événements { mode, id, old_state, state } publiés par
+     * workflow.dashboard._notify_dashboard : ajustement des compteurs, puis
+     * relecture des lignes concernées (remplacement de la ligne affichée ou
+     * insertion en tête de la première page).
+     */
+    async applyChanges(events) {
+        events = events.filter((event) => event.mode === this.state.mode);
+        if (!events.length) {
+            return;
+        }
+        for (const { old_state: oldState, state } of events) {
+            this.applyCounters(oldState, state);
+        }
+        const mode = this.state.mode;
+        const rows = await this.rpc("/workflow/dashboard/rows", {
+            mode,
+            ids: events.map((event) => event.id),
+        });
+        if (mode !== this.state.mode) {
+            return;
+        }
+        const rowsById = new Map(rows.map((row) => [row.id, row]));
+        for (const { id, old_state: oldState } of events) {
+            const row = rowsById.get(id);
+            if (!row) {
+                continue;
+            }
+            const index = this.state.rows.findIndex((current) => current.id === id);
+            if (index >= 0) {
+                this.state.rows[index] = row;
+            } else if (!oldState && this.state.page === 1) {
+                this.state.rows.unshift(row);
+                if (this.state.rows.length > PAGE_SIZE) {
+                    this.state.rows.pop();
+                    this.state.nextCursor = this.state.rows[this.state.rows.length - 1].cursor;
+                }
+            }
+        }
+    }
+
+    applyCounters(oldState, newState) {
+        const stats = this.state.stats;
+        const bucket = (value) => {
+            if (!this.isCredit) {
+                return ["en_validation", "traite", "cloture"].includes(value) ? value : null;
+            }
+            if (value === "submitted" || value === "in_progress") {
+                return "in_progress";
+            }
+            return ["approved", "rejected"].includes(value) ? value : null;
+        };
+        if (!oldState) {
+            stats.total += 1;
+            this.state.totalPages = Math.max(1, Math.ceil(stats.total / PAGE_SIZE));
+        } else if (bucket(oldState)) {
+            stats[bucket(oldState)] -= 1;
+        }
+        if (bucket(newState)) {
+            stats[bucket(newState)] += 1;
+        }
+        if (this.isCredit) {
+            const decided = stats.approved + stats.rejected;
+            stats.approval_rate = decided ? Math.round((stats.approved / decided) * 100) : 0;
+        }
+    }
+
+    // ── Navigation ────────────────────────────────────────────────────────
+
+    async switchMode(mode) {
+        if (mode === this.state.mode) {
+            return;
+        }
+        this.state.mode = mode;
+        this.state.rows = [];
+        this.cursorStack = [];
+        this.state.isLoading = true;
+        await this.loadData();
+    }
+
+    async nextPage() {
+        if (!this.state.nextCursor) {
+            return;
+        }
+        this.cursorStack.push(this.currentCursor);
+        await this.loadData(this.state.nextCursor, "next", this.state.page + 1);
+    }
+
+    async previousPage() {
+        if (this.state.page <= 1) {
+            return;
+        }
+        const cursor = this.cursorStack.length ? this.cursorStack.pop() : null;
+        await this.loadData(cursor, "next", cursor ? this.state.page - 1 : 1);
+    }
+
+    // ── Affichage ─────────────────────────────────────────────────────────
+
+    get isCredit() {
+        return this.state.mode === "credit";
     }
 
     formatAmount(amount) {
@@ -42,10 +203,33 @@ class WorkflowDashboard extends Component {
         return Math.floor(amount).toLocaleString("fr-FR").replace(/,/g, " ");
     }
 
+    formatDate(value) {
+        if (!value) return "-";
+        const [year, month, day] = value.split("-");
+        return `${day}/${month}/${year}`;
+    }
+
+    formatTrend(value) {
+        return `${value > 0 ? "+" : ""}${value}%`;
+    }
+
+    formatMonth(value) {
+        const [year, month] = value.split("-");
+        return `${month}/${year.slice(2)}`;
+    }
+
+    /** Hauteur (%) d'une barre de l'évolution mensuelle, relative au mois le plus chargé. */
+    barHeight(total) {
+        const max = Math.max(...this.state.stats.monthly.map((point) => point.total));
+        return max ? Math.round((total / max) * 100) : 0;
+    }
+
+    // ── Actions ───────────────────────────────────────────────────────────
+
     openNewRequest() {
-        this.action.doAction({
+        this.action.doAction(this.isCredit ? "workflow.action_workflow_request_wizard" : {
             type: "ir.actions.act_window",
-            res_model: "workflow.request",
+            res_model: "workflow.courrier.entrant",
             views: [[false, "form"]],
             target: "current",
         });
@@ -54,7 +238,7 @@ class WorkflowDashboard extends Component {
     openRequest(requestId) {
         this.action.doAction({
             type: "ir.actions.act_window",
-            res_model: "workflow.request",
+            res_model: this.isCredit ? "workflow.request" : "workflow.courrier.entrant",
             res_id: requestId,
             views: [[false, "form"]],
             target: "current",
@@ -2,3 +2,4 @@
 
 from . import workflow_wizard_custom_value
 from . import workflow_request_wizard
+from . import workflow_approval_batch_wizard
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+
+
+class WorkflowApprovalBatchWizard(models.TransientModel):
+    """Validation groupée des approbations sélectionnées dans la liste."""
+    _name = 'workflow.approval.batch.wizard'
+    _description = 'Assistant de validation groupée'
+
+    approval_ids = fields.Many2many(
+        'workflow.request.approval',
+        'workflow_approval_batch_wizard_rel',
+        'wizard_id',
+        'approval_id',
+        string='Approbations à valider',
+    )
+    approval_count = fields.Integer(
+        string='Nombre de demandes',
+        compute='_compute_approval_count',
+    )
+    comment = fields.Text(string='Commentaire', required=True)
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if self.env.context.get('active_model') == 'workflow.request.approval':
+            res['approval_ids'] = [(6, 0, self.env.context.get('active_ids') or [])]
+        return res
+
+    @api.depends('approval_ids')
+    def _compute_approval_count(self):
+        for wizard in self:
+            wizard.approval_count = len(wizard.approval_ids)
+
+    def action_confirm(self):
+        """Valide toutes les approbations sélectionnées en une seule transaction."""
+        self.ensure_one()
+        if not self.approval_ids:
+            raise UserError("Aucune approbation sélectionnée.")
+
+        results = self.approval_ids.action_approve_batch(self.comment)
+        approved = [r for r in results if r['status'] == 'approved']
+        skipped = [r for r in results if r['status'] == 'skipped']
+
+        message = f"{len(approved)} demande(s) validée(s)."
+        if skipped:
+            names = self.env['workflow.request'].browse([r['request_id'] for r in skipped]).mapped('name')
+            message += f" {len(skipped)} ignorée(s) : {', '.join(names)}."
+
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': '✅ Validation groupée terminée',
+                'message': message,
+                'type': 'warning' if skipped else 'success',
+                'sticky': bool(skipped),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
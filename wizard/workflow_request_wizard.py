@@ -147,32 +147,18 @@ class WorkflowRequestWizard(models.TransientModel):
     @api.depends('amount', 'workflow_type_id')
     def _compute_detected_circuit(self):
         """Détecte et affiche le circuit qui sera utilisé"""
+        Router = self.env['workflow.routing.rule']
         for wizard in self:
             if not wizard.amount or not wizard.workflow_type_id:
                 wizard.detected_circuit_info = False
                 continue
             
-            # Recherche de la règle de routage applicable
-            routing_rules = self.env['workflow.routing.rule'].search([
-                ('workflow_type_id', '=', wizard.workflow_type_id.id),
-                ('active', '=', True),
-            ], order='sequence, id')
-            
-            circuit_found = None
-            for rule in routing_rules:
-                min_ok = not rule.amount_min or wizard.amount >= rule.amount_min
-                max_ok = not rule.amount_max or wizard.amount < rule.amount_max
-                
-                if min_ok and max_ok:
-                    circuit_found = rule.workflow_definition_id
-                    break
+            # Résolution par la table de routage compilée (bisect, en cache)
+            circuit_found = Router.resolve(wizard.workflow_type_id.id, wizard.amount)
             
             if circuit_found:
-                # Compter les niveaux du circuit
-                level_count = self.env['workflow.level'].search_count([
-                    ('workflow_definition_id', '=', circuit_found.id),
-                    ('active', '=', True)
-                ])
+                # Nombre de niveaux actifs lu depuis le graphe compilé du circuit
+                level_count = len(circuit_found._get_circuit_graph()['levels'])
                 
                 # Déterminer la couleur selon le nombre de niveaux
                 if level_count <= 2:
@@ -215,46 +201,33 @@ class WorkflowRequestWizard(models.TransientModel):
 
     def _save_custom_values(self, request):
         """Copie les valeurs des champs personnalisés du wizard vers la demande."""
-        for line in self.custom_value_ids:
-            self.env['workflow.request.custom.value'].create({
-                'request_id': request.id,
-                'custom_field_id': line.custom_field_id.id,
-                'value_char': line.value_char,
-                'value_text': line.value_text,
-                'value_integer': line.value_integer,
-                'value_float': line.value_float,
-                'value_boolean': line.value_boolean,
-                'value_date': line.value_date,
-                'value_datetime': line.value_datetime,
-                'value_selection': line.value_selection,
-            })
+        # Une seule création multiple : une seule recopie dans workflow.request.custom_values
+        self.env['workflow.request.custom.value'].create([{
+            'request_id': request.id,
+            'custom_field_id': line.custom_field_id.id,
+            'value_char': line.value_char,
+            'value_text': line.value_text,
+            'value_integer': line.value_integer,
+            'value_float': line.value_float,
+            'value_boolean': line.value_boolean,
+            'value_date': line.value_date,
+            'value_datetime': line.value_datetime,
+            'value_selection': line.value_selection,
+        } for line in self.custom_value_ids])
 
     def _detect_workflow_circuit(self):
-        """Détecte automatiquement le circuit de validation selon les règles métier"""
+        """Détecte automatiquement le circuit de validation selon les règles métier.
+
+        La première règle (par priorité) dont l'intervalle de montant contient
+        ``amount`` s'applique ; résolue via :meth:`workflow.routing.rule.resolve`.
+        """
         self.ensure_one()
         
         if not self.workflow_type_id or not self.amount:
             return None
         
-        # Recherche des règles de routage pour ce type de workflow
-        # Tri par séquence (priorité) - la première règle qui matche est utilisée
-        routing_rules = self.env['workflow.routing.rule'].search([
-            ('workflow_type_id', '=', self.workflow_type_id.id),
-            ('active', '=', True),
-        ], order='sequence, id')
-        
-        # Parcourir les règles et trouver celle qui correspond au montant
-        for rule in routing_rules:
-            # Vérifier les conditions de montant
-            min_ok = not rule.amount_min or self.amount >= rule.amount_min
-            max_ok = not rule.amount_max or self.amount < rule.amount_max
-            
-            if min_ok and max_ok:
-                # Règle trouvée - retourner le circuit associé
-                return rule.workflow_definition_id.id if rule.workflow_definition_id else None
-        
-        # Aucune règle ne correspond - retourner None
-        return None
+        circuit = self.env['workflow.routing.rule'].resolve(self.workflow_type_id.id, self.amount)
+        return circuit.id or None
 
     def action_save_draft(self):
         """Sauvegarde la demande en brouillon"""
@@ -310,55 +283,11 @@ class WorkflowRequestWizard(models.TransientModel):
         }
 
     def _create_workflow_approvals(self, request):
-        """Crée une approbation pour CHAQUE approbateur de chaque niveau du circuit.
+        """Crée les approbations du circuit de la demande (voir ``workflow.request._workflow_submit``).
         - Niveau 0 : état 'pending' (actif immédiatement)
-        - Niveaux suivants : état 'waiting' (activés progressivement)
+        - Niveaux suivants : état 'waiting', ou créés à leur activation (circuit en création différée)
         """
-        if not request.workflow_definition_id:
-            return 0
-
-        levels = self.env['workflow.level'].search([
-            ('workflow_definition_id', '=', request.workflow_definition_id.id),
-            ('active', '=', True),
-        ], order='sequence, id')
-
-        if not levels:
-            return 0
-
-        total = 0
-        for idx, level in enumerate(levels):
-            approval_state = 'pending' if idx == 0 else 'waiting'
-
-            if level.approver_ids:
-                # Une approbation par approbateur → chacun peut valider de son côté
-                for approver in level.approver_ids:
-                    self.env['workflow.request.approval'].create({
-                        'name': f"Approbation {level.name} - {request.name}",
-                        'workflow_request_id': request.id,
-                        'workflow_level_id': level.id,
-                        'approver_id': approver.id,
-                        'state': approval_state,
-                        'comments': '',
-                    })
-                    total += 1
-            else:
-                # Aucun approbateur configuré → fallback sur l'admin
-                fallback = (
-                    self.env.ref('base.user_admin', raise_if_not_found=False)
-                    or self.env['res.users'].search([('active', '=', True)], limit=1)
-                )
-                if fallback:
-                    self.env['workflow.request.approval'].create({
-                        'name': f"Approbation {level.name} - {request.name}",
-                        'workflow_request_id': request.id,
-                        'workflow_level_id': level.id,
-                        'approver_id': fallback.id,
-                        'state': approval_state,
-                        'comments': '',
-                    })
-                    total += 1
-
-        return total
+        return request._workflow_submit()
 
     def action_submit_request(self):
         """Soumet la demande directement"""